@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+One-shot maintenance commands
+Schema creation and seeding run once per deploy (before uvicorn starts its
+workers) instead of on every worker import.
+
+Usage (from the repository root):
+    python -m app.cli init-db            # create missing tables
+    python -m app.cli migrate            # apply pending versioned migrations (indexes)
+    python -m app.cli seed-superadmins   # create/refresh production SuperAdmins
+    python -m app.cli setup              # init-db + migrate, plus seeding when ENVIRONMENT=production
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def init_db():
+    from app.database.database import Base, engine
+    from app.database.registry import import_all_models
+
+    import_all_models()
+    Base.metadata.create_all(bind=engine)
+    print(f"✅ Tables ready ({len(Base.metadata.tables)} tables)")
+
+
+def migrate():
+    from app.database.database import engine
+    from app.database.migrations import MigrationError, migrate as apply_pending
+
+    try:
+        applied = apply_pending(engine)
+    except MigrationError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    if applied:
+        for migration in applied:
+            print(f"✅ Applied migration {migration.version}: {migration.description}")
+    else:
+        print("✅ No pending migrations")
+
+
+def seed_superadmins():
+    from app.database.registry import import_all_models
+
+    import_all_models()
+    # super-admin/ is not a package, so load the script by path
+    seed_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'super-admin', 'seed_superadmins.py')
+    spec = importlib.util.spec_from_file_location("seed_superadmins", seed_path)
+    seed_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(seed_module)
+    seed_module.seed_superadmins()
+
+
+def setup():
+    init_db()
+    migrate()
+    if os.getenv('ENVIRONMENT') == 'production':
+        try:
+            seed_superadmins()
+        except Exception as e:
+            print(f"Warning: Could not seed SuperAdmins: {e}")
+
+
+COMMANDS = {
+    "init-db": init_db,
+    "migrate": migrate,
+    "seed-superadmins": seed_superadmins,
+    "setup": setup
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pharmacy backend maintenance commands")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    COMMANDS[args.command]()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,132 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text, Insert, Update, Delete
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
 from app.core.config import settings
+from typing import Optional
+import logging
+import time
+from app.database.pool_metrics import TimedQueuePool, TimedAsyncAdaptedQueuePool, instrument_engine
+
+logger = logging.getLogger(__name__)
 
 # Fix Railway's postgres:// to postgresql://
 database_url = settings.database_url
 if database_url.startswith("postgres://"):
     database_url = database_url.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(database_url)
+def _to_async_url(url: str) -> str:
+    """Map a sync database URL onto its async driver (asyncpg / aiosqlite)"""
+    scheme, sep, rest = url.partition("://")
+    if scheme.startswith("postgresql"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    if scheme.startswith("sqlite"):
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return url
+
+def _pool_kwargs(url: str, poolclass) -> dict:
+    """Pool sizing from Settings; SQLite (local dev) keeps SQLAlchemy's default pool"""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+engine = create_engine(database_url, **_pool_kwargs(database_url, TimedQueuePool))
+instrument_engine(engine, "primary")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for `async def` routes - shares the same database, separate pool.
+# expire_on_commit=False so ORM objects stay readable after commit without
+# triggering lazy loads (which are not allowed on AsyncSession).
+async_database_url = settings.async_database_url or _to_async_url(database_url)
+async_engine = create_async_engine(
+    async_database_url, **_pool_kwargs(async_database_url, TimedAsyncAdaptedQueuePool)
+)
+instrument_engine(async_engine.sync_engine, "primary_async")
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+# Optional read replica for analytics / exports
+read_engine = None
+if settings.read_replica_url:
+    read_replica_url = settings.read_replica_url
+    if read_replica_url.startswith("postgres://"):
+        read_replica_url = read_replica_url.replace("postgres://", "postgresql://", 1)
+    read_engine = create_engine(read_replica_url, **_pool_kwargs(read_replica_url, TimedQueuePool))
+    instrument_engine(read_engine, "replica")
+
+# Replica lag probe result, cached so the check costs one query per interval per worker
+REPLICA_LAG_CHECK_INTERVAL = 10
+_replica_lag = {"checked_at": 0.0, "lag": None}
+
+def replica_lag_seconds() -> Optional[float]:
+    """Replication lag in seconds, or None when no replica is configured or it is unreachable"""
+    if read_engine is None:
+        return None
+    now = time.monotonic()
+    if _replica_lag["checked_at"] and now - _replica_lag["checked_at"] < REPLICA_LAG_CHECK_INTERVAL:
+        return _replica_lag["lag"]
+    lag = 0.0
+    try:
+        if read_engine.dialect.name == "postgresql":
+            with read_engine.connect() as conn:
+                # Caught up (receive == replay) counts as zero lag even when the primary is idle
+                value = conn.execute(text(
+                    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+                )).scalar()
+                lag = float(value or 0.0)
+    except Exception as e:
+        logger.warning(f"Read replica unavailable, using primary: {e}")
+        lag = None
+    _replica_lag["checked_at"] = now
+    _replica_lag["lag"] = lag
+    return lag
+
+def _is_write(clause) -> bool:
+    if isinstance(clause, (Insert, Update, Delete)):
+        return True
+    if isinstance(clause, TextClause):
+        return not clause.text.lstrip().upper().startswith("SELECT")
+    # SELECT ... FOR UPDATE must lock rows on the primary
+    return getattr(clause, "_for_update_arg", None) is not None
+
+class RoutingSession(Session):
+    """
+    Session that sends SELECT-only work to the read replica.
+
+    As soon as the unit of work flushes or issues a write, it sticks to the
+    primary so later reads see its own changes. `max_staleness` (seconds) is
+    the staleness tolerance: if the replica lags further behind, or is
+    unreachable, every statement goes to the primary. None accepts any lag.
+    """
+
+    def __init__(self, *args, max_staleness: Optional[float] = settings.read_replica_max_lag_seconds, **kwargs):
+        super().__init__(*args, **kwargs)
+        lag = replica_lag_seconds()
+        self._use_replica = lag is not None and (max_staleness is None or lag <= max_staleness)
+        self._wrote = False
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or _is_write(clause):
+            self._wrote = True
+        if self._use_replica and not self._wrote:
+            return read_engine
+        return engine
+
+ReadSessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
+
 Base = declarative_base()
 
 def get_db():
@@ -18,4 +134,17 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_read_db():
+    """Session for heavy read-only routes (analytics, exports): replica when fresh enough"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    """Async counterpart of get_db for `async def` routes"""
+    async with AsyncSessionLocal() as db:
+        yield db
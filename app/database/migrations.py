@@ -0,0 +1,228 @@
+"""
+Versioned schema migrations
+create_all only creates missing tables, so columns, indexes and constraints
+added to existing tables are shipped here as numbered migrations and
+recorded in schema_migrations. Run once per deploy with `python -m app.cli migrate`
+(`setup` runs it after init-db).
+
+Index builds use CREATE INDEX CONCURRENTLY on PostgreSQL so shops keep
+billing while they run; each statement then executes outside a transaction.
+Other databases (SQLite in development) get the plain statement, and skip
+PostgreSQL-only migrations (pg_trgm) while still recording them.
+
+Migrations marked optional (unique keys over data that may hold
+duplicates, the pg_trgm extension) never block a deploy: when a precheck
+or statement fails they are logged and left pending, and the next
+`migrate` tries them again.
+"""
+import logging
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    statements: List[str]
+    # (description, query returning offending rows) that must be empty first,
+    # e.g. duplicates that would make a unique index build fail
+    prechecks: List[Tuple[str, str]] = field(default_factory=list)
+    # PostgreSQL-specific DDL (extensions, GIN indexes); other databases only record the version
+    postgres_only: bool = False
+    # (table, column, type) added before the statements unless the column exists
+    # (databases created after the model change already have it)
+    columns: List[Tuple[str, str, str]] = field(default_factory=list)
+    # Optional migrations log a failed precheck or statement and stay pending instead of stopping `migrate`
+    required: bool = True
+
+
+MIGRATIONS = [
+    Migration(
+        version=1,
+        description="Composite indexes for hot multi-tenant query shapes",
+        statements=[
+            # Bill lists, analytics and bill numbering: shop + time range
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_bills_shop_created ON bills (shop_id, created_at)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_bill_items_bill_id ON bill_items (bill_id)",
+            # Stock lookups by product/batch (also serves shop + product_name ordering and prefix search);
+            # non-unique so it builds over duplicate batches, migration 4 adds the unique version
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_stock_items_shop_product_batch "
+            "ON stock_items_audit (shop_id, product_name, batch_number)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_attendance_records_staff_shop_date "
+            "ON attendance_records (staff_id, shop_id, date)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notification_reads_notification_staff "
+            "ON notification_reads (notification_id, staff_id)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_purchase_invoices_shop_created "
+            "ON purchase_invoices (shop_id, created_at)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_purchase_invoice_items_shop_product "
+            "ON purchase_invoice_items (shop_id, product_name)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_purchase_invoice_items_invoice_id "
+            "ON purchase_invoice_items (invoice_id)",
+        ]
+    ),
+    Migration(
+        version=2,
+        description="Trigram indexes for medicine search",
+        postgres_only=True,
+        # pg_trgm may be unavailable (no privilege, PostgreSQL < 13): search then falls back to ILIKE
+        required=False,
+        statements=[
+            # Trusted extension since PostgreSQL 13: the database owner can create it
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            # Serve the POS typeahead's ILIKE '%term%' and similarity matches
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_stock_items_product_name_trgm "
+            "ON stock_items_audit USING gin (product_name gin_trgm_ops)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_stock_items_manufacturer_trgm "
+            "ON stock_items_audit USING gin (manufacturer gin_trgm_ops)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_stock_items_batch_number_trgm "
+            "ON stock_items_audit USING gin (batch_number gin_trgm_ops)",
+        ]
+    ),
+    Migration(
+        version=3,
+        description="Client ids for offline bill sync",
+        columns=[("bills", "client_id", "VARCHAR(64)")],
+        statements=[
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_bills_shop_client_id ON bills (shop_id, client_id)",
+        ]
+    ),
+    Migration(
+        version=4,
+        description="Unique stock item and daily record keys",
+        # Older databases may hold duplicates: skip (and retry next deploy) until they are merged
+        required=False,
+        prechecks=[
+            ("duplicate stock items per shop/product/batch", """
+                SELECT shop_id, product_name, batch_number, COUNT(*) AS copies
+                FROM stock_items_audit
+                GROUP BY shop_id, product_name, batch_number
+                HAVING COUNT(*) > 1
+                LIMIT 20
+            """),
+            ("duplicate daily records per shop/date", """
+                SELECT shop_id, record_date, COUNT(*) AS copies
+                FROM daily_records
+                GROUP BY shop_id, record_date
+                HAVING COUNT(*) > 1
+                LIMIT 20
+            """),
+        ],
+        statements=[
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_stock_items_shop_product_batch "
+            "ON stock_items_audit (shop_id, product_name, batch_number)",
+            # The unique index serves the same lookups; stop maintaining both
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_stock_items_shop_product_batch",
+            # Declared on the model since the table was added; older databases may lack it
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_daily_records_shop_date "
+            "ON daily_records (shop_id, record_date)",
+        ]
+    ),
+]
+
+_INDEX_NAME = re.compile(r"INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.IGNORECASE)
+
+
+class MigrationError(Exception):
+    pass
+
+
+def _ensure_version_table(conn: Connection):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP NOT NULL
+        )
+    """))
+
+
+def applied_versions(engine: Engine) -> set:
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def _drop_invalid_index(conn: Connection, statement: str):
+    """A failed CONCURRENTLY build leaves an INVALID index that IF NOT EXISTS would silently keep"""
+    match = _INDEX_NAME.search(statement)
+    if not match:
+        return
+    invalid = conn.execute(text("""
+        SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname = :name AND NOT i.indisvalid
+    """), {"name": match.group(1)}).first()
+    if invalid:
+        logger.warning(f"Dropping invalid index {match.group(1)} left by an earlier failed build")
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {match.group(1)}"))
+
+
+def _run_prechecks(conn: Connection, migration: Migration):
+    for description, query in migration.prechecks:
+        rows = conn.execute(text(query)).fetchall()
+        if rows:
+            sample = "; ".join(str(tuple(row)) for row in rows[:5])
+            raise MigrationError(
+                f"Migration {migration.version} blocked by {description} ({len(rows)}+ groups, e.g. {sample}). "
+                f"Merge or remove the duplicates and re-run."
+            )
+
+
+def apply_migration(engine: Engine, migration: Migration):
+    try:
+        _apply_statements(engine, migration)
+    except SQLAlchemyError as e:
+        if migration.required:
+            raise
+        raise MigrationError(f"Migration {migration.version} failed: {e}") from e
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)"),
+            {"v": migration.version, "d": migration.description, "t": datetime.now()}
+        )
+
+
+def _apply_statements(engine: Engine, migration: Migration):
+    postgres = engine.dialect.name == "postgresql"
+    # CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        _run_prechecks(conn, migration)
+        for table, column, column_type in migration.columns:
+            if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+                statement = f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"
+                logger.info(f"  {statement}")
+                conn.execute(text(statement))
+        statements = migration.statements if postgres or not migration.postgres_only else []
+        for statement in statements:
+            if postgres:
+                _drop_invalid_index(conn, statement)
+            else:
+                statement = statement.replace(" CONCURRENTLY", "")
+            logger.info(f"  {statement}")
+            conn.execute(text(statement))
+
+
+def migrate(engine: Engine, target: Optional[int] = None) -> List[Migration]:
+    """Apply pending migrations in order (up to `target`); returns those applied"""
+    done = applied_versions(engine)
+    pending = [m for m in sorted(MIGRATIONS, key=lambda m: m.version)
+               if m.version not in done and (target is None or m.version <= target)]
+    applied = []
+    for migration in pending:
+        logger.info(f"Applying migration {migration.version}: {migration.description}")
+        try:
+            apply_migration(engine, migration)
+        except MigrationError as e:
+            if migration.required:
+                raise
+            logger.warning(f"Skipped optional migration {migration.version}, it stays pending: {e}")
+            continue
+        applied.append(migration)
+    return applied
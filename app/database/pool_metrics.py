@@ -0,0 +1,181 @@
+"""
+Connection pool telemetry
+Tracks checkout wait time, pool occupancy and timeouts per engine so pool
+sizes can be tuned per uvicorn worker
+"""
+import logging
+import threading
+import time
+from typing import Dict
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from app.utils.metrics import record_query
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the checkout wait-time histogram buckets
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class PoolStats:
+    """Thread-safe counters for a single connection pool"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.peak_checked_out = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.checked_out_histogram: Dict[int, int] = {}
+
+    def record_wait(self, wait_ms: float):
+        with self._lock:
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+            for i, bound in enumerate(WAIT_BUCKETS_MS):
+                if wait_ms <= bound:
+                    self.wait_buckets[i] += 1
+                    break
+            else:
+                self.wait_buckets[-1] += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.checkout_timeouts += 1
+
+    def record_checkout(self, checked_out: int):
+        with self._lock:
+            self.checkouts += 1
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+            self.checked_out_histogram[checked_out] = self.checked_out_histogram.get(checked_out, 0) + 1
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def record_invalidate(self):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self, pool) -> dict:
+        """Counters plus the pool's live gauges"""
+        with self._lock:
+            timed = sum(self.wait_buckets)
+            histogram = {f"le_{bound}ms": self.wait_buckets[i] for i, bound in enumerate(WAIT_BUCKETS_MS)}
+            histogram["gt_5000ms"] = self.wait_buckets[-1]
+            data = {
+                "pool_class": type(pool).__name__,
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "peak_checked_out": self.peak_checked_out,
+                "wait_ms": {
+                    "avg": round(self.wait_total_ms / timed, 3) if timed else 0.0,
+                    "max": round(self.wait_max_ms, 3),
+                    "histogram": histogram
+                },
+                "checked_out_histogram": dict(sorted(self.checked_out_histogram.items()))
+            }
+
+        # Gauges only exist on queue-based pools (SQLite may use Static/Singleton pools)
+        for key, attr in (("size", "size"), ("checked_in", "checkedin"),
+                          ("checked_out", "checkedout"), ("overflow", "overflow"),
+                          ("timeout_seconds", "timeout")):
+            fn = getattr(pool, attr, None)
+            data[key] = fn() if callable(fn) else None
+        data["max_overflow"] = getattr(pool, "_max_overflow", None)
+        return data
+
+
+class _TimedPoolMixin:
+    """Times how long each checkout waits for a free connection"""
+
+    stats: PoolStats = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            if self.stats:
+                self.stats.record_timeout()
+            raise
+        if self.stats:
+            self.stats.record_wait((time.perf_counter() - start) * 1000)
+        return conn
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep the same counters
+        new_pool = super().recreate()
+        new_pool.stats = self.stats
+        return new_pool
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+_registry: Dict[str, tuple] = {}
+
+
+def instrument_engine(engine, name: str) -> PoolStats:
+    """Attach PoolStats to a (sync) engine's pool and register pool and query-timing event listeners"""
+    stats = PoolStats(name)
+    engine.pool.stats = stats
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        stats.record_connect()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checkedout = getattr(engine.pool, "checkedout", None)
+        stats.record_checkout(checkedout() if callable(checkedout) else 0)
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        stats.record_invalidate()
+
+    # Per-request DB time for the request metrics
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        record_query(time.perf_counter() - conn.info["query_start"].pop(), statement)
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+    _registry[name] = (engine, stats)
+    return stats
+
+
+def get_pool_stats() -> Dict[str, dict]:
+    """Snapshot of every instrumented pool, keyed by engine name"""
+    return {name: stats.snapshot(engine.pool) for name, (engine, stats) in _registry.items()}
+
+
+def log_pool_stats():
+    """Emit one compact log line per pool (scheduled periodically)"""
+    for name, data in get_pool_stats().items():
+        logger.info(
+            f"DB pool [{name}] size={data['size']} checked_out={data['checked_out']} "
+            f"overflow={data['overflow']} peak={data['peak_checked_out']} "
+            f"checkouts={data['checkouts']} timeouts={data['checkout_timeouts']} "
+            f"wait_avg_ms={data['wait_ms']['avg']} wait_max_ms={data['wait_ms']['max']}"
+        )
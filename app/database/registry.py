@@ -0,0 +1,30 @@
+"""
+Model registry
+Imports every module that declares tables on Base so the metadata is
+complete (create_all, relationship resolution) regardless of which routers
+have been imported.
+"""
+import importlib
+
+MODEL_MODULES = (
+    "modules.auth.models",
+    "modules.auth.otp.models",
+    "modules.auth.distributor.models",
+    "modules.auth.salary_management.models",
+    "modules.auth.attendance.models",
+    "modules.auth.rbac.models",
+    "modules.customer_tracking.models",
+    "modules.stock_audit_v2.models",
+    "modules.billing_v2.models",
+    "modules.billing_v2.daily_records_models",
+    "modules.notifications.models",
+    "modules.invoice_analyzer_v2.models",
+    "modules.distributor_invoice.models",
+    "modules.feedback.models",
+    "app.utils.idempotency",
+)
+
+
+def import_all_models():
+    for name in MODEL_MODULES:
+        importlib.import_module(name)
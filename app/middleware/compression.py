@@ -0,0 +1,181 @@
+"""
+Response compression
+gzip (or brotli when installed and preferred by the client) for responses
+above COMPRESSION_MIN_SIZE. Bodies are buffered only up to that threshold,
+so StreamingResponse exports stay streamed: once the threshold is crossed
+every chunk is compressed as it arrives. Media types that are already
+compressed (images, PDFs, archives) and responses that carry their own
+Content-Encoding pass through untouched. openpyxl's xlsx exports are
+included: they still shrink by about two thirds.
+"""
+import gzip
+import io
+import logging
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+    logger.info("brotli not installed. Responses are compressed with gzip only.")
+
+# Already compressed, or not worth the CPU
+SKIP_MEDIA_PREFIXES = ("image/", "video/", "audio/", "font/woff")
+SKIP_MEDIA_TYPES = {
+    "application/pdf",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-7z-compressed",
+    "application/octet-stream",
+    "text/event-stream",  # must reach the client event by event
+}
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported coding from an Accept-Encoding header (honours q=0)"""
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        offered[coding.strip()] = quality
+    candidates = ["br", "gzip"] if BROTLI_AVAILABLE and settings.compression_brotli else ["gzip"]
+    scored = [(offered.get(c, offered.get("*", 0.0)), -i, c) for i, c in enumerate(candidates)]
+    quality, _, coding = max(scored)
+    return coding if quality > 0 else None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=settings.compression_brotli_quality)
+        else:
+            self._brotli = None
+            self._buffer = io.BytesIO()
+            self._gzip = gzip.GzipFile(mode="wb", fileobj=self._buffer, compresslevel=settings.compression_gzip_level)
+
+    def compress(self, data: bytes) -> bytes:
+        if self._brotli:
+            return self._brotli.process(data)
+        self._gzip.write(data)
+        return self._drain()
+
+    def finish(self) -> bytes:
+        if self._brotli:
+            return self._brotli.finish()
+        self._gzip.close()
+        return self._drain()
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+
+class CompressionMiddleware:
+    """Compresses large, compressible responses; small ones are sent as-is"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        pending = []  # body chunks held back until the threshold decision
+        pending_size = 0
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message: Message):
+            nonlocal start, pending_size, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if not self._compressible(message["status"], headers):
+                    passthrough = True
+                    await send(message)
+                    return
+                content_length = headers.get("content-length", "")
+                if content_length.isdigit() and int(content_length) < settings.compression_min_size:
+                    MutableHeaders(scope=message).add_vary_header("Accept-Encoding")
+                    passthrough = True
+                    await send(message)
+                    return
+                start = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            if compressor is not None:
+                data = compressor.compress(body)
+                if not more_body:
+                    data += compressor.finish()
+                if data or not more_body:
+                    await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+
+            pending.append(body)
+            pending_size += len(body)
+            if pending_size < settings.compression_min_size:
+                if more_body:
+                    return
+                # Whole response is below the threshold: send it unchanged
+                MutableHeaders(scope=start).add_vary_header("Accept-Encoding")
+                passthrough = True
+                await send(start)
+                await send({"type": "http.response.body", "body": b"".join(pending), "more_body": False})
+                return
+
+            compressor = _Compressor(encoding)
+            data = compressor.compress(b"".join(pending))
+            pending.clear()
+            headers = MutableHeaders(scope=start)
+            headers["Content-Encoding"] = encoding
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                # Bytes on the wire differ from the identity response
+                headers["ETag"] = f"W/{etag}"
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                data += compressor.finish()
+                headers["Content-Length"] = str(len(data))
+            await send(start)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _compressible(status_code: int, headers: Headers) -> bool:
+        if status_code < 200 or status_code in (204, 206, 304):
+            return False
+        if "content-encoding" in headers or "no-transform" in headers.get("cache-control", ""):
+            return False
+        media_type = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+        return not (media_type in SKIP_MEDIA_TYPES or media_type.startswith(SKIP_MEDIA_PREFIXES))
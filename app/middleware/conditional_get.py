@@ -0,0 +1,50 @@
+import hashlib
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.utils.etag import HASH_SCOPE_KEY, etag_matches, make_etag
+
+class ConditionalGetMiddleware:
+    """Content-hash ETags and 304s for routes marked by @etag_route (versioned ETags are handled in the route)"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        start: Message = {}
+        chunks = []
+        passthrough = False
+
+        async def send_wrapper(message: Message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # The route has run by now, so the marker is already on the scope
+                if not scope.get(HASH_SCOPE_KEY) or message["status"] != 200 or "etag" in Headers(raw=message["headers"]):
+                    passthrough = True
+                    await send(message)
+                    return
+                start = message
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            etag = make_etag(hashlib.sha1(body).hexdigest())
+            headers = MutableHeaders(scope=start)
+            headers["ETag"] = etag
+            if etag_matches(Headers(scope=scope).get("if-none-match"), etag):
+                start["status"] = 304
+                for name in ("content-length", "content-type"):
+                    del headers[name]
+                body = b""
+            await send(start)
+            await send({"type": "http.response.body", "body": body, "more_body": False})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,73 @@
+import time
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+from app.utils.metrics import RequestStats, current_request, record_request, registry
+from app.utils.query_budget import QueryBudgetExceeded, check_request
+
+class MetricsMiddleware:
+    """Per-route latency, status, DB and external-call time for /metrics"""
+
+    # Not measured (scrapes and probes would drown the real traffic)
+    SKIP_PATHS = {"/metrics", "/health", "/health/db-pool", "/health/cache"}
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.SKIP_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+        # Strict query budgets hold the response start back until the body is ready,
+        # so an exceeded budget can still become a 500 instead of following a sent 200
+        held_start = None
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code, held_start
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.sql_debug_headers:
+                    headers = MutableHeaders(scope=message)
+                    headers["X-DB-Queries"] = str(stats.db_queries)
+                    headers["X-DB-Time"] = f"{stats.db_time * 1000:.1f}ms"
+                if settings.query_budget_strict:
+                    held_start = message
+                    return
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                try:
+                    check_request(scope["method"], self._route_template(scope, status_code),
+                                  scope.get("endpoint"), stats)
+                except QueryBudgetExceeded:
+                    if held_start is not None:
+                        status_code = 500
+                    raise
+            if held_start is not None:
+                start, held_start = held_start, None
+                await send(start)
+            await send(message)
+
+        registry.inc("http_requests_in_flight")
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            registry.inc("http_requests_in_flight", value=-1)
+            current_request.reset(token)
+            route = self._route_template(scope, status_code)
+            record_request(scope["method"], route, status_code, duration, stats)
+
+    @staticmethod
+    def _route_template(scope: Scope, status_code: int) -> str:
+        # Templates like /api/billing/bills/{bill_id} keep label cardinality bounded
+        route = scope.get("route")
+        path = getattr(route, "path", None)
+        if path:
+            return path
+        if scope["path"].startswith("/uploads/"):
+            return "/uploads"
+        return "unmatched" if status_code == 404 else "other"
@@ -1,10 +1,10 @@
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from typing import Optional
 from starlette.responses import JSONResponse
-from app.services.redis_service import redis_service
-import time
+from starlette.types import ASGIApp, Receive, Scope, Send
+from modules.auth.middleware import resolve_token_data
+from app.services.rate_limiter import rate_limiter, Bucket
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+class RateLimitMiddleware:
     """User-type-based rate limiting optimized for 100k users"""
     
     # User type limits (requests per minute)
@@ -44,7 +44,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
     
     # Skip rate limiting entirely
     SKIP_RATE_LIMIT = [
-        "/", "/health", "/modules",
+        "/", "/health", "/health/db-pool", "/health/cache", "/metrics", "/modules",
         # SuperAdmin endpoints - no rate limits for superadmins
         "/api/auth/super-admin/send-otp",
         "/api/auth/super-admin/verify-otp",
@@ -88,53 +88,57 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             }
         )
     
-    async def dispatch(self, request: Request, call_next):
-        if request.url.path in self.SKIP_RATE_LIMIT or request.method == "OPTIONS":
-            return await call_next(request)
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        response = await self._check(scope)
+        if response is not None:
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+    
+    async def _check(self, scope: Scope) -> Optional[JSONResponse]:
+        """Return a 429 response if the request is over any limit, else None"""
+        path = scope["path"]
+        if path in self.SKIP_RATE_LIMIT or scope["method"] == "OPTIONS":
+            return None
         
         # Check skip patterns
         for pattern in self.SKIP_PATTERNS:
-            if pattern in request.url.path:
-                return await call_next(request)
-        
-        # Extract user_type from JWT token directly (middleware order issue)
-        user_type = 'anonymous'
-        auth_header = request.headers.get("Authorization")
-        if auth_header and auth_header.startswith("Bearer "):
-            try:
-                from modules.auth.service import AuthService
-                token = auth_header.split(" ")[1]
-                token_data = AuthService.decode_token(token)
-                if token_data:
-                    user_type = token_data.user_type
-                    user_id = token_data.user_id
-                    org_id = getattr(token_data, 'organization_id', None)
-                else:
-                    user_id = None
-                    org_id = None
-            except:
-                user_id = None
-                org_id = None
-        else:
-            user_id = getattr(request.state, 'user_id', None)
-            org_id = getattr(request.state, 'organization_id', None)
+            if pattern in path:
+                return None
         
-        client_ip = request.client.host
+        # Decoded once per request; inner middleware and get_current_user reuse it
+        token_data = resolve_token_data(scope)
+        user_type = token_data.user_type if token_data else 'anonymous'
+        user_id = token_data.user_id if token_data else None
+        org_id = token_data.organization_id if token_data else None
+        
+        client_ip = scope["client"][0] if scope.get("client") else "unknown"
         
         # Skip rate limiting for SuperAdmins entirely
         if user_type == 'super_admin':
-            return await call_next(request)
+            return None
         
         # High-frequency endpoints (lightweight limits)
-        if request.url.path in self.HIGH_FREQUENCY_LIMITS:
-            config = self.HIGH_FREQUENCY_LIMITS[request.url.path]
-            key = f"rl:hf:{request.url.path}:{user_id or client_ip}"
-            if not await redis_service.check_rate_limit(key, config["limit"], config["window"]):
-                return self._create_rate_limit_response(config["window"])
-            return await call_next(request)  # Skip other checks for performance
+        if path in self.HIGH_FREQUENCY_LIMITS:
+            config = self.HIGH_FREQUENCY_LIMITS[path]
+            key = f"rl:hf:{path}:{user_id or client_ip}"
+            decision = await rate_limiter.hit([Bucket(key, config["limit"], config["window"])])
+            if not decision.allowed:
+                return self._create_rate_limit_response(decision.retry_after)
+            return None  # Skip other checks for performance
+        
+        # Endpoint, user and organization buckets are checked in a single atomic call
+        buckets = []
         
         # Endpoint-specific limits (use user_id if available, else IP)
-        endpoint_path = request.url.path
+        endpoint_path = path
         endpoint_config = None
         
         # Check exact match first
@@ -149,25 +153,22 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         
         if endpoint_config:
             key = f"rl:ep:{endpoint_path}:{user_id or client_ip}"
-            if not await redis_service.check_rate_limit(key, endpoint_config["limit"], endpoint_config["window"]):
-                return self._create_rate_limit_response(endpoint_config["window"])
+            buckets.append(Bucket(key, endpoint_config["limit"], endpoint_config["window"]))
         
         # User-level rate limit (authenticated users)
         if user_id:
             limit = self.USER_TYPE_LIMITS.get(user_type, 100)
-            key = f"rl:u:{user_id}"
-            if not await redis_service.check_rate_limit(key, limit, 60):
-                return self._create_rate_limit_response(60)
+            buckets.append(Bucket(f"rl:u:{user_type}:{user_id}", limit, 60))
         else:
             # Anonymous users - IP-based rate limit
-            key = f"rl:anon:{client_ip}"
-            if not await redis_service.check_rate_limit(key, self.USER_TYPE_LIMITS["anonymous"], 60):
-                return self._create_rate_limit_response(60)
+            buckets.append(Bucket(f"rl:anon:{client_ip}", self.USER_TYPE_LIMITS["anonymous"], 60))
         
         # Organization-level rate limit
         if org_id:
-            key = f"rl:org:{org_id}"
-            if not await redis_service.check_rate_limit(key, 5000, 60):
-                return self._create_rate_limit_response(60)
+            buckets.append(Bucket(f"rl:org:{org_id}", 5000, 60))
+        
+        decision = await rate_limiter.hit(buckets)
+        if not decision.allowed:
+            return self._create_rate_limit_response(decision.retry_after)
         
-        return await call_next(request)
+        return None
@@ -29,7 +29,7 @@ class CacheService:
     async def get_cached_stock(shop_code: str) -> List[Dict]:
         """Get cached stock items"""
         key = f"stock:{shop_code}"
-        data = redis_service.redis_client.get(key)
+        data = await redis_service.redis_client.get(key)
         return json.loads(data) if data else []
     
     @staticmethod
@@ -43,11 +43,9 @@ class CacheService:
         )
     
     @staticmethod
-    async def invalidate_cache(pattern: str):
-        """Invalidate cache by pattern"""
-        keys = redis_service.redis_client.keys(pattern)
-        if keys:
-            redis_service.redis_client.delete(*keys)
+    async def invalidate_cache(pattern: str) -> int:
+        """Invalidate cache by pattern (incremental SCAN, safe on large keyspaces)"""
+        return await redis_service.delete_pattern(pattern)
     
     @staticmethod
     async def cache_customer_search(shop_code: str, phone: str, customer_data: Dict):
@@ -0,0 +1,155 @@
+"""
+Atomic sliding-window rate limiter
+All buckets for a request (endpoint, user, organization) are checked and
+consumed in one Redis round trip by a Lua script. The window is the usual
+two-counter approximation: the previous fixed window's count is weighted by
+how much of it still overlaps the sliding window. A rejected request consumes
+nothing. If Redis is unreachable the same algorithm runs in process memory
+(limits then apply per worker) until Redis comes back.
+"""
+import asyncio
+import logging
+import math
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import redis.asyncio as redis
+from app.core.config import settings
+from app.services.redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+
+class Bucket(NamedTuple):
+    key: str
+    limit: int
+    window: int  # seconds
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    retry_after: int  # seconds, 0 when allowed
+    bucket: Optional[Bucket]  # bucket that rejected the request
+
+
+# KEYS: current and previous window counter for each bucket, interleaved
+# ARGV: for each bucket -> limit, window_ms, elapsed_ms (time since the current window started)
+# Returns {1} when allowed, {0, bucket_index, retry_after_ms} when rejected
+SLIDING_WINDOW_LUA = """
+local n = #KEYS / 2
+for i = 1, n do
+    local limit = tonumber(ARGV[i * 3 - 2])
+    local window = tonumber(ARGV[i * 3 - 1])
+    local elapsed = tonumber(ARGV[i * 3])
+    local cur = tonumber(redis.call('GET', KEYS[i * 2 - 1]) or '0')
+    local prev = tonumber(redis.call('GET', KEYS[i * 2]) or '0')
+    if prev * (window - elapsed) / window + cur + 1 > limit then
+        return {0, i, window - elapsed}
+    end
+end
+for i = 1, n do
+    local window = tonumber(ARGV[i * 3 - 1])
+    redis.call('INCR', KEYS[i * 2 - 1])
+    redis.call('PEXPIRE', KEYS[i * 2 - 1], window * 2)
+end
+return {1}
+"""
+
+
+def _window_keys(bucket: Bucket, now: float) -> Tuple[str, str, int]:
+    window_ms = bucket.window * 1000
+    now_ms = int(now * 1000)
+    index = now_ms // window_ms
+    elapsed = now_ms - index * window_ms
+    return f"{bucket.key}:{index}", f"{bucket.key}:{index - 1}", elapsed
+
+
+class _LocalWindows:
+    """In-process version of the Lua script, used while Redis is down"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._counts: Dict[str, Tuple[int, float]] = {}  # window key -> (count, expires_at)
+        self._lock = threading.Lock()
+
+    def _count(self, key: str, now: float) -> int:
+        entry = self._counts.get(key)
+        if entry is None or entry[1] <= now:
+            return 0
+        return entry[0]
+
+    def hit(self, buckets: List[Bucket], now: float) -> Decision:
+        with self._lock:
+            windows = [_window_keys(b, now) for b in buckets]
+            for bucket, (cur_key, prev_key, elapsed) in zip(buckets, windows):
+                window_ms = bucket.window * 1000
+                estimate = self._count(prev_key, now) * (window_ms - elapsed) / window_ms + self._count(cur_key, now)
+                if estimate + 1 > bucket.limit:
+                    return Decision(False, math.ceil((window_ms - elapsed) / 1000), bucket)
+            for bucket, (cur_key, _, _) in zip(buckets, windows):
+                self._counts[cur_key] = (self._count(cur_key, now) + 1, now + bucket.window * 2)
+            if len(self._counts) > self.max_keys:
+                self._counts = {k: v for k, v in self._counts.items() if v[1] > now}
+        return Decision(True, 0, None)
+
+
+class SlidingWindowRateLimiter:
+    def __init__(self, client: redis.Redis, timeout: float = 0.25, retry_after: int = 30):
+        self.client = client
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._script = client.register_script(SLIDING_WINDOW_LUA)
+        self._local = _LocalWindows()
+        self._down_until = 0.0
+
+        # Counters
+        self.allowed = 0
+        self.rejected = 0
+        self.fallbacks = 0
+
+    async def hit(self, buckets: List[Bucket]) -> Decision:
+        """Check every bucket and, only if all have room, count the request against each"""
+        if not buckets:
+            return Decision(True, 0, None)
+
+        now = time.time()
+        decision = None
+        if time.monotonic() >= self._down_until:
+            decision = await self._hit_redis(buckets, now)
+        if decision is None:
+            self.fallbacks += 1
+            decision = self._local.hit(buckets, now)
+
+        if decision.allowed:
+            self.allowed += 1
+        else:
+            self.rejected += 1
+        return decision
+
+    async def _hit_redis(self, buckets: List[Bucket], now: float) -> Optional[Decision]:
+        keys, args = [], []
+        for bucket in buckets:
+            cur_key, prev_key, elapsed = _window_keys(bucket, now)
+            keys += [cur_key, prev_key]
+            args += [bucket.limit, bucket.window * 1000, elapsed]
+        try:
+            result = await asyncio.wait_for(self._script(keys=keys, args=args), self.timeout)
+        except (redis.RedisError, asyncio.TimeoutError, OSError) as e:
+            self._down_until = time.monotonic() + self.retry_after
+            logger.warning(f"Rate limiter falling back to in-process counters for {self.retry_after}s: {e!r}")
+            return None
+
+        if result[0] == 1:
+            return Decision(True, 0, None)
+        return Decision(False, max(math.ceil(result[2] / 1000), 1), buckets[result[1] - 1])
+
+    def stats(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "fallback_checks": self.fallbacks,
+            "redis_available": time.monotonic() >= self._down_until
+        }
+
+
+rate_limiter = SlidingWindowRateLimiter(redis_service.redis_client, timeout=settings.rate_limit_redis_timeout)
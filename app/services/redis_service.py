@@ -1,49 +1,91 @@
-import redis
+import redis.asyncio as redis
 import json
-from typing import Optional, Any
+from typing import Optional, Any, Callable, Dict, Iterable, List
 from app.core.config import settings
 
 class RedisService:
     def __init__(self):
-        # Connection pool for handling multiple concurrent connections
+        # Connection pool shared by every request in this worker; connections are opened lazily
         self.redis_pool = redis.ConnectionPool.from_url(
             settings.redis_url,
             max_connections=settings.redis_max_connections,
             retry_on_timeout=settings.redis_retry_on_timeout,
             socket_keepalive=settings.redis_socket_keepalive,
-            socket_keepalive_options=settings.redis_socket_keepalive_options
+            socket_keepalive_options=settings.redis_socket_keepalive_options,
+            decode_responses=True
         )
-        self.redis_client = redis.Redis(connection_pool=self.redis_pool, decode_responses=True)
+        self.redis_client = redis.Redis(connection_pool=self.redis_pool)
+    
+    # Pipelining
+    async def pipeline(self, build: Callable[[Any], Any], transaction: bool = False) -> List[Any]:
+        """Queue several commands and send them in one round trip
+
+            results = await redis_service.pipeline(lambda p: (p.get("a"), p.incr("b")))
+        """
+        async with self.redis_client.pipeline(transaction=transaction) as pipe:
+            build(pipe)
+            return await pipe.execute()
+    
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Optional[Any]]:
+        """Fetch several JSON values at once (missing keys map to None)"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = await self.redis_client.mget(keys)
+        return {k: json.loads(v) if v else None for k, v in zip(keys, values)}
+    
+    async def set_many(self, items: Dict[str, Any], expire: int):
+        """Store several JSON values with the same expiry in one round trip"""
+        if not items:
+            return
+        await self.pipeline(
+            lambda p: [p.setex(k, expire, json.dumps(v)) for k, v in items.items()]
+        )
+    
+    async def delete_pattern(self, pattern: str, batch_size: int = 500) -> int:
+        """Delete keys matching a glob pattern using SCAN (never blocks Redis like KEYS)"""
+        deleted = 0
+        batch = []
+        async for key in self.redis_client.scan_iter(match=pattern, count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                deleted += await self.redis_client.unlink(*batch)
+                batch = []
+        if batch:
+            deleted += await self.redis_client.unlink(*batch)
+        return deleted
     
     # Session Management
     async def set_session(self, session_id: str, data: dict, expire: int = 3600):
         """Store user session with expiration"""
-        return self.redis_client.setex(f"session:{session_id}", expire, json.dumps(data))
+        return await self.redis_client.setex(f"session:{session_id}", expire, json.dumps(data))
     
     async def get_session(self, session_id: str) -> Optional[dict]:
         """Get user session data"""
-        data = self.redis_client.get(f"session:{session_id}")
+        data = await self.redis_client.get(f"session:{session_id}")
         return json.loads(data) if data else None
     
     # Cache frequently accessed data
     async def cache_shop_data(self, shop_code: str, data: dict, expire: int = 300):
         """Cache shop configuration and staff data"""
-        return self.redis_client.setex(f"shop:{shop_code}", expire, json.dumps(data))
+        return await self.redis_client.setex(f"shop:{shop_code}", expire, json.dumps(data))
     
     async def get_shop_data(self, shop_code: str) -> Optional[dict]:
-        data = self.redis_client.get(f"shop:{shop_code}")
+        data = await self.redis_client.get(f"shop:{shop_code}")
         return json.loads(data) if data else None
     
     # Rate limiting
     async def check_rate_limit(self, key: str, limit: int, window: int) -> bool:
         """Check if request is within rate limit"""
-        current = self.redis_client.get(key)
-        if current is None:
-            self.redis_client.setex(key, window, 1)
-            return True
-        elif int(current) < limit:
-            self.redis_client.incr(key)
-            return True
-        return False
+        # INCR first so concurrent requests cannot both see the same count
+        current = await self.redis_client.incr(key)
+        if current == 1:
+            await self.redis_client.expire(key, window)
+        return current <= limit
+    
+    async def close(self):
+        """Release pooled connections (called on application shutdown)"""
+        await self.redis_client.aclose()
+        await self.redis_pool.disconnect()
 
-redis_service = RedisService()
\ No newline at end of file
+redis_service = RedisService()
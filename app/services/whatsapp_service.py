@@ -1,5 +1,6 @@
 import requests
 from app.core.config import settings
+from app.utils.metrics import track_external
 
 def send_whatsapp_alert(message: str, phone_number: str = None):
     """Send WhatsApp alert using WhatsApp Business API"""
@@ -20,7 +21,8 @@ def send_whatsapp_alert(message: str, phone_number: str = None):
     }
     
     try:
-        response = requests.post(settings.whatsapp_api_url, headers=headers, json=data)
+        with track_external("whatsapp"):
+            response = requests.post(settings.whatsapp_api_url, headers=headers, json=data)
         return response.json()
     except Exception as e:
         print(f"Failed to send WhatsApp message: {e}")
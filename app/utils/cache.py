@@ -1,54 +1,161 @@
 """
-Simple in-memory cache for dashboard endpoints
-Prevents database overload from frequent polling
+Bounded in-memory cache for dashboard endpoints
+Prevents database overload from frequent polling while keeping memory flat:
+LRU eviction by entry count and approximate byte size, TTL expiry with a
+background sweep, and thread safety for sync routes running in the threadpool
 """
-from datetime import datetime
+import sys
+import threading
+import time
+from collections import OrderedDict
 from typing import Any, Optional
+from app.core.config import settings
 
-class SimpleCache:
-    def __init__(self):
-        self._cache = {}
-        self._timestamps = {}
-        self._ttls = {}
 
-    def get(self, key: str, ttl_seconds: int = 60) -> Optional[Any]:
-        """Get cached value if not expired"""
-        if key not in self._cache:
-            return None
+def _estimate_size(value: Any, _depth: int = 0) -> int:
+    """Approximate deep size in bytes (bounded recursion, good enough for budgeting)"""
+    size = sys.getsizeof(value)
+    if _depth > 6:
+        return size
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += _estimate_size(k, _depth + 1) + _estimate_size(v, _depth + 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += _estimate_size(item, _depth + 1)
+    elif hasattr(value, "__dict__"):
+        size += _estimate_size(vars(value), _depth + 1)
+    return size
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "size")
+
+    def __init__(self, value: Any, expires_at: float, size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+
+
+class BoundedTTLCache:
+    def __init__(self, max_entries: int = 5000, max_bytes: int = 64 * 1024 * 1024, sweep_interval: int = 60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._data: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self._sweeper: Optional[threading.Thread] = None
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remove(self, key: str):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
 
-        effective_ttl = self._ttls.get(key, ttl_seconds)
-        age = (datetime.now() - self._timestamps[key]).total_seconds()
-        if age > effective_ttl:
-            del self._cache[key]
-            del self._timestamps[key]
-            self._ttls.pop(key, None)
-            return None
+    def get(self, key: str, ttl_seconds: int = 60) -> Optional[Any]:
+        """Get cached value if not expired (TTL is fixed when the value is set)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry.value
 
-        return self._cache[key]
+    def __contains__(self, key: str) -> bool:
+        """Membership check that does not touch LRU order or hit/miss counters"""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry.expires_at > time.monotonic()
 
     def set(self, key: str, value: Any, ttl: int = 60):
-        """Set cached value with current timestamp and TTL"""
-        self._cache[key] = value
-        self._timestamps[key] = datetime.now()
-        self._ttls[key] = ttl
-    
+        """Set cached value with TTL, evicting least recently used entries if over budget"""
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return  # Never cache something larger than the whole budget
+        with self._lock:
+            self._remove(key)
+            self._data[key] = _Entry(value, time.monotonic() + ttl, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+        self._ensure_sweeper()
+
     def clear(self, key: str = None):
         """Clear specific key or entire cache"""
-        if key:
-            self._cache.pop(key, None)
-            self._timestamps.pop(key, None)
-            self._ttls.pop(key, None)
-        else:
-            self._cache.clear()
-            self._timestamps.clear()
-            self._ttls.clear()
+        with self._lock:
+            if key:
+                self._remove(key)
+            else:
+                self._data.clear()
+                self._bytes = 0
 
     def clear_prefix(self, prefix: str):
         """Clear all keys that start with the given prefix"""
-        keys_to_delete = [k for k in self._cache if k.startswith(prefix)]
-        for k in keys_to_delete:
-            self._cache.pop(k, None)
-            self._timestamps.pop(k, None)
-            self._ttls.pop(k, None)
+        with self._lock:
+            for k in [k for k in self._data if k.startswith(prefix)]:
+                self._remove(k)
+
+    def sweep(self) -> int:
+        """Drop every expired entry; returns how many were removed"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [k for k, e in self._data.items() if e.expires_at <= now]
+            for k in expired:
+                self._remove(k)
+            self.expirations += len(expired)
+        return len(expired)
+
+    def _ensure_sweeper(self):
+        # Started lazily on first write so importing the module has no side effects
+        if self._sweeper is not None or self.sweep_interval <= 0:
+            return
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="cache-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            self.sweep()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes
+            }
+
+
+# Backwards-compatible name
+SimpleCache = BoundedTTLCache
 
-dashboard_cache = SimpleCache()
+dashboard_cache = BoundedTTLCache(
+    max_entries=settings.cache_max_entries,
+    max_bytes=settings.cache_max_bytes,
+    sweep_interval=settings.cache_sweep_interval
+)
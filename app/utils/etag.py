@@ -0,0 +1,128 @@
+"""
+Conditional GET for polled endpoints
+Two ways to build the ETag:
+
+- Versioned (`tags` given): the ETag is derived from the route key and the
+  current versions of its cache tags, which invalidate_tags bumps on every
+  write. A matching If-None-Match is answered with 304 before the endpoint
+  runs, so an unchanged poll costs one Redis MGET instead of the queries
+  and serialization. The ETag also rolls over every `ttl` seconds, the same
+  staleness bound as cached_route, and for time-windowed views.
+- Content hash (no tags, or Redis unavailable): the endpoint runs and
+  ConditionalGetMiddleware hashes the response body; a match still saves the
+  transfer and the client-side parse.
+
+Responses carry `Cache-Control: private, no-cache`, so browsers store them
+and revalidate on every poll with If-None-Match by themselves.
+"""
+import asyncio
+import functools
+import hashlib
+import inspect
+import time
+from typing import Callable, Iterable, Optional
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+from app.utils.tiered_cache import tiered_cache
+
+CACHE_CONTROL = "private, no-cache"
+# Set on the request scope when the middleware should hash the body
+HASH_SCOPE_KEY = "etag.hash_body"
+
+
+def make_etag(seed: str) -> str:
+    return f'W/"{hashlib.sha1(seed.encode()).hexdigest()[:20]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison against an If-None-Match header (RFC 9110 13.1.2)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == wanted:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def _versioned_etag(key: Optional[str], tags: Iterable[str], ttl: int) -> Optional[str]:
+    if key is None:
+        return None
+    versions = tiered_cache.tag_versions(tags)
+    if versions is None:
+        return None
+    return make_etag(f"{key}|{','.join(versions)}|{int(time.time() // ttl)}")
+
+
+def etag_route(
+    key: Optional[Callable[..., Optional[str]]] = None,
+    tags: Optional[Callable[..., Iterable[str]]] = None,
+    ttl: int = 60
+):
+    """
+    Answer If-None-Match with 304 Not Modified on a GET route.
+
+    `key` and `tags` receive the route's keyword arguments, as in
+    cached_route (usually the same lambdas). Without them the response body
+    is hashed instead. Place it above @cached_route:
+
+        @router.get("/analytics/overview")
+        @etag_route(
+            key=lambda current_user, days, **_: f"billing_analytics:{current_user[1]}:{days}",
+            tags=lambda current_user, **_: [shop_tag(current_user[1], "billing")]
+        )
+        @cached_route(...)
+        def get_analytics_overview(...): ...
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        # Request/Response are injected by FastAPI under private names and hidden from fn
+        extra = [
+            inspect.Parameter("_etag_request", inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+            inspect.Parameter("_etag_response", inspect.Parameter.KEYWORD_ONLY, annotation=Response),
+        ]
+        params = list(signature.parameters.values())
+        var_kw = [p for p in params if p.kind == inspect.Parameter.VAR_KEYWORD]
+        params = [p for p in params if p.kind != inspect.Parameter.VAR_KEYWORD] + extra + var_kw
+
+        def prepare(kwargs: dict, versioned: Optional[str]) -> Optional[Response]:
+            request: Request = kwargs.pop("_etag_request")
+            response: Response = kwargs.pop("_etag_response")
+            response.headers["Cache-Control"] = CACHE_CONTROL
+            if versioned is None:
+                request.scope[HASH_SCOPE_KEY] = True
+                return None
+            if etag_matches(request.headers.get("if-none-match"), versioned):
+                return not_modified(versioned)
+            response.headers["ETag"] = versioned
+            return None
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                versioned = None
+                if tags is not None and key is not None:
+                    versioned = await run_in_threadpool(_versioned_etag, key(**kwargs), tags(**kwargs), ttl)
+                early = prepare(kwargs, versioned)
+                return early if early is not None else await fn(*args, **kwargs)
+            wrapper = async_wrapper
+        else:
+            @functools.wraps(fn)
+            def sync_wrapper(*args, **kwargs):
+                versioned = None
+                if tags is not None and key is not None:
+                    versioned = _versioned_etag(key(**kwargs), tags(**kwargs), ttl)
+                early = prepare(kwargs, versioned)
+                return early if early is not None else fn(*args, **kwargs)
+            wrapper = sync_wrapper
+
+        wrapper.__signature__ = signature.replace(parameters=params)
+        return wrapper
+    return decorator
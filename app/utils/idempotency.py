@@ -0,0 +1,275 @@
+"""
+Idempotency keys for retried writes
+A POS that times out on POST /bills cannot tell whether the bill was saved,
+so a plain retry could deduct stock twice. With an `Idempotency-Key` header
+the first request claims the key (committed before the work starts) and its
+response is stored with it, in the same transaction as the bill or payment
+(see record_response); retries with the same key get that response back
+(`Idempotent-Replayed: true`) instead of running again.
+
+- Keys are scoped per shop and kept for IDEMPOTENCY_KEY_TTL_HOURS.
+- A retry that arrives while the first request is still running gets 409
+  with Retry-After, a key reused with a different body gets 422.
+- A request that fails before committing anything releases its key, so the
+  retry runs for real. A claim left unfinished (worker died mid-request) is
+  abandoned after IDEMPOTENCY_LEASE_SECONDS and taken over by the retry.
+
+The store is a database table rather than Redis: Redis is optional here
+(in-process fallback per worker), and a key must hold across workers.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional, Tuple, Type
+from fastapi import HTTPException, Request, Response
+from pydantic import BaseModel
+from sqlalchemy import Column, DateTime, Integer, String, Text, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.database.database import Base, SessionLocal
+from app.utils.json_response import CustomJSONResponse
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 128
+_CLAIM_INFO = "idempotency_claim"  # Session.info key of the running request's claim
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    shop_id = Column(Integer, primary_key=True)
+    key = Column(String(MAX_KEY_LENGTH), primary_key=True)
+    endpoint = Column(String(64), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is running
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.now, nullable=False, index=True)
+
+
+def _request_hash(kwargs: dict) -> str:
+    payload = {name: value.model_dump(mode="json") for name, value in kwargs.items() if isinstance(value, BaseModel)}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _expired(row: IdempotencyKey) -> bool:
+    return row.created_at < datetime.now() - timedelta(hours=settings.idempotency_key_ttl_hours)
+
+
+def _abandoned(row: IdempotencyKey) -> bool:
+    return row.status_code is None and row.created_at < datetime.now() - timedelta(seconds=settings.idempotency_lease_seconds)
+
+
+def _replay(row: IdempotencyKey, endpoint: str, request_hash: str) -> Response:
+    if row.endpoint != endpoint or row.request_hash != request_hash:
+        raise HTTPException(status_code=422, detail=f"{HEADER} was already used for a different request")
+    if row.status_code is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"A request with this {HEADER} is still being processed",
+            headers={"Retry-After": "1"}
+        )
+    return Response(
+        content=row.response_body, status_code=row.status_code, media_type="application/json",
+        headers={"Idempotent-Replayed": "true"}
+    )
+
+
+def _claim(db: Session, shop_id: int, key: str, endpoint: str, request_hash: str) -> Tuple[Optional[Response], datetime]:
+    """Claim the key for this request, or return the stored response of an earlier one.
+
+    Returns (None, claimed_at) when claimed; claimed_at identifies this
+    claim, so a request whose claim was taken over cannot finish or release it.
+    """
+    for _ in range(2):
+        claimed_at = datetime.now()
+        row = db.get(IdempotencyKey, (shop_id, key), populate_existing=True)
+        if row is not None and not _expired(row) and not (
+            _abandoned(row) and row.endpoint == endpoint and row.request_hash == request_hash
+        ):
+            return _replay(row, endpoint, request_hash), claimed_at
+        if row is not None:
+            # Expired, or abandoned by a request that never finished: take it over unless someone else just did
+            taken = db.query(IdempotencyKey).filter(
+                IdempotencyKey.shop_id == shop_id,
+                IdempotencyKey.key == key,
+                IdempotencyKey.created_at == row.created_at
+            ).update({
+                "endpoint": endpoint, "request_hash": request_hash, "status_code": None,
+                "response_body": None, "created_at": claimed_at
+            }, synchronize_session=False)
+            db.commit()
+            if taken:
+                return None, claimed_at
+            continue
+        db.add(IdempotencyKey(shop_id=shop_id, key=key, endpoint=endpoint, request_hash=request_hash,
+                              created_at=claimed_at))
+        try:
+            db.commit()
+            return None, claimed_at
+        except IntegrityError:
+            # A concurrent request claimed it first
+            db.rollback()
+    raise HTTPException(status_code=409, detail=f"A request with this {HEADER} is still being processed",
+                        headers={"Retry-After": "1"})
+
+
+def _claim_query(db: Session, claim: dict):
+    return db.query(IdempotencyKey).filter(
+        IdempotencyKey.shop_id == claim["shop_id"],
+        IdempotencyKey.key == claim["key"],
+        IdempotencyKey.created_at == claim["claimed_at"],
+        IdempotencyKey.status_code.is_(None)
+    )
+
+
+def _release(db: Session, claim: dict):
+    """Drop this request's claim (only when nothing of its work was committed)"""
+    db.rollback()
+    _claim_query(db, claim).delete(synchronize_session=False)
+    db.commit()
+
+
+def _store(db: Session, claim: dict, result) -> bool:
+    body = claim["serialize"](result)
+    stored = _claim_query(db, claim).update(
+        {"status_code": 200, "response_body": body}, synchronize_session=False
+    )
+    if stored:
+        claim["body"] = body
+    return bool(stored)
+
+
+def record_response(db: Session, result):
+    """
+    Store the response of the current idempotent request in the caller's transaction.
+
+    Call right before the final db.commit() of a route wrapped in
+    @idempotent, so the key is finished by the same commit as the bill or
+    payment (a crash can then not leave one without the other). A no-op for
+    requests without an Idempotency-Key.
+    """
+    claim = db.info.get(_CLAIM_INFO)
+    if claim is None or claim["body"] is not None:
+        return
+    if not _store(db, claim, result):
+        # Our claim lapsed and a retry took the key over: let that one do the work
+        raise HTTPException(status_code=409, detail=f"A request with this {HEADER} is still being processed",
+                            headers={"Retry-After": "1"})
+
+
+def run_idempotent(
+    db: Session,
+    shop_id: int,
+    key: str,
+    endpoint: str,
+    request_hash: str,
+    work: Callable[[], Any],
+    response_model: Optional[Type[BaseModel]] = None
+) -> Response:
+    """
+    Run `work` under an Idempotency-Key (what @idempotent does for a keyed request).
+
+    Returns the JSON response stored with the key: this run's, or an
+    earlier run's replay. Also usable outside a route, e.g. by benches.
+    """
+    replay, claimed_at = _claim(db, shop_id, key, endpoint, request_hash)
+    if replay is not None:
+        return replay
+
+    def serialize(result) -> str:
+        return CustomJSONResponse(
+            response_model.model_validate(result) if response_model else result
+        ).body.decode()
+
+    claim = {"shop_id": shop_id, "key": key, "claimed_at": claimed_at, "serialize": serialize,
+             "body": None, "committed": False}
+
+    def on_commit(session):
+        claim["committed"] = True
+
+    db.info[_CLAIM_INFO] = claim
+    event.listen(db, "after_commit", on_commit)
+    try:
+        result = work()
+    except BaseException:
+        # Once work was committed the key stays: a retry replays it or, unfinished, waits out the lease
+        if not claim["committed"]:
+            _release(db, claim)
+        raise
+    finally:
+        event.remove(db, "after_commit", on_commit)
+        db.info.pop(_CLAIM_INFO, None)
+
+    if claim["body"] is None:
+        # The service did not call record_response: store the response after the fact
+        _store(db, claim, result)
+        db.commit()
+        if claim["body"] is None:
+            claim["body"] = serialize(result)
+    return Response(content=claim["body"], media_type="application/json")
+
+
+def idempotent(
+    endpoint: str,
+    shop_id: Callable[..., int],
+    response_model: Optional[Type[BaseModel]] = None
+):
+    """
+    Honour an Idempotency-Key header on a sync POST route that takes `db`.
+
+    `shop_id` receives the route's keyword arguments and returns the shop
+    the key is scoped to; `response_model` (the route's) serializes the
+    stored response. The service should call record_response before its
+    final commit. Requests without the header run unchanged:
+
+        @router.post("/bills", response_model=schemas.BillResponse)
+        @idempotent("create_bill", shop_id=lambda current_user, **_: current_user[1],
+                    response_model=schemas.BillResponse)
+        def create_bill(bill_data: schemas.BillCreate, db: Session = Depends(get_db), ...): ...
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        # Request is injected by FastAPI under a private name and hidden from fn
+        params = list(signature.parameters.values()) + [
+            inspect.Parameter("_idempotency_request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+        ]
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            request: Request = kwargs.pop("_idempotency_request")
+            key = request.headers.get(HEADER)
+            if not key:
+                return fn(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                raise HTTPException(status_code=400, detail=f"{HEADER} must be at most {MAX_KEY_LENGTH} characters")
+
+            return run_idempotent(
+                kwargs["db"], shop_id(**kwargs), key, endpoint, _request_hash(kwargs),
+                lambda: fn(*args, **kwargs), response_model
+            )
+
+        wrapper.__signature__ = signature.replace(parameters=params)
+        return wrapper
+    return decorator
+
+
+def purge_expired_keys():
+    """Scheduled: delete keys past IDEMPOTENCY_KEY_TTL_HOURS"""
+    db = SessionLocal()
+    try:
+        cutoff = datetime.now() - timedelta(hours=settings.idempotency_key_ttl_hours)
+        deleted = db.query(IdempotencyKey).filter(IdempotencyKey.created_at < cutoff).delete()
+        db.commit()
+        if deleted:
+            logger.info(f"Purged {deleted} expired idempotency keys")
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Idempotency key purge failed: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,84 @@
+"""
+Default JSON response class
+Serializes with orjson when available. Output matches the previous
+jsonable_encoder + json.dumps path: naive and aware datetimes get 'Z'
+appended, Decimals become int/float, pydantic models are dumped in JSON mode,
+and anything orjson cannot handle is handed to jsonable_encoder.
+"""
+import logging
+from datetime import datetime, date, time
+from decimal import Decimal
+from typing import Any, Iterable
+from fastapi.encoders import jsonable_encoder, decimal_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.orm.state import InstanceState
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    logger.warning("orjson not installed. Falling back to the standard library JSON encoder.")
+
+
+def _encode_datetime(value: datetime) -> str:
+    return value.isoformat() + 'Z'
+
+
+# Same overrides the old CustomJSONResponse passed to jsonable_encoder
+CUSTOM_ENCODER = {
+    datetime: lambda v: _encode_datetime(v) if v else None
+}
+
+
+def _default(obj: Any) -> Any:
+    # Dates and times reach here because of OPT_PASSTHROUGH_DATETIME
+    if isinstance(obj, datetime):
+        return _encode_datetime(obj)
+    if isinstance(obj, (date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return decimal_encoder(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, float):  # float subclasses orjson does not accept
+        return float(obj)
+    if isinstance(obj, InstanceState):
+        # An ORM __dict__ spread into the response: the legacy path drops the key (see orm_dict)
+        raise TypeError("SQLAlchemy InstanceState in response; build it with orm_dict()")
+    return jsonable_encoder(obj, custom_encoder=CUSTOM_ENCODER)
+
+
+def orm_dict(obj: Any, exclude: Iterable[str] = ()) -> dict:
+    """Loaded attributes of an ORM object, for building a response dict from `obj.__dict__`.
+
+    Drops SQLAlchemy's `_sa_instance_state` (as jsonable_encoder does): orjson
+    cannot encode it, and one such key sends the whole response down the
+    slower legacy path.
+    """
+    return {k: v for k, v in obj.__dict__.items() if not k.startswith("_sa_") and k not in exclude}
+
+
+if ORJSON_AVAILABLE:
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+class CustomJSONResponse(JSONResponse):
+    """JSON response that appends 'Z' to datetime strings"""
+
+    def render(self, content: Any) -> bytes:
+        if ORJSON_AVAILABLE:
+            try:
+                return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+            except (orjson.JSONEncodeError, TypeError) as e:
+                # e.g. integers beyond 64 bits; the legacy path handles them
+                logger.debug(f"orjson could not encode response, using jsonable_encoder: {e}")
+        return self.render_legacy(content)
+
+    def render_legacy(self, content: Any) -> bytes:
+        return super().render(jsonable_encoder(content, custom_encoder=CUSTOM_ENCODER))
@@ -0,0 +1,17 @@
+"""
+Optional-dependency checks that do not import the dependency
+Heavy libraries (google-genai, pandas, pdfplumber, openpyxl) are imported
+inside the code paths that use them so worker start-up stays fast; modules
+use module_available() at import time to keep their *_AVAILABLE flags and
+start-up warnings.
+"""
+import importlib.util
+
+
+def module_available(name: str) -> bool:
+    """True if `name` can be imported (checks the finder only; the module is not executed)"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        # Parent package missing (e.g. no 'google' namespace) or a broken spec
+        return False
@@ -0,0 +1,255 @@
+"""
+Request metrics in Prometheus text format
+Each worker keeps its own counters and histograms (per route template,
+method and status, plus DB and external-call time) and periodically writes a
+snapshot to METRICS_DIR. /metrics merges the snapshots of all live workers,
+so one scrape sees the whole uvicorn process group.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# name -> (type, help, label names, buckets)
+METRICS = {
+    "http_requests_total": (
+        "counter", "HTTP requests by route template, method and status", ("method", "route", "status"), None),
+    "http_request_duration_seconds": (
+        "histogram", "HTTP request latency", ("method", "route"), LATENCY_BUCKETS),
+    "http_request_db_seconds": (
+        "histogram", "Database time spent per request", ("method", "route"), LATENCY_BUCKETS),
+    "http_request_db_queries": (
+        "histogram", "SQL statements executed per request", ("method", "route"), QUERY_COUNT_BUCKETS),
+    "http_request_external_seconds": (
+        "histogram", "External API time (Gemini, SMS, WhatsApp) spent per request", ("method", "route"), LATENCY_BUCKETS),
+    "http_requests_in_flight": (
+        "gauge", "Requests currently being handled", (), None),
+    "external_call_duration_seconds": (
+        "histogram", "External API call latency", ("service",), LATENCY_BUCKETS),
+    "external_call_errors_total": (
+        "counter", "External API calls that raised", ("service",), None),
+    "http_request_n_plus_one_total": (
+        "counter", "Requests that repeated one SQL statement at least N_PLUS_ONE_THRESHOLD times", ("method", "route"), None),
+    "db_pool_checked_out": (
+        "gauge", "Database connections currently checked out", ("pool",), None),
+    "db_pool_wait_timeouts_total": (
+        "counter", "Connection checkouts that timed out waiting for the pool", ("pool",), None),
+}
+
+
+class RequestStats:
+    """Per-request accumulators, shared with threadpool workers through the context"""
+    __slots__ = ("db_time", "db_queries", "external_time", "statements")
+
+    def __init__(self):
+        self.db_time = 0.0
+        self.db_queries = 0
+        self.external_time = 0.0
+        self.statements = Counter()  # SQL text -> executions, for N+1 detection
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series: Dict[str, Dict[Tuple[str, ...], object]] = {name: {} for name in METRICS}
+
+    def inc(self, name: str, labels: Tuple[str, ...] = (), value: float = 1):
+        with self._lock:
+            series = self._series[name]
+            series[labels] = series.get(labels, 0) + value
+
+    def set(self, name: str, labels: Tuple[str, ...] = (), value: float = 0):
+        with self._lock:
+            self._series[name][labels] = value
+
+    def observe(self, name: str, labels: Tuple[str, ...], value: float):
+        buckets = METRICS[name][3]
+        with self._lock:
+            series = self._series[name]
+            hist = series.get(labels)
+            if hist is None:
+                hist = series[labels] = {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    hist["buckets"][i] += 1
+                    break
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: [[list(labels), value if not isinstance(value, dict) else dict(value, buckets=list(value["buckets"]))]
+                       for labels, value in series.items()]
+                for name, series in self._series.items()
+            }
+
+
+registry = MetricsRegistry()
+
+
+# ── Recording helpers ──
+
+def record_query(elapsed: float, statement: str):
+    """Called from the engine cursor events for every SQL statement"""
+    stats = current_request.get()
+    if stats is not None:
+        stats.db_time += elapsed
+        stats.db_queries += 1
+        stats.statements[statement] += 1
+
+
+@contextmanager
+def track_external(service: str):
+    """Time a call to an external API (gemini, fast2sms, whatsapp)
+
+        with track_external("gemini"):
+            response = self.model.generate_content(prompt)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        registry.inc("external_call_errors_total", (service,))
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe("external_call_duration_seconds", (service,), elapsed)
+        stats = current_request.get()
+        if stats is not None:
+            stats.external_time += elapsed
+
+
+def record_request(method: str, route: str, status: int, duration: float, stats: RequestStats):
+    registry.inc("http_requests_total", (method, route, str(status)))
+    registry.observe("http_request_duration_seconds", (method, route), duration)
+    registry.observe("http_request_db_seconds", (method, route), stats.db_time)
+    registry.observe("http_request_db_queries", (method, route), stats.db_queries)
+    if stats.external_time:
+        registry.observe("http_request_external_seconds", (method, route), stats.external_time)
+
+
+def _update_pool_gauges():
+    from app.database.pool_metrics import get_pool_stats
+    for pool, stats in get_pool_stats().items():
+        registry.set("db_pool_checked_out", (pool,), stats.get("checked_out") or 0)
+        registry.set("db_pool_wait_timeouts_total", (pool,), stats.get("checkout_timeouts") or 0)
+
+
+# ── Cross-worker aggregation ──
+
+def _metrics_dir() -> str:
+    return settings.metrics_dir or os.path.join(tempfile.gettempdir(), "pharmacy_metrics")
+
+
+def flush_metrics() -> Optional[dict]:
+    """Write this worker's snapshot to the shared directory (atomic replace)"""
+    _update_pool_gauges()
+    snapshot = {"pid": os.getpid(), "series": registry.snapshot()}
+    directory = _metrics_dir()
+    try:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(snapshot, f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        logger.warning(f"Could not write metrics snapshot to {directory}: {e}")
+    return snapshot
+
+
+def _worker_snapshots(own: dict) -> List[dict]:
+    snapshots = [own]
+    directory = _metrics_dir()
+    stale_after = max(60, settings.metrics_flush_interval * 4)
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return snapshots
+    now = time.time()
+    for name in names:
+        if not name.endswith(".json") or name == f"{os.getpid()}.json":
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if now - os.path.getmtime(path) > stale_after:
+                continue  # worker exited or was replaced
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def _merge(snapshots: Iterable[dict]) -> Dict[str, Dict[Tuple[str, ...], object]]:
+    merged: Dict[str, Dict[Tuple[str, ...], object]] = {name: {} for name in METRICS}
+    for snapshot in snapshots:
+        for name, series in snapshot["series"].items():
+            if name not in merged:
+                continue
+            for labels, value in series:
+                labels = tuple(labels)
+                current = merged[name].get(labels)
+                if isinstance(value, dict):
+                    if current is None:
+                        merged[name][labels] = {"buckets": list(value["buckets"]), "sum": value["sum"], "count": value["count"]}
+                    else:
+                        current["buckets"] = [a + b for a, b in zip(current["buckets"], value["buckets"])]
+                        current["sum"] += value["sum"]
+                        current["count"] += value["count"]
+                else:
+                    merged[name][labels] = (current or 0) + value
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_metrics() -> str:
+    """Prometheus text exposition (format 0.0.4) aggregated across workers"""
+    merged = _merge(_worker_snapshots(flush_metrics()))
+    lines = []
+    for name, (kind, help_text, label_names, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(merged[name].items()):
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(label_names, labels)} {_format_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, value["buckets"]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{_labels(label_names, labels, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{name}_bucket{_labels(label_names, labels, le)} {value['count']}")
+            lines.append(f"{name}_sum{_labels(label_names, labels)} {_format_number(value['sum'])}")
+            lines.append(f"{name}_count{_labels(label_names, labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
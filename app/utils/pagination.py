@@ -0,0 +1,151 @@
+"""
+Keyset (cursor) pagination
+OFFSET pagination reads and discards every skipped row, and its count()
+repeats the whole filter; on shops with years of bills both grow with page
+depth. paginate() walks an index-friendly (sort_key, id) order instead: the
+opaque cursor carries the last row's sort key and id, so page 200 costs the
+same as page 1.
+
+Compatibility: without a cursor the old page/per_page behaviour is kept
+(exact total included); every response also carries `next_cursor`, so
+clients can switch over from any page. Totals are optional in cursor mode:
+`total_mode=exact|approx|none` (approx uses the PostgreSQL planner
+estimate, exact elsewhere).
+
+Sort keys must be NOT NULL in practice (created_at, product_name, ...).
+"""
+import base64
+import json
+import math
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+TOTAL_MODE_PATTERN = "^(exact|approx|none)$"
+
+
+def _encode_value(value: Any):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+    return value
+
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    raw = json.dumps([_encode_value(sort_value), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return _decode_value(sort_value), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def estimate_count(query) -> int:
+    """Planner row estimate on PostgreSQL (no scan); exact count elsewhere"""
+    session = query.session
+    if session.get_bind().dialect.name != "postgresql":
+        return query.order_by(None).count()
+    compiled = query.order_by(None).statement.compile(
+        dialect=session.get_bind().dialect, compile_kwargs={"render_postcompile": True}
+    )
+    plan = session.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", compiled.construct_params()
+    ).scalar()
+    plan = plan if isinstance(plan, list) else json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+@dataclass
+class Page:
+    items: List[Any]
+    per_page: int
+    page: Optional[int]
+    total: Optional[int]
+    next_cursor: Optional[str]
+
+    def response(self, items: Optional[List[Any]] = None) -> dict:
+        """Old page/per_page envelope plus next_cursor / has_more"""
+        total = self.total
+        return {
+            "items": self.items if items is None else items,
+            "total": total,
+            "page": self.page,
+            "per_page": self.per_page,
+            "pages": (math.ceil(total / self.per_page) if total > 0 else 1) if total is not None else None,
+            "next_cursor": self.next_cursor,
+            "has_more": self.next_cursor is not None,
+        }
+
+
+def set_page_headers(response, page: Page):
+    """For routes that return a bare list: the cursor and total travel in headers"""
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    if page.total is not None:
+        response.headers["X-Total-Count"] = str(page.total)
+
+
+def paginate(
+    query,
+    sort_column,
+    id_column,
+    per_page: int,
+    *,
+    descending: bool = False,
+    page: Optional[int] = None,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    total_mode: Optional[str] = None
+) -> Page:
+    """
+    Fetch one page of an ORM query ordered by (sort_column, id_column).
+
+    With `cursor` the page starts right after the cursor row (keyset); else
+    `page` (or a raw `offset`, for skip/limit routes) selects an OFFSET page
+    as before. `total_mode` defaults to exact in page mode and none in
+    cursor mode.
+    """
+    total_mode = total_mode or ("none" if cursor else "exact")
+    total = None
+    if total_mode == "exact":
+        total = query.order_by(None).count()
+    elif total_mode == "approx":
+        total = estimate_count(query)
+
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor)
+        if descending:
+            after = or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < last_id))
+        else:
+            after = or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > last_id))
+        query = query.filter(after)
+
+    order = (sort_column.desc(), id_column.desc()) if descending else (sort_column.asc(), id_column.asc())
+    query = query.order_by(*order)
+    if not cursor and (page or offset):
+        query = query.offset((page - 1) * per_page if page else offset)
+
+    rows = query.limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return Page(items=items, per_page=per_page, page=None if cursor else page, total=total, next_cursor=next_cursor)
@@ -0,0 +1,87 @@
+"""
+SQL query budgets and N+1 detection
+MetricsMiddleware hands every finished request's RequestStats to
+check_request(). A statement executed N_PLUS_ONE_THRESHOLD or more times in
+one request (the signature of a lazy load inside a loop) is logged as a
+likely N+1, and routes can declare a maximum statement count:
+
+    @router.get("/bills")
+    @query_budget(8)
+    def get_bills(...):
+
+Over-budget requests are logged, or raise QueryBudgetExceeded when
+QUERY_BUDGET_STRICT is set so the test suite fails. count_queries() measures
+code outside a request (services, scripts, tests).
+"""
+import logging
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Tuple
+from app.core.config import settings
+from app.utils.metrics import RequestStats, current_request, registry
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A route or block executed more SQL statements than it is allowed"""
+
+
+def query_budget(max_queries: int) -> Callable:
+    """Declare the maximum number of SQL statements a route may execute"""
+    def decorator(func):
+        func.__query_budget__ = max_queries
+        return func
+    return decorator
+
+
+def repeated_statements(stats: RequestStats, threshold: Optional[int] = None) -> List[Tuple[str, int]]:
+    """Statements executed at least `threshold` times, most repeated first"""
+    threshold = settings.n_plus_one_threshold if threshold is None else threshold
+    if threshold <= 0:
+        return []
+    return [(sql, count) for sql, count in stats.statements.most_common() if count >= threshold]
+
+
+def _shorten(statement: str, limit: int = 200) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + "..."
+
+
+def check_request(method: str, route: str, endpoint: Optional[Callable], stats: RequestStats):
+    """Log likely N+1 patterns and enforce the route's query budget"""
+    repeated = repeated_statements(stats)
+    if repeated:
+        registry.inc("http_request_n_plus_one_total", (method, route))
+        sql, count = repeated[0]
+        logger.warning(
+            f"Likely N+1 on {method} {route}: {count}x {_shorten(sql)} "
+            f"({stats.db_queries} statements, {stats.db_time * 1000:.1f}ms DB)"
+        )
+
+    budget = getattr(endpoint, "__query_budget__", None) or settings.query_budget_default
+    if budget and stats.db_queries > budget:
+        message = f"{method} {route} executed {stats.db_queries} SQL statements (budget {budget})"
+        if settings.query_budget_strict:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+@contextmanager
+def count_queries(max_queries: Optional[int] = None):
+    """Count SQL statements executed in the block; optionally fail above max_queries
+
+        with count_queries(max_queries=3) as stats:
+            BillingService.get_bill(db, bill_id, shop_id)
+        print(stats.db_queries, stats.db_time)
+    """
+    stats = RequestStats()
+    token = current_request.set(stats)
+    try:
+        yield stats
+    finally:
+        current_request.reset(token)
+    if max_queries is not None and stats.db_queries > max_queries:
+        details = "; ".join(f"{count}x {_shorten(sql, 120)}" for sql, count in repeated_statements(stats, 2)[:3])
+        raise QueryBudgetExceeded(
+            f"{stats.db_queries} SQL statements executed (budget {max_queries})" + (f": {details}" if details else "")
+        )
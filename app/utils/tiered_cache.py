@@ -0,0 +1,330 @@
+"""
+Two-tier cache shared by all uvicorn workers
+L1 is the in-process dashboard_cache, L2 is Redis. Entries carry tags such as
+`shop:12:billing`; invalidating a tag deletes the Redis entries and is
+broadcast over Redis pub/sub so every worker drops its L1 copies.
+When Redis is unavailable the cache degrades to L1 only.
+"""
+import asyncio
+import functools
+import json
+import logging
+import threading
+import time
+from datetime import datetime, date
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+import redis
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.utils.cache import dashboard_cache, BoundedTTLCache
+
+logger = logging.getLogger(__name__)
+
+
+def shop_tag(shop_id: int, domain: str) -> str:
+    """Tag for data owned by one shop, e.g. shop_tag(12, "billing") -> "shop:12:billing" """
+    return f"shop:{shop_id}:{domain}"
+
+
+def org_tag(organization_id: str, domain: str) -> str:
+    """Tag for org-wide (admin) views, e.g. org_tag("ORG1", "stock") -> "org:ORG1:stock" """
+    return f"org:{organization_id}:{domain}"
+
+
+def _json_default(o):
+    # Type-tagged so values round-trip exactly (the response encoder appends 'Z' to datetimes)
+    if isinstance(o, datetime):
+        return {"__dt__": o.isoformat()}
+    if isinstance(o, date):
+        return {"__d__": o.isoformat()}
+    if isinstance(o, Decimal):
+        return {"__dec__": str(o)}
+    if isinstance(o, Enum):
+        return o.value
+    if hasattr(o, "model_dump"):
+        return o.model_dump()
+    raise TypeError(f"{type(o).__name__} is not cacheable in Redis")
+
+
+def _json_hook(d: dict):
+    if len(d) == 1:
+        if "__dt__" in d:
+            return datetime.fromisoformat(d["__dt__"])
+        if "__d__" in d:
+            return date.fromisoformat(d["__d__"])
+        if "__dec__" in d:
+            return Decimal(d["__dec__"])
+    return d
+
+
+class TieredCache:
+    KEY_PREFIX = "tc:"
+    TAG_PREFIX = "tc:tag:"
+    VERSION_PREFIX = "tc:ver:"
+    CHANNEL = "tc:invalidate"
+    TAG_TTL = 86400  # tag sets outlive their members; stale members are harmless
+    VERSION_TTL = 7 * 86400
+
+    def __init__(self, l1: BoundedTTLCache, redis_url: str, enabled: bool = True, retry_after: int = 30):
+        self.l1 = l1
+        self.redis_url = redis_url
+        self.enabled = enabled
+        self.retry_after = retry_after
+        self._redis: Optional[redis.Redis] = None
+        self._down_until = 0.0
+        self._tags: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+
+        # Counters
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+        self.invalidations = 0
+
+    # ── Redis connection (circuit breaker: skip L2 for retry_after seconds after an error) ──
+
+    def _client(self) -> Optional[redis.Redis]:
+        if not self.enabled or time.monotonic() < self._down_until:
+            return None
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(
+                self.redis_url,
+                max_connections=settings.redis_max_connections,
+                socket_connect_timeout=0.25,
+                socket_timeout=0.5,
+                decode_responses=True
+            )
+        self._ensure_listener()
+        return self._redis
+
+    def _l2_failed(self, error: Exception):
+        self.l2_errors += 1
+        self._down_until = time.monotonic() + self.retry_after
+        logger.warning(f"Redis cache unavailable, using in-process cache only for {self.retry_after}s: {error}")
+
+    # ── Local tag index ──
+
+    def _index(self, key: str, tags: Iterable[str]):
+        with self._lock:
+            for tag in tags:
+                keys = self._tags.setdefault(tag, set())
+                keys.add(key)
+                if len(keys) > 1000:
+                    keys.intersection_update(k for k in list(keys) if k in self.l1)
+
+    def _drop_local(self, tags: Iterable[str]):
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._tags.pop(tag, set())
+        for key in keys:
+            self.l1.clear(key)
+
+    def _drop_all_tagged(self):
+        with self._lock:
+            keys = set().union(*self._tags.values()) if self._tags else set()
+            self._tags.clear()
+        for key in keys:
+            self.l1.clear(key)
+
+    # ── Public API ──
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.l1.get(key)
+        if value is not None:
+            return value
+
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.get(self.KEY_PREFIX + key)
+            pipe.pttl(self.KEY_PREFIX + key)
+            raw, pttl = pipe.execute()
+        except redis.RedisError as e:
+            self._l2_failed(e)
+            return None
+
+        if raw is None:
+            self.l2_misses += 1
+            return None
+        self.l2_hits += 1
+        payload = json.loads(raw, object_hook=_json_hook)
+        # Keep the L1 copy no longer than what is left in Redis
+        ttl = max(pttl / 1000, 1) if pttl and pttl > 0 else 1
+        self.l1.set(key, payload["v"], ttl=ttl)
+        self._index(key, payload.get("t", []))
+        return payload["v"]
+
+    def set(self, key: str, value: Any, ttl: int = 60, tags: Iterable[str] = ()):
+        tags = list(tags)
+        self.l1.set(key, value, ttl=ttl)
+        self._index(key, tags)
+
+        client = self._client()
+        if client is None:
+            return
+        try:
+            raw = json.dumps({"v": value, "t": tags}, default=_json_default)
+        except (TypeError, ValueError) as e:
+            logger.debug(f"Not caching {key} in Redis: {e}")
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.set(self.KEY_PREFIX + key, raw, ex=int(max(ttl, 1)))
+            for tag in tags:
+                pipe.sadd(self.TAG_PREFIX + tag, key)
+                pipe.expire(self.TAG_PREFIX + tag, max(int(ttl), self.TAG_TTL))
+            pipe.execute()
+        except redis.RedisError as e:
+            self._l2_failed(e)
+
+    def invalidate_tags(self, *tags: str):
+        """Drop every entry carrying any of the tags, in this worker, in Redis and in other workers"""
+        if not tags:
+            return
+        self.invalidations += 1
+        self._drop_local(tags)
+
+        client = self._client()
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for tag in tags:
+                pipe.smembers(self.TAG_PREFIX + tag)
+            members = pipe.execute()
+            keys = [self.KEY_PREFIX + k for group in members for k in group]
+            pipe = client.pipeline(transaction=False)
+            if keys:
+                pipe.delete(*keys)
+            pipe.delete(*[self.TAG_PREFIX + tag for tag in tags])
+            for tag in tags:
+                pipe.incr(self.VERSION_PREFIX + tag)
+                pipe.expire(self.VERSION_PREFIX + tag, self.VERSION_TTL)
+            pipe.publish(self.CHANNEL, json.dumps(list(tags)))
+            pipe.execute()
+        except redis.RedisError as e:
+            self._l2_failed(e)
+
+    def tag_versions(self, tags: Iterable[str]) -> Optional[List[str]]:
+        """Current version of each tag (bumped by invalidate_tags); None while Redis is unavailable"""
+        tags = list(tags)
+        client = self._client()
+        if client is None or not tags:
+            return None
+        keys = [self.VERSION_PREFIX + tag for tag in tags]
+        try:
+            versions = client.mget(keys)
+            if None in versions:
+                # Start unseen (or expired) tags at a fresh value so old versions never repeat
+                pipe = client.pipeline(transaction=False)
+                for key, version in zip(keys, versions):
+                    if version is None:
+                        pipe.set(key, time.time_ns(), nx=True, ex=self.VERSION_TTL)
+                pipe.execute()
+                versions = client.mget(keys)
+        except redis.RedisError as e:
+            self._l2_failed(e)
+            return None
+        return None if None in versions else list(versions)
+
+    # ── Cross-worker invalidation listener ──
+
+    def _ensure_listener(self):
+        if self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._listener = threading.Thread(target=self._listen, name="cache-invalidation", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        backoff = 1
+        while True:
+            try:
+                pubsub = redis.Redis.from_url(self.redis_url, decode_responses=True).pubsub(
+                    ignore_subscribe_messages=True
+                )
+                pubsub.subscribe(self.CHANNEL)
+                # Invalidations may have been missed while disconnected
+                self._drop_all_tagged()
+                backoff = 1
+                for message in pubsub.listen():
+                    self._drop_local(json.loads(message["data"]))
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener disconnected, retrying in {backoff}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+    def stats(self) -> dict:
+        with self._lock:
+            tag_count = len(self._tags)
+        return {
+            "l2_enabled": self.enabled,
+            "l2_available": self.enabled and time.monotonic() >= self._down_until,
+            "l2_hits": self.l2_hits,
+            "l2_misses": self.l2_misses,
+            "l2_errors": self.l2_errors,
+            "invalidations": self.invalidations,
+            "tracked_tags": tag_count
+        }
+
+
+tiered_cache = TieredCache(dashboard_cache, settings.redis_url, enabled=settings.cache_l2_enabled)
+
+
+def cached_route(
+    key: Callable[..., Optional[str]],
+    ttl: int = 60,
+    tags: Optional[Callable[..., Iterable[str]]] = None
+):
+    """
+    Cache a route's return value in the two-tier cache.
+
+    `key` and `tags` receive the route's keyword arguments (path/query params
+    and resolved dependencies). Returning None from `key` skips the cache,
+    e.g. for free-text searches.
+
+        @router.get("/analytics/overview")
+        @cached_route(
+            key=lambda current_user, days, **_: f"billing_analytics:{current_user[1]}:{days}",
+            tags=lambda current_user, **_: [shop_tag(current_user[1], "billing")]
+        )
+        def get_analytics_overview(...): ...
+    """
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                cache_key = key(**kwargs)
+                if cache_key is None:
+                    return await fn(*args, **kwargs)
+                hit = await run_in_threadpool(tiered_cache.get, cache_key)
+                if hit is not None:
+                    return hit
+                result = await fn(*args, **kwargs)
+                if result is not None:
+                    await run_in_threadpool(tiered_cache.set, cache_key, result, ttl, tags(**kwargs) if tags else ())
+                return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            cache_key = key(**kwargs)
+            if cache_key is None:
+                return fn(*args, **kwargs)
+            hit = tiered_cache.get(cache_key)
+            if hit is not None:
+                return hit
+            result = fn(*args, **kwargs)
+            if result is not None:
+                tiered_cache.set(cache_key, result, ttl, tags(**kwargs) if tags else ())
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Create Bill Benchmark
+Times BillingService.create_bill for bills of --lines items and reports the
+per-bill latency and SQL statement count. Stock items, racks and sections
+are created for a scratch shop inside an outer transaction that is rolled
+back at the end (create_bill's commits become savepoint releases), so the
+run leaves DATABASE_URL unchanged; the tables must exist (`python -m app.cli
+init-db`). Before timing it checks that a bill created under an
+Idempotency-Key stores the same items as a plain one.
+
+Usage (from the repository root):
+    python -m bench.create_bill_bench
+    python -m bench.create_bill_bench --lines 15 --bills 200
+"""
+import argparse
+import json
+import math
+import time
+import uuid
+from sqlalchemy.orm import Session
+from app.utils.query_budget import count_queries
+
+
+def _scratch_shop(db: Session, lines: int, bills: int):
+    from modules.auth.models import Shop, Staff
+    from modules.stock_audit_v2.models import StockItem, StockRack, StockSection
+
+    tag = uuid.uuid4().hex[:8].upper()
+    shop = Shop(organization_id=f"BENCH-BILL-{tag}", shop_name="Bill bench", shop_code=f"BB{tag}",
+                created_by_admin="bench")
+    db.add(shop)
+    db.flush()
+    staff = Staff(shop_id=shop.id, name="Bench", staff_code=f"BB{tag}", phone=f"+91{uuid.uuid4().int % 10**10:010d}",
+                  created_by_admin="bench")
+    rack = StockRack(shop_id=shop.id, rack_number=f"BB{tag}-R1")
+    db.add_all([staff, rack])
+    db.flush()
+    section = StockSection(shop_id=shop.id, rack_id=rack.id, section_name="A", section_code=f"BB{tag}-A")
+    db.add(section)
+    db.flush()
+    items = [
+        StockItem(shop_id=shop.id, section_id=section.id, product_name=f"Bench Medicine {n}", batch_number=f"B{n}",
+                  quantity_software=bills * 2, quantity_physical=bills * 2, unit_price=2.0, selling_price=3.0,
+                  package="10 X 10")
+        for n in range(lines)
+    ]
+    db.add_all(items)
+    db.commit()
+    return shop.id, staff, [item.id for item in items]
+
+
+def check_idempotent_items(db: Session, shop_id: int, staff, items: list):
+    """A keyed create must store (and replay) the bill's items, like an unkeyed one returns them"""
+    from app.utils.idempotency import run_idempotent
+    from modules.billing_v2.schemas import BillResponse
+    from modules.billing_v2.services import BillingService
+
+    def create():
+        return BillingService.create_bill(db, shop_id, staff.id, staff.name, {"cash_amount": 1000.0}, items)
+
+    plain = BillResponse.model_validate(create()).model_dump(mode="json")["items"]
+    response = run_idempotent(db, shop_id, f"bench-{uuid.uuid4().hex}", "create_bill", "bench", create, BillResponse)
+    keyed = json.loads(response.body)["items"]
+    strip = lambda rows: [{k: v for k, v in row.items() if k != "id"} for row in rows]
+    if not plain or strip(keyed) != strip(plain):
+        raise SystemExit(f"Idempotent create_bill stored {len(keyed)} items, expected {len(plain)}")
+
+
+def run(lines: int, bills: int, warmup: int):
+    from app.database.database import engine
+    from app.database.registry import import_all_models
+    from modules.billing_v2.services import BillingService
+
+    import_all_models()
+    connection = engine.connect()
+    outer = connection.begin()
+    # autoflush off, like SessionLocal
+    db = Session(bind=connection, join_transaction_mode="create_savepoint", autoflush=False)
+    try:
+        shop_id, staff, item_ids = _scratch_shop(db, lines, bills + warmup + 2)
+        items = [{"stock_item_id": item_id, "quantity": 1, "unit_price": 3.0} for item_id in item_ids]
+        check_idempotent_items(db, shop_id, staff, items)
+        latencies, queries = [], []
+        for n in range(warmup + bills):
+            with count_queries() as stats:
+                started = time.perf_counter()
+                BillingService.create_bill(db, shop_id, staff.id, staff.name, {"cash_amount": 1000.0}, items)
+                elapsed = (time.perf_counter() - started) * 1000
+            if n >= warmup:
+                latencies.append(elapsed)
+                queries.append(stats.db_queries)
+        return latencies, queries
+    finally:
+        db.close()
+        outer.rollback()
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-bill latency and query count of BillingService.create_bill")
+    parser.add_argument("--lines", type=int, default=15, help="items per bill")
+    parser.add_argument("--bills", type=int, default=100, help="measured bills")
+    parser.add_argument("--warmup", type=int, default=5)
+    args = parser.parse_args()
+
+    latencies, queries = run(args.lines, args.bills, args.warmup)
+    latencies.sort()
+    p95 = latencies[max(1, math.ceil(len(latencies) * 0.95)) - 1]
+    print(f"create_bill, {args.lines} lines x {args.bills} bills")
+    print(f"  mean {sum(latencies) / len(latencies):.2f} ms   p50 {latencies[len(latencies) // 2]:.2f} ms   "
+          f"p95 {p95:.2f} ms")
+    print(f"  SQL statements per bill: {max(queries)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Synthetic Dataset Generator
+Fills DATABASE_URL (PostgreSQL or SQLite) with a realistic multi-tenant
+dataset for benchmarking: organisations with admins, shops with staff,
+racks/sections and stock batches, bills with items spread over the last
+months, purchase invoices with items, WiFi/attendance setup and daily
+attendance records.
+
+Generation is deterministic for a given --seed. All generated rows belong to
+BENCH-* organisations and shop codes; the run refuses to add a second
+dataset, so use a fresh database. A manifest with ids and sample products
+is written for bench.load_test.
+
+Usage (from the repository root):
+    python -m bench.datagen                          # small preset
+    python -m bench.datagen --scale ci               # 2 shops x 50k batches, 50k bills
+    python -m bench.datagen --scale full             # 20 shops, 1M bills, 100k batches
+    python -m bench.datagen --scale ci --bills 200000 --manifest /tmp/dataset.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, time as dtime, timedelta
+from typing import Dict, List
+from sqlalchemy import insert, select
+
+DEFAULT_MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset.json")
+
+SCALES = {
+    "small": dict(orgs=1, shops_per_org=2, staff_per_shop=3, bills=5_000, batches=2_000,
+                  invoices=100, days=60, attendance_days=14),
+    "ci": dict(orgs=1, shops_per_org=2, staff_per_shop=4, bills=50_000, batches=100_000,
+               invoices=1_000, days=90, attendance_days=30),
+    "full": dict(orgs=5, shops_per_org=4, staff_per_shop=5, bills=1_000_000, batches=100_000,
+                 invoices=10_000, days=365, attendance_days=90),
+}
+
+CHUNK = 2_000
+
+MOLECULES = [
+    "Paracetamol", "Amoxicillin", "Azithromycin", "Cetirizine", "Pantoprazole", "Omeprazole",
+    "Metformin", "Glimepiride", "Atorvastatin", "Rosuvastatin", "Amlodipine", "Telmisartan",
+    "Losartan", "Metoprolol", "Ibuprofen", "Diclofenac", "Aceclofenac", "Montelukast",
+    "Levocetirizine", "Ondansetron", "Domperidone", "Ranitidine", "Ciprofloxacin", "Ofloxacin",
+    "Cefixime", "Cefuroxime", "Doxycycline", "Vitamin D3", "Calcium Carbonate", "Folic Acid",
+    "Iron Sucrose", "Multivitamin", "Thyroxine", "Losartan Potassium", "Clopidogrel", "Aspirin",
+    "Prednisolone", "Dexamethasone", "Salbutamol", "Budesonide",
+]
+BRAND_PARTS = ["Do", "Cal", "Pan", "Ato", "Glu", "Zy", "Mox", "Ce", "Lev", "Rab", "Tel", "Met",
+               "Azi", "Ome", "Ami", "Rosu", "Clo", "Vit", "Dex", "Sal", "Mon", "Ond", "Cip", "Fol"]
+BRAND_ENDINGS = ["lo", "pol", "cid", "zole", "for", "cin", "tin", "dip", "sar", "vas", "mox", "fen", "ra", "on"]
+FORMS = [("Tablet", "10 X 10"), ("Tablet", "10 X 15"), ("Capsule", "10 X 10"), ("Syrup", "100ml"),
+         ("Injection", "1 X 1"), ("Drops", "10ml"), ("Cream", "30g")]
+STRENGTHS = ["250", "500", "650", "5", "10", "20", "40", "75", "150"]
+MANUFACTURERS = ["Cipla", "Sun Pharma", "Dr. Reddy's", "Lupin", "Mankind", "Alkem", "Zydus",
+                 "Torrent", "Glenmark", "Micro Labs", "Intas", "Abbott", "GSK", "Pfizer"]
+SUPPLIERS = ["Shree Medical Agencies", "Balaji Pharma Distributors", "City Drug House",
+             "Apollo Wholesale", "Krishna Medicos", "Om Sai Pharma", "Janta Distributors"]
+FIRST_NAMES = ["Amit", "Priya", "Rahul", "Sneha", "Vikram", "Anjali", "Rohan", "Pooja", "Arjun",
+               "Kavita", "Suresh", "Neha", "Manoj", "Divya", "Ravi", "Meera", "Sanjay", "Lakshmi"]
+LAST_NAMES = ["Sharma", "Verma", "Gupta", "Singh", "Patel", "Reddy", "Nair", "Das", "Iyer", "Khan"]
+DOCTORS = ["Dr. Mehta", "Dr. Rao", "Dr. Banerjee", "Dr. Kapoor", "Dr. Joshi", None, None, None]
+
+
+def _product_catalogue(rng: random.Random, size: int) -> List[dict]:
+    """Brand-style product names (e.g. 'Dolo 650 Tablet') with molecule and manufacturer"""
+    products, seen = [], set()
+    while len(products) < size:
+        form, package = rng.choice(FORMS)
+        name = f"{rng.choice(BRAND_PARTS)}{rng.choice(BRAND_ENDINGS)} {rng.choice(STRENGTHS)} {form}"
+        if rng.random() < 0.3:
+            name = f"{rng.choice(MOLECULES)} {rng.choice(STRENGTHS)}mg {form}"
+        if name in seen:
+            name = f"{name} {rng.choice(['Forte', 'Plus', 'SR', 'DS', 'XL', 'MR', 'CV'])}"
+            if name in seen:
+                continue
+        seen.add(name)
+        mrp = round(rng.uniform(15, 450), 2)
+        products.append({
+            "product_name": name,
+            "composition": rng.choice(MOLECULES),
+            "manufacturer": rng.choice(MANUFACTURERS),
+            "package": package,
+            "unit": "strip" if form in ("Tablet", "Capsule") else "unit",
+            "mrp": mrp,
+            "hsn_code": rng.choice(["3004", "3003", "3004.90", "3006"]),
+        })
+    return products
+
+
+def _phone(prefix: int, n: int) -> str:
+    return f"+91{prefix}{n:09d}"
+
+
+class DatasetGenerator:
+    def __init__(self, conn, rng: random.Random, params: dict):
+        self.conn = conn
+        self.rng = rng
+        self.p = params
+        self.now = datetime.now().replace(microsecond=0)
+        self.manifest = {"generated_at": self.now.isoformat(), "params": params, "organizations": []}
+
+    def _insert(self, table, rows: List[dict], returning: bool = False) -> List[int]:
+        """Chunked executemany; with returning=True yields the new ids in row order"""
+        ids = []
+        for start in range(0, len(rows), CHUNK):
+            chunk = rows[start:start + CHUNK]
+            if returning:
+                result = self.conn.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), chunk)
+                ids.extend(row[0] for row in result)
+            else:
+                self.conn.execute(insert(table), chunk)
+        return ids
+
+    def _random_moment(self, days: int) -> datetime:
+        day = self.now.date() - timedelta(days=self.rng.randrange(days))
+        moment = datetime.combine(day, dtime(9)) + timedelta(seconds=self.rng.randrange(12 * 3600))
+        return min(moment, self.now)
+
+    # ── tenants ────────────────────────────────────────────────────────────
+
+    def tenants(self):
+        from modules.auth.models import Admin, Shop, Staff
+        from modules.auth.attendance.models import AttendanceSettings, ShopWiFi, StaffDevice
+
+        rng, p = self.rng, self.p
+        for o in range(1, p["orgs"] + 1):
+            org_id = f"BENCH-ORG-{o:02d}"
+            admin_ids = self._insert(Admin.__table__, [{
+                "organization_id": org_id, "full_name": f"Bench Admin {o}", "phone": _phone(7, o),
+                "email": f"bench-admin-{o}@example.com", "is_password_set": True,
+                "created_by_super_admin": "bench"
+            }], returning=True)
+            org = {"organization_id": org_id, "admin_ids": admin_ids, "shops": []}
+
+            for s in range(1, p["shops_per_org"] + 1):
+                shop_code = f"BENCH{o:02d}{s:02d}"
+                [shop_id] = self._insert(Shop.__table__, [{
+                    "organization_id": org_id, "shop_name": f"Bench Pharmacy {o}-{s}", "shop_code": shop_code,
+                    "address": f"{s} MG Road", "created_by_admin": f"Bench Admin {o}"
+                }], returning=True)
+                staff_rows = [{
+                    "shop_id": shop_id, "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                    "staff_code": f"{shop_code}-S{k:02d}", "phone": _phone(8, shop_id * 100 + k),
+                    "role": "shop_manager" if k == 1 else "staff", "can_manage_staff": k == 1,
+                    "monthly_salary": rng.choice([15000, 18000, 22000, 30000]),
+                    "joining_date": self.now.date() - timedelta(days=rng.randrange(60, 900)),
+                    "is_password_set": True, "created_by_admin": f"Bench Admin {o}"
+                } for k in range(1, p["staff_per_shop"] + 1)]
+                staff_ids = self._insert(Staff.__table__, staff_rows, returning=True)
+                ssid = f"{shop_code}-WIFI"
+                self._insert(ShopWiFi.__table__, [{"shop_id": shop_id, "wifi_ssid": ssid, "is_active": True}])
+                # Billing is reachable without a registered device; heartbeats still need the SSID
+                self._insert(AttendanceSettings.__table__, [{
+                    "shop_id": shop_id, "geofence_required": False, "require_wifi_for_modules": False
+                }])
+                self._insert(StaffDevice.__table__, [{
+                    "shop_id": shop_id, "staff_id": staff_id, "device_name": "Bench device",
+                    "mac_address": f"02:BE:{shop_id // 256 % 256:02X}:{shop_id % 256:02X}:{k // 256:02X}:{k % 256:02X}",
+                    "is_active": True, "is_inside_geofence": True, "last_seen": self.now
+                } for k, staff_id in enumerate(staff_ids)])
+                org["shops"].append({
+                    "shop_id": shop_id, "shop_code": shop_code, "wifi_ssid": ssid,
+                    "staff": [{"id": sid, "name": row["name"]} for sid, row in zip(staff_ids, staff_rows)]
+                })
+            self.manifest["organizations"].append(org)
+
+    def _shops(self) -> List[dict]:
+        return [shop for org in self.manifest["organizations"] for shop in org["shops"]]
+
+    # ── stock ──────────────────────────────────────────────────────────────
+
+    def stock(self, catalogue: List[dict]):
+        from modules.stock_audit_v2.models import StockItem, StockRack, StockSection
+
+        rng, p, shops = self.rng, self.p, self._shops()
+        per_shop = max(1, p["batches"] // len(shops))
+        for shop in shops:
+            shop_id = shop["shop_id"]
+            rack_ids = self._insert(StockRack.__table__, [{
+                "shop_id": shop_id, "rack_number": f"{shop['shop_code']}-R{r:02d}", "location": f"Aisle {r}"
+            } for r in range(1, 11)], returning=True)
+            section_ids = self._insert(StockSection.__table__, [{
+                "shop_id": shop_id, "rack_id": rack_id, "section_name": f"Shelf {c}",
+                "section_code": f"{shop['shop_code']}-R{r:02d}-{c}"
+            } for r, rack_id in enumerate(rack_ids, 1) for c in "ABCDE"], returning=True)
+
+            # Every product is stocked in several batches, like a real shop's shelves
+            rows, batch_no = [], 0
+            while len(rows) < per_shop:
+                product = catalogue[len(rows) % len(catalogue)]
+                batch_no += 1
+                mrp = product["mrp"]
+                unit_price = round(mrp * rng.uniform(0.55, 0.75), 2)
+                selling_price = round(mrp * rng.uniform(0.85, 1.0), 2)
+                mfg = self.now.date() - timedelta(days=rng.randrange(30, 540))
+                rows.append({
+                    "shop_id": shop_id, "section_id": rng.choice(section_ids),
+                    "product_name": product["product_name"], "composition": product["composition"],
+                    "manufacturer": product["manufacturer"], "hsn_code": product["hsn_code"],
+                    "batch_number": f"{product['product_name'][:3].upper()}{batch_no:06d}",
+                    "package": product["package"], "unit": product["unit"],
+                    "manufacturing_date": mfg, "expiry_date": mfg + timedelta(days=rng.choice([540, 720, 1080])),
+                    # Generous quantities so load tests can keep selling
+                    "quantity_software": rng.randrange(200, 5000), "quantity_physical": None,
+                    "mrp": f"{mrp:.2f}/STRIP", "unit_price": unit_price, "selling_price": selling_price,
+                    "profit_margin": round((selling_price - unit_price) / selling_price * 100, 2),
+                    "created_at": self.now, "updated_at": self.now
+                })
+            self._insert(StockItem.__table__, rows)
+
+            sample = self.conn.execute(
+                select(StockItem.id, StockItem.product_name, StockItem.batch_number, StockItem.selling_price)
+                .where(StockItem.shop_id == shop_id).order_by(StockItem.id)
+            ).all()
+            shop["stock"] = [tuple(row) for row in sample]
+            shop["batches"] = len(sample)
+
+    # ── bills ──────────────────────────────────────────────────────────────
+
+    def bills(self):
+        from modules.billing_v2.models import Bill, BillItem
+
+        rng, p, shops = self.rng, self.p, self._shops()
+        customers = [(f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", _phone(9, n)) for n in range(1, 5001)]
+        bill_counters: Dict[tuple, int] = {}
+        remaining = p["bills"]
+        while remaining > 0:
+            size = min(CHUNK, remaining)
+            remaining -= size
+            bill_rows, bill_lines = [], []
+            for _ in range(size):
+                shop = rng.choice(shops)
+                staff = rng.choice(shop["staff"])
+                created_at = self._random_moment(p["days"])
+                day_key = (shop["shop_id"], created_at.date())
+                bill_counters[day_key] = bill_counters.get(day_key, 0) + 1
+
+                lines, subtotal, tax_total = [], 0.0, 0.0
+                for stock_id, name, batch, price in rng.sample(shop["stock"], rng.choice([1, 1, 2, 2, 3, 4, 6])):
+                    quantity = rng.choice([1, 1, 1, 2, 3, 5])
+                    base = round(price * quantity, 2)
+                    tax = round(base * 0.05, 2)
+                    subtotal += base
+                    tax_total += tax
+                    lines.append({
+                        "shop_id": shop["shop_id"], "stock_item_id": stock_id, "item_name": name,
+                        "batch_number": batch, "quantity": quantity, "strips_deducted": quantity,
+                        "unit_price": price, "tax_percent": 5.0, "sgst_percent": 2.5, "cgst_percent": 2.5,
+                        "sgst_amount": round(tax / 2, 2), "cgst_amount": round(tax / 2, 2),
+                        "tax_amount": tax, "total_price": round(base + tax, 2)
+                    })
+                total = round(subtotal + tax_total, 2)
+                customer_name, customer_phone = rng.choice(customers) if rng.random() < 0.6 else (None, None)
+                pay_later = customer_phone is not None and rng.random() < 0.05
+                paid = 0.0 if pay_later else total
+                online = round(paid, 2) if rng.random() < 0.45 else 0.0
+                bill_rows.append({
+                    "shop_id": shop["shop_id"], "staff_id": staff["id"], "staff_name": staff["name"],
+                    "bill_number": f"BILL-{created_at.strftime('%Y%m%d')}-{shop['shop_id']}-{bill_counters[day_key]:04d}",
+                    "customer_name": customer_name, "customer_phone": customer_phone,
+                    "doctor_name": rng.choice(DOCTORS), "cash_amount": paid - online, "card_amount": 0.0,
+                    "online_amount": online, "subtotal": round(subtotal, 2), "discount_amount": 0.0,
+                    "tax_amount": round(tax_total, 2), "total_amount": total, "amount_paid": paid,
+                    "change_returned": 0.0, "payment_status": "pay_later" if pay_later else "paid",
+                    "amount_due": total if pay_later else 0.0, "created_at": created_at
+                })
+                bill_lines.append(lines)
+
+            bill_ids = self._insert(Bill.__table__, bill_rows, returning=True)
+            items = [dict(line, bill_id=bill_id) for bill_id, lines in zip(bill_ids, bill_lines) for line in lines]
+            self._insert(BillItem.__table__, items)
+            self._progress("bills", p["bills"] - remaining, p["bills"])
+
+    # ── purchase invoices ─────────────────────────────────────────────────
+
+    def invoices(self):
+        from modules.invoice_analyzer_v2.models import PurchaseInvoice, PurchaseInvoiceItem
+
+        rng, p, shops = self.rng, self.p, self._shops()
+        remaining, number = p["invoices"], 0
+        while remaining > 0:
+            size = min(CHUNK // 10, remaining)
+            remaining -= size
+            invoice_rows, invoice_lines = [], []
+            for _ in range(size):
+                number += 1
+                shop = rng.choice(shops)
+                staff = rng.choice(shop["staff"])
+                created_at = self._random_moment(p["days"])
+                lines, taxable = [], 0.0
+                for _stock_id, name, _batch, price in rng.sample(shop["stock"], rng.randrange(5, 16)):
+                    quantity = rng.choice([10, 20, 50, 100])
+                    unit_price = round(price * 0.7, 2)
+                    amount = round(unit_price * quantity, 2)
+                    taxable += amount
+                    lines.append({
+                        "shop_id": shop["shop_id"], "product_name": name,
+                        "batch_number": f"INV{number:06d}", "quantity": quantity,
+                        "free_quantity": rng.choice([0, 0, 0, 2, 5]), "unit_price": unit_price,
+                        "selling_price": price, "taxable_amount": amount,
+                        "total_amount": round(amount * 1.12, 2)
+                    })
+                gst = round(taxable * 0.12, 2)
+                verified = created_at < self.now - timedelta(days=2)
+                invoice_rows.append({
+                    "shop_id": shop["shop_id"], "staff_id": staff["id"], "staff_name": staff["name"],
+                    "invoice_number": f"PI/{created_at.year}/{number:06d}", "invoice_date": created_at.date(),
+                    "supplier_name": rng.choice(SUPPLIERS), "gross_amount": round(taxable, 2),
+                    "taxable_amount": round(taxable, 2), "cgst_amount": round(gst / 2, 2),
+                    "sgst_amount": round(gst / 2, 2), "total_gst": gst, "net_amount": round(taxable + gst, 2),
+                    "custom_fields": {}, "is_staff_verified": verified, "is_admin_verified": verified,
+                    "is_verified": verified, "created_at": created_at, "updated_at": created_at
+                })
+                invoice_lines.append(lines)
+
+            invoice_ids = self._insert(PurchaseInvoice.__table__, invoice_rows, returning=True)
+            items = [dict(line, invoice_id=invoice_id)
+                     for invoice_id, lines in zip(invoice_ids, invoice_lines) for line in lines]
+            self._insert(PurchaseInvoiceItem.__table__, items)
+            self._progress("invoices", p["invoices"] - remaining, p["invoices"])
+
+    # ── attendance ─────────────────────────────────────────────────────────
+
+    def attendance(self):
+        from modules.auth.attendance.models import AttendanceRecord
+
+        rng, p = self.rng, self.p
+        today = self.now.date()
+        rows = []
+        for shop in self._shops():
+            for staff in shop["staff"]:
+                for back in range(p["attendance_days"], -1, -1):
+                    day = today - timedelta(days=back)
+                    if day.weekday() == 6 or rng.random() < 0.05:  # Sundays off, occasional absence
+                        continue
+                    late_by = max(0, int(rng.gauss(5, 12)))
+                    check_in = datetime.combine(day, dtime(9)) + timedelta(minutes=late_by)
+                    # Today's shift is still open: the last heartbeat just arrived
+                    check_out = None if back == 0 else datetime.combine(day, dtime(18)) + timedelta(minutes=rng.randrange(-30, 60))
+                    rows.append({
+                        "shop_id": shop["shop_id"], "staff_id": staff["id"], "date": day,
+                        "check_in_time": check_in, "check_out_time": check_out,
+                        "status": "late" if late_by > 15 else "present", "is_late": late_by > 15,
+                        "late_by_minutes": late_by if late_by > 15 else 0,
+                        "total_hours": int((check_out - check_in).total_seconds() // 60) if check_out else None,
+                        "total_break_minutes": rng.choice([0, 0, 15, 30, 45]),
+                        "auto_checked_in": True, "auto_checked_out": check_out is not None,
+                        "created_at": check_in, "updated_at": check_out or self.now
+                    })
+        self._insert(AttendanceRecord.__table__, rows)
+
+    def _progress(self, what: str, done: int, total: int):
+        if done == total or done % (CHUNK * 25) == 0:
+            print(f"  {what}: {done:,}/{total:,}")
+
+    def write_manifest(self, path: str):
+        for shop in self._shops():
+            # The load test only needs a sample of sellable batches and names to type
+            stock = shop.pop("stock")
+            step = max(1, len(stock) // 500)
+            shop["stock_sample"] = [{"id": sid, "product_name": name, "price": price} for sid, name, _batch, price in stock[::step]]
+        with open(path, "w") as f:
+            json.dump(self.manifest, f, indent=2, default=str)
+
+
+def generate(params: dict, seed: int, manifest_path: str):
+    from app.cli import init_db, migrate
+    from app.database.database import engine
+    from modules.auth.models import Shop
+
+    init_db()
+    migrate()
+    with engine.connect() as conn:
+        if conn.execute(select(Shop.id).where(Shop.shop_code.like("BENCH%")).limit(1)).first():
+            raise SystemExit("❌ A bench dataset already exists in this database; generate into a fresh one")
+
+    rng = random.Random(seed)
+    catalogue = _product_catalogue(rng, 2_500)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        generator = DatasetGenerator(conn, rng, dict(params, seed=seed))
+        for step in ("tenants", "stock", "bills", "invoices", "attendance"):
+            step_started = time.perf_counter()
+            getattr(generator, step)(*([catalogue] if step == "stock" else []))
+            print(f"✅ {step} ({time.perf_counter() - step_started:.1f}s)")
+    generator.write_manifest(manifest_path)
+    print(f"\n✅ Dataset generated in {time.perf_counter() - started:.0f}s; manifest: {manifest_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic multi-tenant benchmark dataset")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    for name in SCALES["small"]:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, help=f"override the preset's {name}")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="where to write ids for bench.load_test")
+    args = parser.parse_args()
+
+    params = dict(SCALES[args.scale])
+    params.update({name: getattr(args, name) for name in params if getattr(args, name) is not None})
+    print(f"Generating into {os.getenv('DATABASE_URL', '(default DATABASE_URL)').split('@')[-1]}: {params}")
+    generate(params, args.seed, args.manifest)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
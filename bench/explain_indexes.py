@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Index Usage Check
+Runs EXPLAIN for the hot multi-tenant query shapes against DATABASE_URL and
+checks that each plan uses the index added for it (see
+app/database/migrations.py). Exits non-zero if any query falls back to a
+sequential scan or picks a different index.
+
+On PostgreSQL sequential scans are disabled for the session, so the check
+also proves index usability on small development databases where the
+planner would rightly prefer a seq scan.
+
+Usage (from the repository root, after `python -m app.cli setup`):
+    python -m bench.explain_indexes
+    python -m bench.explain_indexes --verbose
+"""
+import argparse
+import json
+import sys
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Tuple
+from sqlalchemy import select
+from app.database.database import engine
+from app.database.registry import import_all_models
+
+import_all_models()
+
+from modules.auth.attendance.models import AttendanceRecord
+from modules.billing_v2.daily_records_models import DailyRecord
+from modules.billing_v2.models import Bill, BillItem
+from modules.invoice_analyzer_v2.models import PurchaseInvoice, PurchaseInvoiceItem
+from modules.notifications.models import NotificationRead
+from modules.stock_audit_v2.models import StockItem
+
+SHOP_ID = 1
+NOW = datetime.now()
+TODAY = date.today()
+
+
+def hot_queries(dialect: str) -> List[Tuple[str, object, Tuple[str, ...]]]:
+    """(name, statement, acceptable index names)"""
+    queries = [
+        ("bills by shop and period",
+         select(Bill).where(Bill.shop_id == SHOP_ID, Bill.created_at >= NOW - timedelta(days=30),
+                            Bill.created_at <= NOW).order_by(Bill.created_at.desc()),
+         ("ix_bills_shop_created",)),
+        ("bill items of a page of bills",
+         select(BillItem.bill_id).where(BillItem.bill_id.in_([1, 2, 3])),
+         ("ix_bill_items_bill_id",)),
+        ("stock item by product batch",
+         select(StockItem).where(StockItem.shop_id == SHOP_ID, StockItem.product_name == "Dolo 650",
+                                 StockItem.batch_number == "B1"),
+         ("uq_stock_items_shop_product_batch",)),
+        ("stock list ordered by product",
+         select(StockItem).where(StockItem.shop_id == SHOP_ID).order_by(StockItem.product_name).limit(50),
+         ("uq_stock_items_shop_product_batch",)),
+        ("today's attendance for a staff member",
+         select(AttendanceRecord).where(AttendanceRecord.staff_id == 1, AttendanceRecord.shop_id == SHOP_ID,
+                                        AttendanceRecord.date == TODAY),
+         ("ix_attendance_records_staff_shop_date",)),
+        ("notification read marker",
+         select(NotificationRead).where(NotificationRead.notification_id == 1, NotificationRead.staff_id == 1),
+         ("ix_notification_reads_notification_staff",)),
+        ("invoice history of a product",
+         select(PurchaseInvoiceItem).where(PurchaseInvoiceItem.shop_id == SHOP_ID,
+                                           PurchaseInvoiceItem.product_name == "Dolo 650"),
+         ("ix_purchase_invoice_items_shop_product",)),
+        ("latest invoices of a shop",
+         select(PurchaseInvoice).where(PurchaseInvoice.shop_id == SHOP_ID)
+         .order_by(PurchaseInvoice.created_at.desc()).limit(20),
+         ("ix_purchase_invoices_shop_created",)),
+        ("daily record of a shop",
+         select(DailyRecord).where(DailyRecord.shop_id == SHOP_ID, DailyRecord.record_date == TODAY),
+         # SQLite names the index behind the table's UNIQUE constraint itself
+         ("uq_daily_records_shop_date", "sqlite_autoindex_daily_records_1")),
+    ]
+    if dialect == "postgresql":
+        # Substring search needs the pg_trgm GIN indexes (migration 2)
+        queries.append((
+            "medicine typeahead by substring",
+            select(StockItem.id).where(StockItem.shop_id == SHOP_ID, StockItem.product_name.ilike("%cetam%")),
+            ("ix_stock_items_product_name_trgm",)
+        ))
+    return queries
+
+
+def _compile(conn, statement) -> Tuple[str, object]:
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.construct_params()
+    if compiled.positional:
+        return str(compiled), tuple(params[name] for name in compiled.positiontup)
+    return str(compiled), params
+
+
+def _postgres_plan(conn, sql: str, params) -> Tuple[List[str], bool, str]:
+    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + sql, params).scalar()
+    plan = plan if isinstance(plan, list) else json.loads(plan)
+    indexes, seq_scan = [], False
+
+    def walk(node):
+        nonlocal seq_scan
+        if "Index Name" in node:
+            indexes.append(node["Index Name"])
+        if node.get("Node Type") == "Seq Scan":
+            seq_scan = True
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    return indexes, seq_scan, json.dumps(plan[0]["Plan"], indent=2)
+
+
+def _sqlite_plan(conn, sql: str, params) -> Tuple[List[str], bool, str]:
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    details = [row[-1] for row in rows]
+    indexes = []
+    for detail in details:
+        for marker in ("USING COVERING INDEX ", "USING INDEX "):
+            if marker in detail:
+                indexes.append(detail.split(marker, 1)[1].split(" ", 1)[0])
+                break
+    seq_scan = any(d.startswith("SCAN ") and "INDEX" not in d for d in details)
+    return indexes, seq_scan, "\n".join(details)
+
+
+def check(verbose: bool = False) -> int:
+    failures = 0
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.exec_driver_sql("SET enable_seqscan = off")
+            explain: Callable = _postgres_plan
+        elif conn.dialect.name == "sqlite":
+            explain = _sqlite_plan
+        else:
+            print(f"❌ Unsupported database: {conn.dialect.name}")
+            return 1
+
+        print(f"Checking index usage on {conn.dialect.name}\n")
+        for name, statement, expected in hot_queries(conn.dialect.name):
+            sql, params = _compile(conn, statement)
+            indexes, seq_scan, plan = explain(conn, sql, params)
+            ok = any(index in expected for index in indexes) and not seq_scan
+            failures += not ok
+            used = ", ".join(indexes) or "no index"
+            print(f"{'✅' if ok else '❌'} {name:<40} {used}" + ("" if ok else f"  (expected {expected[0]})"))
+            if verbose or not ok:
+                print("    " + plan.replace("\n", "\n    "))
+
+    print(f"\n{'All hot queries use their index' if not failures else f'{failures} queries without the expected index'}")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN the hot queries and check their index usage")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+    return check(args.verbose)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
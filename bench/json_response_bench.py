@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+JSON Response Benchmark
+Compares CustomJSONResponse (orjson) with the previous jsonable_encoder +
+json.dumps path on payloads shaped like our heaviest endpoints, and checks
+that both produce identical bytes and that orjson encodes each payload
+without falling back to jsonable_encoder.
+
+Usage (from the repository root):
+    python -m bench.json_response_bench
+    python -m bench.json_response_bench --rows 20000 --repeat 5
+"""
+import argparse
+import random
+import time
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from typing import List, Optional
+from pydantic import BaseModel
+from app.utils import json_response
+from app.utils.json_response import CustomJSONResponse, ORJSON_AVAILABLE, orm_dict
+
+
+class BillItemOut(BaseModel):
+    id: int
+    item_name: str
+    quantity: int
+    unit_price: float
+    total_price: float
+
+
+class BillOut(BaseModel):
+    id: int
+    bill_number: str
+    customer_name: Optional[str]
+    total_amount: float
+    created_at: datetime
+    items: List[BillItemOut]
+
+
+def profit_analysis_payload(rows: int) -> dict:
+    """Shape of /api/billing/profit-analysis: summary, daily P&L and a long bill list"""
+    now = datetime.now()
+    return {
+        "summary": {"period_days": 30, "start_date": date.today() - timedelta(days=30), "end_date": date.today(),
+                    "total_revenue": 123456.78, "net_profit": 23456.7, "profit_margin": 19.0},
+        "daily_pnl": [
+            {"date": (date.today() - timedelta(days=i)).isoformat(), "revenue": random.random() * 10000,
+             "expenses": random.random() * 1000, "profit": random.random() * 9000}
+            for i in range(30)
+        ],
+        "bill_list": [
+            {"id": i, "bill_number": f"BILL-20250101-1-{i:04d}", "customer_name": f"Customer {i}",
+             "total_amount": round(random.random() * 2000, 2), "payment_method": "cash",
+             "created_at": now - timedelta(minutes=i), "staff_name": "Staff"}
+            for i in range(rows)
+        ]
+    }
+
+
+def stock_payload(rows: int) -> list:
+    """Shape of consolidated stock listings: dates, Decimals and nested racks"""
+    return [
+        {"id": i, "item_name": f"Medicine {i}", "batch_number": f"B{i}", "quantity_software": random.randint(0, 500),
+         "unit_price": Decimal(f"{random.randint(1, 999)}.{random.randint(0, 99):02d}"),
+         "expiry_date": date.today() + timedelta(days=i % 700), "updated_at": datetime.now(),
+         "rack": {"rack_number": f"R{i % 40}", "section": {"section_name": f"S{i % 8}"}}}
+        for i in range(rows)
+    ]
+
+
+def stock_orm_payload(rows: int) -> list:
+    """Shape of /api/stock-audit/items: StockItem rows spread from their __dict__ plus derived fields"""
+    from app.database.registry import import_all_models
+    from modules.stock_audit_v2.models import StockItem
+
+    import_all_models()
+    result = []
+    for i in range(rows):
+        item = StockItem(id=i, shop_id=1, product_name=f"Medicine {i}", batch_number=f"B{i}",
+                         quantity_software=random.randint(0, 500), unit_price=round(random.random() * 100, 2),
+                         expiry_date=date.today() + timedelta(days=i % 700), updated_at=datetime.now())
+        result.append({**orm_dict(item, exclude={"section"}), "section_name": None, "rack_name": None,
+                       "total_value": item.quantity_software * item.unit_price})
+    return result
+
+
+def bills_model_payload(rows: int) -> list:
+    """Pydantic models returned without a response_model (e.g. export previews)"""
+    return [
+        BillOut(
+            id=i, bill_number=f"BILL-{i}", customer_name=None, total_amount=99.5, created_at=datetime.now(),
+            items=[BillItemOut(id=j, item_name=f"Item {j}", quantity=2, unit_price=10.0, total_price=20.0)
+                   for j in range(3)]
+        )
+        for i in range(rows)
+    ]
+
+
+def _time(fn, payload, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(payload)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the default JSON response class")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if not ORJSON_AVAILABLE:
+        print("⚠️  orjson is not installed; both columns use the legacy encoder")
+
+    response = CustomJSONResponse(content=None)
+    payloads = {
+        "profit_analysis": profit_analysis_payload(args.rows),
+        "consolidated_stock": stock_payload(args.rows),
+        "stock_items_orm": stock_orm_payload(args.rows),
+        "bill_models": bills_model_payload(args.rows // 5)
+    }
+
+    print(f"{'payload':<22}{'size':>10}{'legacy ms':>12}{'orjson ms':>12}{'speedup':>10}")
+    for name, payload in payloads.items():
+        fast = response.render(payload)
+        legacy = response.render_legacy(payload)
+        assert fast == legacy, f"{name}: output differs from the legacy encoder"
+        if ORJSON_AVAILABLE:
+            # A fallback would be silent in render(): encode directly so it fails here instead
+            json_response.orjson.dumps(payload, default=json_response._default, option=json_response.ORJSON_OPTIONS)
+
+        legacy_s = _time(response.render_legacy, payload, args.repeat)
+        fast_s = _time(response.render, payload, args.repeat)
+        print(f"{name:<22}{len(fast) // 1024:>8}KB{legacy_s * 1000:>12.1f}{fast_s * 1000:>12.1f}{legacy_s / fast_s:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
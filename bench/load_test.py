@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Load Test
+Replays a scripted multi-tenant load profile against the API and reports
+p50/p95/p99 latency per route. Data and ids come from the manifest written
+by bench.datagen, and tokens are minted locally, so the server must share
+this environment's SECRET_KEY.
+
+Profile per virtual staff user (one POS counter): type a medicine name
+(typeahead searches on growing prefixes), sell it in a fraction of the
+searches (create_bill), and in the background send the WiFi heartbeat and
+poll the notification badge, WiFi status and billing summary. Virtual admin
+users poll the analytics dashboard and the bill list.
+
+Without --base-url the app runs in-process (ASGI transport, lifespan
+included), which is what CI uses. With --json the results are saved;
+--baseline compares p95 per route against saved results and exits non-zero
+on regressions, errors or --slo violations.
+
+Usage (from the repository root, after `python -m bench.datagen`):
+    python -m bench.load_test --duration 30 --users 10
+    python -m bench.load_test --base-url http://localhost:8000 --users 40 --duration 120
+    python -m bench.load_test --json bench/baseline.json
+    python -m bench.load_test --baseline bench/baseline.json --max-regression 0.25 --slo search_medicines=20
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+import httpx
+
+DEFAULT_MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset.json")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.error_samples: Dict[str, str] = {}
+        self.recording = False
+
+    async def call(self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            response, failure = None, f"{type(e).__name__}: {e}"
+        else:
+            failure = None if response.status_code < 400 else f"{response.status_code}: {response.text[:200]}"
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if self.recording:
+            self.latencies[route].append(elapsed_ms)
+            if failure:
+                self.errors[route] += 1
+                self.error_samples.setdefault(route, failure)
+        return response
+
+    def summary(self, seconds: float) -> Dict[str, dict]:
+        routes = {}
+        for route in sorted(self.latencies):
+            values = sorted(self.latencies[route])
+            routes[route] = {
+                "count": len(values),
+                "errors": self.errors.get(route, 0),
+                "rps": round(len(values) / seconds, 2),
+                "mean_ms": round(sum(values) / len(values), 2),
+                "p50_ms": round(percentile(values, 50), 2),
+                "p95_ms": round(percentile(values, 95), 2),
+                "p99_ms": round(percentile(values, 99), 2),
+                "max_ms": round(values[-1], 2),
+            }
+        return routes
+
+
+def _tokens(manifest: dict):
+    from modules.auth.service import AuthService
+
+    staff_users, admin_users = [], []
+    for org in manifest["organizations"]:
+        for admin_id in org["admin_ids"]:
+            admin_users.append({
+                "token": AuthService.create_access_token({
+                    "user_id": admin_id, "user_type": "admin", "organization_id": org["organization_id"]
+                }),
+                "shops": org["shops"]
+            })
+        for shop in org["shops"]:
+            for staff in shop["staff"]:
+                staff_users.append({
+                    "token": AuthService.create_access_token({
+                        "user_id": staff["id"], "user_type": "staff", "organization_id": org["organization_id"],
+                        "shop_code": shop["shop_code"], "user_name": staff["name"]
+                    }),
+                    "shop": shop
+                })
+    return staff_users, admin_users
+
+
+async def _pause(rng: random.Random, think_ms: float):
+    if think_ms > 0:
+        await asyncio.sleep(rng.uniform(0.5, 1.5) * think_ms / 1000)
+
+
+async def _every(seconds: float, rng: random.Random, stop: asyncio.Event, action):
+    # Spread pollers so they do not all fire in the same instant
+    with contextlib.suppress(asyncio.TimeoutError):
+        await asyncio.wait_for(stop.wait(), rng.uniform(0, seconds))
+    while not stop.is_set():
+        await action()
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(stop.wait(), seconds)
+
+
+async def staff_user(client, recorder: Recorder, user: dict, args, rng: random.Random, stop: asyncio.Event):
+    headers = {"Authorization": f"Bearer {user['token']}"}
+    shop = user["shop"]
+
+    async def pos_counter():
+        while not stop.is_set():
+            product = rng.choice(shop["stock_sample"])
+            name = product["product_name"]
+            for length in (3, 4, 6):
+                if length > len(name):
+                    break
+                await recorder.call(client, "search_medicines", "GET", "/api/billing/search-medicines",
+                                    params={"q": name[:length], "limit": 20}, headers=headers)
+                await _pause(rng, args.think_ms / 3)
+            if rng.random() < args.sale_ratio:
+                lines = [product] + rng.sample(shop["stock_sample"], rng.choice([0, 0, 1, 2]))
+                lines = list({line["id"]: line for line in lines}.values())
+                total = sum(line["price"] * 1.05 for line in lines)
+                await recorder.call(client, "create_bill", "POST", "/api/billing/bills", headers=headers, json={
+                    "cash_amount": round(total + 1, 2),
+                    "items": [{"stock_item_id": line["id"], "quantity": 1, "unit_price": line["price"]}
+                              for line in lines]
+                })
+            await _pause(rng, args.think_ms)
+
+    async def heartbeat():
+        await recorder.call(client, "wifi_heartbeat", "POST", "/api/attendance/wifi/heartbeat", headers=headers,
+                            json={"wifi_ssid": shop["wifi_ssid"]})
+
+    async def badge():
+        await recorder.call(client, "notifications_unread_count", "GET", "/api/notifications/staff/unread-count",
+                            headers=headers)
+
+    async def wifi_status():
+        await recorder.call(client, "wifi_status", "GET", "/api/attendance/wifi/status", headers=headers)
+
+    async def summary():
+        await recorder.call(client, "billing_summary", "GET", "/api/billing/summary", headers=headers)
+
+    scale = args.poll_scale
+    await asyncio.gather(
+        pos_counter(),
+        _every(30 * scale, rng, stop, heartbeat),
+        _every(15 * scale, rng, stop, badge),
+        _every(30 * scale, rng, stop, wifi_status),
+        _every(60 * scale, rng, stop, summary),
+    )
+
+
+async def admin_user(client, recorder: Recorder, user: dict, args, rng: random.Random, stop: asyncio.Event):
+    headers = {"Authorization": f"Bearer {user['token']}"}
+
+    async def dashboard():
+        shop_id = rng.choice([None] + [shop["shop_id"] for shop in user["shops"]])
+        params = {"days": rng.choice([7, 30])}
+        if shop_id:
+            params["shop_id"] = shop_id
+        await recorder.call(client, "admin_dashboard", "GET", "/api/billing/admin/analytics/dashboard",
+                            params=params, headers=headers)
+
+    async def bill_list():
+        await recorder.call(client, "admin_bills", "GET", "/api/billing/admin/bills",
+                            params={"page": rng.randrange(1, 6), "per_page": 20}, headers=headers)
+
+    scale = args.poll_scale
+    await asyncio.gather(
+        _every(10 * scale, rng, stop, dashboard),
+        _every(20 * scale, rng, stop, bill_list),
+    )
+
+
+@contextlib.asynccontextmanager
+async def _client(base_url: Optional[str]):
+    if base_url:
+        async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+            yield client
+        return
+    import main
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as client:
+            yield client
+
+
+async def run(args, manifest: dict) -> Dict[str, dict]:
+    staff_users, admin_users = _tokens(manifest)
+    rng = random.Random(args.seed)
+    admins = min(args.users, round(args.users * args.admin_ratio)) if admin_users else 0
+    recorder, stop = Recorder(), asyncio.Event()
+
+    async with _client(args.base_url) as client:
+        tasks = []
+        for n in range(args.users):
+            user_rng = random.Random(rng.random())
+            if n < admins:
+                tasks.append(admin_user(client, recorder, admin_users[n % len(admin_users)], args, user_rng, stop))
+            else:
+                tasks.append(staff_user(client, recorder, staff_users[n % len(staff_users)], args, user_rng, stop))
+        runner = asyncio.gather(*tasks)
+
+        await asyncio.sleep(args.warmup)
+        recorder.recording = True
+        started = time.perf_counter()
+        await asyncio.sleep(args.duration)
+        recorder.recording = False
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await runner
+
+    for route, sample in recorder.error_samples.items():
+        print(f"⚠️  {route} failed, e.g. {sample}")
+    return recorder.summary(elapsed)
+
+
+def report(routes: Dict[str, dict]):
+    print(f"\n{'route':<28}{'count':>8}{'err':>6}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for route, s in routes.items():
+        print(f"{route:<28}{s['count']:>8}{s['errors']:>6}{s['rps']:>8.1f}"
+              f"{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}{s['max_ms']:>9.1f}")
+
+
+def check(routes: Dict[str, dict], baseline: Optional[dict], args) -> List[str]:
+    failures = []
+    for route, s in routes.items():
+        if s["errors"] / s["count"] > args.max_error_rate:
+            failures.append(f"{route}: {s['errors']}/{s['count']} requests failed")
+    for slo in args.slo:
+        route, limit = slo.split("=", 1)
+        if route not in routes:
+            failures.append(f"{route}: no requests recorded for SLO")
+        elif routes[route]["p95_ms"] > float(limit):
+            failures.append(f"{route}: p95 {routes[route]['p95_ms']:.1f} ms exceeds SLO {float(limit):.0f} ms")
+    for route, previous in (baseline or {}).get("routes", {}).items():
+        if route not in routes:
+            continue
+        current, reference = routes[route]["p95_ms"], previous["p95_ms"]
+        # Ignore sub-noise differences on very fast routes
+        if current > reference * (1 + args.max_regression) and current - reference > args.noise_ms:
+            failures.append(f"{route}: p95 {current:.1f} ms vs baseline {reference:.1f} ms "
+                            f"(+{(current / reference - 1) * 100 if reference else 100:.0f}%)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the scripted load profile and report per-route latency")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="written by bench.datagen")
+    parser.add_argument("--base-url", help="target server; defaults to the app in-process")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--admin-ratio", type=float, default=0.1, help="share of users polling admin dashboards")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before recording")
+    parser.add_argument("--think-ms", type=float, default=300, help="mean pause between POS actions")
+    parser.add_argument("--sale-ratio", type=float, default=0.3, help="share of searches that end in a bill")
+    parser.add_argument("--poll-scale", type=float, default=1.0, help="multiplies the app's polling intervals")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="save results to this file")
+    parser.add_argument("--baseline", help="results file to compare p95 against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed p95 growth vs baseline")
+    parser.add_argument("--noise-ms", type=float, default=5, help="p95 differences below this never fail")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--slo", action="append", default=[], metavar="ROUTE=MS", help="p95 ceiling for a route")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.manifest):
+        raise SystemExit(f"❌ No manifest at {args.manifest}; run `python -m bench.datagen` first")
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    target = args.base_url or "in-process app"
+    print(f"Load test: {args.users} users for {args.duration:.0f}s against {target}")
+    routes = asyncio.run(run(args, manifest))
+    report(routes)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"params": {k: v for k, v in vars(args).items() if k not in ("json", "baseline")},
+                       "dataset": manifest.get("params"), "routes": routes}, f, indent=2)
+        print(f"\nResults saved to {args.json}")
+
+    failures = check(routes, baseline, args)
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("\n✅ Load test passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
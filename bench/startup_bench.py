@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+Measures worker cold start in fresh interpreters: `import main` (with
+python -X importtime) and the lifespan startup, lists the slowest imports,
+and exits non-zero when the budget is exceeded or a library that must stay
+lazy (pandas, pdfplumber, openpyxl, google-genai, ...) is imported at
+start-up.
+
+Usage (from the repository root):
+    python -m bench.startup_bench
+    python -m bench.startup_bench --budget-ms 1500 --runs 5 --top 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Only needed by specific endpoints; importing them at start-up costs seconds
+LAZY_MODULES = (
+    "pandas", "numpy", "pdfplumber", "openpyxl", "sklearn",
+    "google.genai", "google.generativeai", "aiohttp",
+)
+
+PROBE = """
+import asyncio, json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def run_lifespan():
+    async with main.app.router.lifespan_context(main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(run_lifespan())
+print(json.dumps({"import_s": imported - start, "lifespan_s": ready - imported}))
+"""
+
+
+def _parse_importtime(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """module -> (self us, cumulative us) from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def _run_once() -> Tuple[dict, Dict[str, Tuple[int, int]]]:
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        capture_output=True, text=True, env=env
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"❌ Startup failed:\n{result.stderr[-4000:]}")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return timings, _parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark worker start-up time")
+    parser.add_argument("--budget-ms", type=float, default=2500, help="max import + lifespan time (best run)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    args = parser.parse_args()
+
+    runs: List[Tuple[dict, Dict[str, Tuple[int, int]]]] = [_run_once() for _ in range(args.runs)]
+    best_timings, modules = min(runs, key=lambda r: r[0]["import_s"] + r[0]["lifespan_s"])
+    total_ms = (best_timings["import_s"] + best_timings["lifespan_s"]) * 1000
+
+    print(f"{'run':<6}{'import ms':>12}{'lifespan ms':>14}")
+    for i, (timings, _) in enumerate(runs, 1):
+        print(f"{i:<6}{timings['import_s'] * 1000:>12.1f}{timings['lifespan_s'] * 1000:>14.1f}")
+
+    print("\nSlowest imports (self time, best run):")
+    slowest = sorted(modules.items(), key=lambda m: m[1][0], reverse=True)[:args.top]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"  {self_us / 1000:>8.1f} ms  (cumulative {cumulative_us / 1000:>8.1f} ms)  {name}")
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in modules]
+    if eager:
+        failed = True
+        print(f"\n❌ Imported at start-up but should be lazy: {', '.join(eager)}")
+
+    if total_ms > args.budget_ms:
+        failed = True
+        print(f"\n❌ Start-up took {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    else:
+        print(f"\n✅ Start-up took {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,12 @@
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+import logging
 import os
-from datetime import datetime
 
 # Load environment variables
 load_dotenv()
@@ -28,68 +28,88 @@ from modules.billing_v2.staff.staff_routes import router as billing_staff_router
 from modules.billing_v2.admin.admin_routes import router as billing_admin_router
 from modules.auth.middleware import ShopContextMiddleware
 from modules.auth.attendance.wifi_middleware import WiFiEnforcementMiddleware
-from modules.auth.attendance.scheduler import start_scheduler, shutdown_scheduler
-# from app.middleware.rate_limit import RateLimitMiddleware
+from modules.auth.attendance.scheduler import scheduler, start_scheduler, shutdown_scheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from app.middleware.rate_limit import RateLimitMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.conditional_get import ConditionalGetMiddleware
 from app.core.config import settings
-from app.database.database import engine, Base
-from modules.customer_tracking.models import (
-    ContactRecord, ContactInteraction, ContactReminder,
-    Customer, CustomerPurchase, RefillReminder
-)
-from modules.stock_audit_v2.models import *
-from modules.billing_v2.models import Bill, BillItem
-from modules.billing_v2.daily_records_models import DailyRecord as BillingDailyRecord, DailyExpense
-from modules.auth.models import Admin, Shop, Staff
-from modules.auth.otp.models import OTPVerification
-from modules.auth.salary_management.models import SalaryRecord, StaffPaymentInfo, SalaryAlert
-from modules.auth.attendance.models import (
-    ShopWiFi, StaffDevice, AttendanceRecord, 
-    AttendanceSettings, LeaveRequest
-)
-from modules.notifications.models import (
-    Notification, NotificationShopTarget, NotificationStaffTarget, NotificationRead, StaffRequest
-)
-from modules.invoice_analyzer_v2.models import PurchaseInvoice, PurchaseInvoiceItem
-from modules.distributor_invoice.models import DistributorInvoice, DistributorInvoiceItem
-from modules.feedback.models import Feedback
-from modules.auth.rbac.models import Module, OrganizationModulePermission
+from app.database.database import async_engine
+from app.database.registry import import_all_models
+from app.database.pool_metrics import get_pool_stats, log_pool_stats
+from app.utils.cache import dashboard_cache
+from app.utils.tiered_cache import tiered_cache
+from app.utils.json_response import CustomJSONResponse
+from app.utils.metrics import flush_metrics, render_metrics
+from app.utils.idempotency import purge_expired_keys
+from app.services.redis_service import redis_service
+from modules.auth.service import token_cache
 
-# Create all tables
-Base.metadata.create_all(bind=engine)
+# Every model must be mapped before the first query (relationship targets);
+# schema creation and seeding are one-shot steps: python -m app.cli setup
+import_all_models()
 
-# Seed SuperAdmins on startup (production only)
-import os
-import sys
-import importlib.util
-
-if os.getenv('ENVIRONMENT') == 'production':
-    try:
-        # Load seed_superadmins module dynamically
-        seed_path = os.path.join(os.path.dirname(__file__), 'super-admin', 'seed_superadmins.py')
-        spec = importlib.util.spec_from_file_location("seed_superadmins", seed_path)
-        seed_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(seed_module)
-        seed_module.seed_superadmins()
-    except Exception as e:
-        print(f"Warning: Could not seed SuperAdmins: {e}")
-
-# Custom JSON encoder to append 'Z' to datetime strings
-class CustomJSONResponse(JSONResponse):
-    def render(self, content) -> bytes:
-        return super().render(
-            jsonable_encoder(
-                content,
-                custom_encoder={
-                    datetime: lambda v: v.isoformat() + 'Z' if v else None
-                }
-            )
+_startup_logger = logging.getLogger("startup")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Per-worker startup and shutdown (nothing here touches the schema)"""
+    # Periodic connection pool log line (per worker)
+    if settings.db_pool_log_interval > 0:
+        scheduler.add_job(
+            log_pool_stats,
+            trigger=IntervalTrigger(seconds=settings.db_pool_log_interval),
+            id='log_db_pool_stats',
+            name='Log database connection pool usage',
+            replace_existing=True
+        )
+
+    # Publish this worker's request metrics for /metrics aggregation
+    if settings.metrics_flush_interval > 0:
+        scheduler.add_job(
+            flush_metrics,
+            trigger=IntervalTrigger(seconds=settings.metrics_flush_interval),
+            id='flush_request_metrics',
+            name='Write request metrics snapshot',
+            replace_existing=True
+        )
+
+    # Drop expired Idempotency-Key responses
+    if settings.idempotency_purge_interval > 0:
+        scheduler.add_job(
+            purge_expired_keys,
+            trigger=IntervalTrigger(seconds=settings.idempotency_purge_interval),
+            id='purge_idempotency_keys',
+            name='Purge expired idempotency keys',
+            replace_existing=True
         )
 
+    # Start attendance scheduler for stale session detection
+    start_scheduler()
+
+    # Gemini API health check on startup
+    if os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY"):
+        _startup_logger.info("✅ GEMINI_API_KEY found - AI invoice extraction enabled")
+    else:
+        _startup_logger.warning(
+            "⚠️  GEMINI_API_KEY not set - invoice extraction will use regex fallback only. "
+            "Set GEMINI_API_KEY in .env to enable AI-powered extraction."
+        )
+
+    yield
+
+    shutdown_scheduler()
+    await async_engine.dispose()
+    await redis_service.close()
+
 app = FastAPI(
     title="Pharmacy Management System",
     description="Modular microservice for pharmacy operations",
     version="2.0.0",
-    default_response_class=CustomJSONResponse
+    default_response_class=CustomJSONResponse,
+    lifespan=lifespan
 )
 
 # Custom validation error handler
@@ -141,6 +161,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Queries", "X-DB-Time", "ETag", "X-Next-Cursor", "X-Total-Count", "Idempotent-Replayed"],
 )
 
 # Shop context middleware
@@ -150,7 +171,18 @@ app.add_middleware(ShopContextMiddleware)
 app.add_middleware(WiFiEnforcementMiddleware)
 
 # Rate limiting middleware
-# app.add_middleware(RateLimitMiddleware)
+if settings.rate_limit_enabled:
+    app.add_middleware(RateLimitMiddleware)
+
+# Content-hash ETags / 304 for @etag_route endpoints (inside compression, so it hashes the identity body)
+app.add_middleware(ConditionalGetMiddleware)
+
+# Response compression (gzip/brotli above COMPRESSION_MIN_SIZE, streaming-safe)
+if settings.compression_enabled:
+    app.add_middleware(CompressionMiddleware)
+
+# Request metrics middleware (outermost, so latency includes the other middleware)
+app.add_middleware(MetricsMiddleware)
 
 # Module routes
 app.include_router(auth_router, prefix="/api/auth", tags=["Authentication"])
@@ -169,29 +201,10 @@ app.include_router(stock_admin_router, prefix="/api/stock-audit/admin", tags=["S
 app.include_router(billing_staff_router, prefix="/api/billing", tags=["Billing"])
 app.include_router(billing_admin_router, prefix="/api/billing", tags=["Billing Admin"])
 
-# Start attendance scheduler for stale session detection
-start_scheduler()
-
-# Gemini API health check on startup
-import logging
-_startup_logger = logging.getLogger("startup")
-_gemini_api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-if _gemini_api_key:
-    _startup_logger.info("✅ GEMINI_API_KEY found - AI invoice extraction enabled")
-else:
-    _startup_logger.warning(
-        "⚠️  GEMINI_API_KEY not set - invoice extraction will use regex fallback only. "
-        "Set GEMINI_API_KEY in .env to enable AI-powered extraction."
-    )
-
 # Mount static files for uploads
 os.makedirs("uploads/qr_codes", exist_ok=True)
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
-@app.on_event("shutdown")
-def shutdown_event():
-    shutdown_scheduler()
-
 @app.get("/")
 async def root():
     return {"message": "Pharmacy Management System - Modular API v2.0"}
@@ -205,6 +218,36 @@ async def health_check():
         "ai_extraction": "enabled" if gemini_key else "disabled (fallback only - set GEMINI_API_KEY)"
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus metrics aggregated across all uvicorn workers"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/health/db-pool")
+async def db_pool_health():
+    """Connection pool usage for this worker (checked-out, overflow, wait-time histogram)"""
+    return {
+        "worker_pid": os.getpid(),
+        "config": {
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout,
+            "pool_recycle": settings.db_pool_recycle,
+            "pool_pre_ping": settings.db_pool_pre_ping
+        },
+        "pools": get_pool_stats()
+    }
+
+@app.get("/health/cache")
+async def cache_health():
+    """Cache counters for this worker (dashboard L1/L2 and verified tokens)"""
+    return {
+        "worker_pid": os.getpid(),
+        "dashboard_cache": dashboard_cache.stats(),
+        "tiered_cache": tiered_cache.stats(),
+        "token_cache": token_cache.stats()
+    }
+
 @app.get("/modules")
 async def list_modules():
     return {
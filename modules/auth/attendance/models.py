@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Date, Time, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Date, Time, Boolean, Index
 from sqlalchemy.orm import relationship
 from app.database.database import Base
 from datetime import datetime
@@ -40,6 +40,7 @@ class StaffDevice(Base):
 class AttendanceRecord(Base):
     """Daily attendance records with WiFi auto-detection"""
     __tablename__ = "attendance_records"
+    __table_args__ = (Index('ix_attendance_records_staff_shop_date', 'staff_id', 'shop_id', 'date'),)
     
     id = Column(Integer, primary_key=True, index=True)
     shop_id = Column(Integer, ForeignKey("shops.id"), nullable=False, index=True)
@@ -1,22 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from app.database.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.database import get_db, get_async_db
 from datetime import datetime, date, timedelta
 from typing import List, Optional
 from . import schemas, models, service
 from ..models import Staff
 from .dependencies import get_current_attendance_user
 from .wifi_heartbeat_service import WiFiHeartbeatService
+from app.utils.etag import etag_route
+from app.utils.json_response import orm_dict
 
 router = APIRouter()
 
 # ============= WIFI HEARTBEAT (AUTO CHECK-IN/OUT) =============
 
 @router.post("/wifi/heartbeat")
-def wifi_heartbeat(
+async def wifi_heartbeat(
     heartbeat_data: schemas.WiFiHeartbeat,
     current_user: tuple = Depends(get_current_attendance_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     WiFi heartbeat endpoint - Staff app calls this every 30-60 seconds when connected to shop WiFi.
@@ -29,42 +32,21 @@ def wifi_heartbeat(
     if user_type != "staff":
         raise HTTPException(status_code=403, detail="Only staff can send heartbeats")
     
-    result = WiFiHeartbeatService.process_heartbeat(
-        db=db,
-        staff_id=user.id,
-        shop_id=shop_id,
-        wifi_ssid=heartbeat_data.wifi_ssid,
-        mac_address=heartbeat_data.mac_address,
-        latitude=heartbeat_data.latitude,
-        longitude=heartbeat_data.longitude
-    )
-    
-    # If error, store it in today's attendance record for display
-    if result.get('action') == 'error':
-        today = date.today()
-        attendance = db.query(models.AttendanceRecord).filter(
-            models.AttendanceRecord.staff_id == user.id,
-            models.AttendanceRecord.shop_id == shop_id,
-            models.AttendanceRecord.date == today
-        ).first()
-        
-        if attendance:
-            attendance.last_error = result['message']
-            db.commit()
-    else:
-        # Clear error on successful heartbeat
-        today = date.today()
-        attendance = db.query(models.AttendanceRecord).filter(
-            models.AttendanceRecord.staff_id == user.id,
-            models.AttendanceRecord.shop_id == shop_id,
-            models.AttendanceRecord.date == today
-        ).first()
-        
-        if attendance and attendance.last_error:
-            attendance.last_error = None
-            db.commit()
-    
-    return result
+    def _process(sync_db: Session) -> dict:
+        result = WiFiHeartbeatService.process_heartbeat(
+            db=sync_db,
+            staff_id=user.id,
+            shop_id=shop_id,
+            wifi_ssid=heartbeat_data.wifi_ssid,
+            mac_address=heartbeat_data.mac_address,
+            latitude=heartbeat_data.latitude,
+            longitude=heartbeat_data.longitude
+        )
+        WiFiHeartbeatService.record_heartbeat_error(sync_db, user.id, shop_id, result)
+        return result
+    
+    # Reuse the sync service on the async connection (no threadpool hop)
+    return await db.run_sync(_process)
 
 @router.post("/wifi/disconnect")
 def wifi_disconnect(
@@ -91,6 +73,7 @@ def wifi_disconnect(
     return result
 
 @router.get("/wifi/status")
+@etag_route()
 def get_wifi_status(
     current_user: tuple = Depends(get_current_attendance_user),
     db: Session = Depends(get_db)
@@ -620,7 +603,7 @@ def get_all_leave_requests(
     result = []
     for leave, staff in requests:
         result.append(schemas.LeaveRequestWithStaff(
-            **leave.__dict__,
+            **orm_dict(leave),
             staff_name=staff.name,
             staff_code=staff.staff_code
         ))
@@ -649,7 +632,7 @@ def get_pending_leave_requests(
     result = []
     for leave, staff in requests:
         result.append(schemas.LeaveRequestWithStaff(
-            **leave.__dict__,
+            **orm_dict(leave),
             staff_name=staff.name,
             staff_code=staff.staff_code
         ))
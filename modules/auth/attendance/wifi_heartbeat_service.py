@@ -227,6 +227,29 @@ class WiFiHeartbeatService:
             "message": f"Auto checked-in at {check_in_time.strftime('%H:%M:%S')}"
         }
     
+    @staticmethod
+    def record_heartbeat_error(db: Session, staff_id: int, shop_id: int, result: dict):
+        """
+        Store the heartbeat error on today's attendance record for display,
+        or clear a previous error after a successful heartbeat.
+        """
+        today = date.today()
+        attendance = db.query(models.AttendanceRecord).filter(
+            models.AttendanceRecord.staff_id == staff_id,
+            models.AttendanceRecord.shop_id == shop_id,
+            models.AttendanceRecord.date == today
+        ).first()
+        
+        if not attendance:
+            return
+        
+        if result.get('action') == 'error':
+            attendance.last_error = result['message']
+            db.commit()
+        elif attendance.last_error:
+            attendance.last_error = None
+            db.commit()
+    
     @staticmethod
     def process_disconnect(
         db: Session,
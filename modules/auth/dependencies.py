@@ -1,19 +1,21 @@
-from fastapi import Depends, HTTPException, status, Header
+from fastapi import Depends, HTTPException, status, Header, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from app.database.database import get_db
 from . import models, schemas
-from .service import AuthService
+from .middleware import resolve_token_data
+from .principal_cache import load_principal, PRINCIPAL_MODELS
 
 security = HTTPBearer()
 
 def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ):
     """Get current authenticated user (super_admin, admin, staff, or distributor)"""
-    token = credentials.credentials
-    token_data = AuthService.decode_token(token)
+    # Reuses the token already decoded by the middleware for this request
+    token_data = resolve_token_data(request.scope, credentials.credentials)
     
     if not token_data:
         raise HTTPException(
@@ -21,17 +23,12 @@ def get_current_user(
             detail="Invalid authentication credentials"
         )
     
-    if token_data.user_type == "super_admin":
-        user = db.query(models.SuperAdmin).filter(models.SuperAdmin.id == token_data.user_id).first()
-    elif token_data.user_type == "admin":
-        user = db.query(models.Admin).filter(models.Admin.id == token_data.user_id).first()
-    elif token_data.user_type == "staff":
-        user = db.query(models.Staff).filter(models.Staff.id == token_data.user_id).first()
-    elif token_data.user_type == "distributor":
-        user = db.query(models.Distributor).filter(models.Distributor.id == token_data.user_id).first()
-    else:
+    if token_data.user_type not in PRINCIPAL_MODELS:
         raise HTTPException(status_code=401, detail="Invalid user type")
     
+    # Short-lived snapshot shared across workers; skips the user SELECT on polling endpoints
+    user = load_principal(db, token_data.user_type, token_data.user_id)
+    
     if not user or not user.is_active:
         raise HTTPException(status_code=401, detail="User not found or inactive")
     
@@ -1,19 +1,19 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from app.database.database import get_db
-from modules.auth.service import AuthService
+from modules.auth.middleware import resolve_token_data
 from .models import Distributor
 
 security = HTTPBearer()
 
 def get_current_distributor(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ):
     """Get current authenticated distributor"""
-    token = credentials.credentials
-    token_data = AuthService.decode_token(token)
+    token_data = resolve_token_data(request.scope, credentials.credentials)
     
     if not token_data or token_data.user_type != "distributor":
         raise HTTPException(
@@ -5,6 +5,7 @@ from modules.auth.dependencies import get_current_super_admin
 from modules.auth.service import AuthService
 from modules.auth.models import SuperAdmin, Shop
 from modules.auth.otp.service import OTPService
+from modules.auth.principal_cache import invalidate_principal
 from datetime import datetime
 from typing import List, Optional
 from . import models, schemas
@@ -119,6 +120,7 @@ def update_distributor(
     distributor.updated_at = datetime.now()
     
     db.commit()
+    invalidate_principal("distributor", distributor_id)
     db.refresh(distributor)
     
     return distributor
@@ -139,6 +141,7 @@ def delete_distributor(
     
     db.delete(distributor)
     db.commit()
+    invalidate_principal("distributor", distributor_id)
     
     return {"message": "Distributor deleted successfully"}
 
@@ -304,6 +307,7 @@ def update_my_profile(
     
     distributor.updated_at = datetime.now()
     db.commit()
+    invalidate_principal("distributor", distributor.id)
     db.refresh(distributor)
     
     return distributor
@@ -325,6 +329,7 @@ def change_password(
     distributor.password_hash = AuthService.hash_password(password_data.new_password)
     distributor.updated_at = datetime.now()
     db.commit()
+    invalidate_principal("distributor", distributor.id)
     
     return {"message": "Password changed successfully"}
 
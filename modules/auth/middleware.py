@@ -1,32 +1,51 @@
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+from typing import Optional
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+from modules.auth.schemas import TokenData
 from modules.auth.service import AuthService
 
-class ShopContextMiddleware(BaseHTTPMiddleware):
+
+def bearer_token(scope: Scope) -> Optional[str]:
+    """Raw bearer token from the Authorization header, if any"""
+    auth_header = Headers(scope=scope).get("authorization")
+    if auth_header and auth_header.startswith("Bearer "):
+        return auth_header.split(" ")[1]
+    return None
+
+
+def resolve_token_data(scope: Scope, token: Optional[str] = None) -> Optional[TokenData]:
+    """
+    Decode the request's JWT once and share it through scope["state"]
+    (the dict behind request.state). Every middleware and get_current_user
+    call this instead of AuthService.decode_token.
+    """
+    state = scope.setdefault("state", {})
+    if token is None:
+        token = bearer_token(scope)
+    if token is None:
+        return None
+    if state.get("token") != token:
+        state["token"] = token
+        state["token_data"] = AuthService.decode_token(token)
+    return state["token_data"]
+
+
+class ShopContextMiddleware:
     """Middleware to inject shop context into request state"""
-    
-    async def dispatch(self, request: Request, call_next):
-        auth_header = request.headers.get("Authorization")
-        
-        if auth_header and auth_header.startswith("Bearer "):
-            token = auth_header.split(" ")[1]
-            token_data = AuthService.decode_token(token)
-            
-            if token_data:
-                request.state.user_id = token_data.user_id
-                request.state.user_type = token_data.user_type
-                request.state.shop_code = token_data.shop_code
-                request.state.organization_id = getattr(token_data, 'organization_id', None)
-            else:
-                request.state.user_id = None
-                request.state.user_type = None
-                request.state.shop_code = None
-                request.state.organization_id = None
-        else:
-            request.state.user_id = None
-            request.state.user_type = None
-            request.state.shop_code = None
-            request.state.organization_id = None
-        
-        response = await call_next(request)
-        return response
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        token_data = resolve_token_data(scope)
+        state = scope.setdefault("state", {})
+        state["user_id"] = token_data.user_id if token_data else None
+        state["user_type"] = token_data.user_type if token_data else None
+        state["shop_code"] = token_data.shop_code if token_data else None
+        state["organization_id"] = token_data.organization_id if token_data else None
+
+        await self.app(scope, receive, send)
@@ -8,6 +8,8 @@ from sqlalchemy.orm import Session
 from .models import OTPVerification
 from ..models import Admin
 from ..service import AuthService
+from ..principal_cache import invalidate_principal
+from app.utils.metrics import track_external
 
 class OTPService:
     OTP_EXPIRY_MINUTES = 5  # 5 minutes for testing
@@ -90,7 +92,8 @@ class OTPService:
                 }
                 
                 try:
-                    response = requests.get(url, params=params, timeout=5)
+                    with track_external("fast2sms"):
+                        response = requests.get(url, params=params, timeout=5)
                     
                     if response.status_code == 200:
                         result = response.json()
@@ -139,6 +142,7 @@ class OTPService:
         admin.password_hash = AuthService.hash_password(password[:72])
         admin.is_password_set = True
         db.commit()
+        invalidate_principal("admin", admin.id)
         
         otp_code = OTPService.generate_otp()
         expires_at = datetime.now() + timedelta(minutes=OTPService.OTP_EXPIRY_MINUTES)
@@ -390,6 +394,7 @@ class OTPService:
         staff.password_hash = AuthService.hash_password(password[:72])
         staff.is_password_set = True
         db.commit()
+        invalidate_principal("staff", staff.id)
         
         otp_code = OTPService.generate_otp()
         expires_at = datetime.now() + timedelta(minutes=OTPService.OTP_EXPIRY_MINUTES)
@@ -662,6 +667,7 @@ class OTPService:
         distributor.password_hash = AuthService.hash_password(password[:72])
         distributor.is_password_set = True
         db.commit()
+        invalidate_principal("distributor", distributor.id)
         
         otp_code = OTPService.generate_otp()
         expires_at = datetime.now() + timedelta(minutes=OTPService.OTP_EXPIRY_MINUTES)
@@ -1012,6 +1018,7 @@ class OTPService:
             user.is_password_set = True
         
         db.commit()
+        invalidate_principal(user_type, user.id)
         
         # Invalidate all OTPs for this phone
         db.query(OTPVerification).filter(
@@ -0,0 +1,89 @@
+"""
+Principal cache for get_current_user
+Caches a column snapshot of the authenticated user (and, for staff, their
+shop) in the two-tier cache for a few seconds so polling endpoints skip the
+per-request user/shop SELECTs. Snapshots are merged back into the request's
+session with load=False, so the returned objects behave like freshly loaded
+rows: staff.shop is already populated, and changes still flush.
+"""
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from app.core.config import settings
+from app.utils.tiered_cache import tiered_cache, shop_tag, org_tag
+from . import models
+
+PRINCIPAL_MODELS = {
+    "super_admin": models.SuperAdmin,
+    "admin": models.Admin,
+    "staff": models.Staff,
+    "distributor": models.Distributor
+}
+
+# Never copied into the cache; loaded from the database on first access instead
+SENSITIVE_COLUMNS = {"password_hash", "reset_token", "reset_token_expires"}
+
+
+def principal_tag(user_type: str, user_id: int) -> str:
+    return f"principal:{user_type}:{user_id}"
+
+
+def _snapshot(obj) -> dict:
+    return {
+        attr.key: getattr(obj, attr.key)
+        for attr in inspect(obj).mapper.column_attrs
+        if attr.key not in SENSITIVE_COLUMNS
+    }
+
+
+def _restore(db: Session, model, data: dict):
+    obj = model(**data)
+    make_transient_to_detached(obj)
+    return db.merge(obj, load=False)
+
+
+def load_principal(db: Session, user_type: str, user_id: int):
+    """Return the user row for a token, from cache when possible (None if missing or unknown type)"""
+    model = PRINCIPAL_MODELS.get(user_type)
+    if model is None:
+        return None
+
+    if settings.principal_cache_ttl <= 0:
+        return db.query(model).filter(model.id == user_id).first()
+
+    key = principal_tag(user_type, user_id)
+    cached = tiered_cache.get(key)
+    if cached is not None:
+        user = _restore(db, model, cached["user"])
+        if cached.get("shop") and "shop" not in user.__dict__:
+            # Attach without history or backref events, as if eagerly loaded
+            set_committed_value(user, "shop", _restore(db, models.Shop, cached["shop"]))
+        return user
+
+    user = db.query(model).filter(model.id == user_id).first()
+    if user is None:
+        return None
+
+    snapshot = {"user": _snapshot(user)}
+    tags = [key]
+    if user_type == "staff" and user.shop is not None:
+        snapshot["shop"] = _snapshot(user.shop)
+        tags += [shop_tag(user.shop_id, "principals"), org_tag(user.shop.organization_id, "principals")]
+    elif user_type == "admin":
+        tags.append(org_tag(user.organization_id, "principals"))
+    tiered_cache.set(key, snapshot, ttl=settings.principal_cache_ttl, tags=tags)
+    return user
+
+
+def invalidate_principal(user_type: str, user_id: int):
+    tiered_cache.invalidate_tags(principal_tag(user_type, user_id))
+
+
+def invalidate_shop_principals(shop_id: int):
+    """Drop cached staff of a shop (their snapshot embeds the shop row)"""
+    tiered_cache.invalidate_tags(shop_tag(shop_id, "principals"))
+
+
+def invalidate_organization_principals(organization_id: str):
+    """Drop cached admins and staff of an organization (e.g. after its RBAC permissions change)"""
+    tiered_cache.invalidate_tags(org_tag(organization_id, "principals"))
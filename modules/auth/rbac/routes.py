@@ -4,6 +4,7 @@ from app.database.database import get_db
 from typing import List
 from modules.auth.dependencies import get_current_user as get_user_dict, get_current_super_admin
 from modules.auth.models import SuperAdmin
+from modules.auth.principal_cache import invalidate_organization_principals
 from . import schemas, service
 
 router = APIRouter()
@@ -97,6 +98,7 @@ def update_module_permission(
         staff_enabled=staff_enabled,
         configured_by=super_admin.full_name
     )
+    invalidate_organization_principals(organization_id)
     
     return {
         "message": "Permissions updated successfully",
@@ -153,6 +155,7 @@ def update_tab_permission(
         enabled=data.enabled,
         configured_by=super_admin.full_name
     )
+    invalidate_organization_principals(organization_id)
     return {"message": "Tab permission updated", "tab_key": tab_key, "enabled": data.enabled}
 
 
@@ -170,5 +173,6 @@ def reset_to_defaults(
     ).delete()
     
     db.commit()
+    invalidate_organization_principals(organization_id)
     
     return {"message": "Permissions reset to defaults"}
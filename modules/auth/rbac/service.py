@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict
+from app.utils.json_response import orm_dict
 from . import models, schemas
 
 class RBACService:
@@ -115,7 +116,7 @@ class RBACService:
             modules = db.query(models.Module).all()
             return [
                 schemas.ModuleWithPermission(
-                    **module.__dict__,
+                    **orm_dict(module),
                     admin_enabled=True,
                     staff_enabled=True,
                     tab_permissions={t["tab_key"]: True for t in models.MODULE_TABS.get(module.module_key, [])}
@@ -169,7 +170,7 @@ class RBACService:
             tab_permissions = RBACService.get_tab_permissions(db, organization_id, module.module_key)
 
             result.append(schemas.ModuleWithPermission(
-                **module.__dict__,
+                **orm_dict(module),
                 admin_enabled=admin_enabled,
                 staff_enabled=staff_enabled,
                 tab_permissions=tab_permissions,
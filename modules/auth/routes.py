@@ -7,6 +7,7 @@ from pydantic import BaseModel
 from . import schemas, models
 from .service import AuthService
 from .dependencies import get_current_admin, get_current_staff, get_current_super_admin, require_permission
+from .principal_cache import invalidate_principal, invalidate_shop_principals
 from .otp.service import OTPService
 from .otp.schemas import SendOTPRequest, VerifyOTPRequest, OTPResponse
 from app.utils.cache import dashboard_cache
@@ -143,6 +144,7 @@ def update_admin(
         setattr(admin, key, value)
     
     db.commit()
+    invalidate_principal("admin", admin.id)
     db.refresh(admin)
     return admin
 
@@ -184,6 +186,9 @@ def delete_admin(
         # Delete admin
         db.delete(admin)
         db.commit()
+        invalidate_principal("admin", admin_id)
+        for shop in shops:
+            invalidate_shop_principals(shop.id)
         
         return {
             "message": "Last admin in organization deleted. All shops and staff removed.",
@@ -195,6 +200,7 @@ def delete_admin(
         # Other admins exist - only delete this admin
         db.delete(admin)
         db.commit()
+        invalidate_principal("admin", admin_id)
         
         return {
             "message": "Admin deleted successfully. Shops and staff remain accessible to other admins.",
@@ -441,6 +447,7 @@ def update_shop_super(
     shop.updated_at = datetime.now()
     
     db.commit()
+    invalidate_shop_principals(shop_id)
     db.refresh(shop)
     return shop
 
@@ -463,6 +470,7 @@ def delete_shop_super(
     
     db.delete(shop)
     db.commit()
+    invalidate_shop_principals(shop_id)
     
     return {"message": f"Shop and {staff_count} staff members deleted successfully"}
 
@@ -492,6 +500,7 @@ def update_staff_super(
     staff.updated_at = datetime.now()
     
     db.commit()
+    invalidate_principal("staff", staff_id)
     db.refresh(staff)
     return staff
 
@@ -508,6 +517,7 @@ def delete_staff_super(
     
     db.delete(staff)
     db.commit()
+    invalidate_principal("staff", staff_id)
     return {"message": "Staff deleted successfully"}
 
 # ADMIN AUTHENTICATION WITH OTP
@@ -672,6 +682,7 @@ def update_shop(
     shop.updated_at = datetime.now()
     
     db.commit()
+    invalidate_shop_principals(shop_id)
     db.refresh(shop)
     return shop
 
@@ -700,6 +711,7 @@ def delete_shop(
     # Delete the shop
     db.delete(shop)
     db.commit()
+    invalidate_shop_principals(shop_id)
     
     return {"message": f"Shop and {staff_count} staff members deleted successfully"}
 
@@ -776,6 +788,7 @@ def update_staff(
     staff.updated_at = datetime.now()
     
     db.commit()
+    invalidate_principal("staff", staff_id)
     db.refresh(staff)
     return staff
 
@@ -797,6 +810,7 @@ def delete_staff(
     
     db.delete(staff)
     db.commit()
+    invalidate_principal("staff", staff_id)
     return {"message": "Staff deleted successfully"}
 
 # STAFF AUTHENTICATION
@@ -292,6 +292,7 @@ class TokenData(BaseModel):
     shop_code: Optional[str] = None  # For staff
     email: Optional[str] = None
     user_name: Optional[str] = None
+    exp: Optional[int] = None  # Token expiry (unix seconds)
 
 # Password Reset Schemas
 class PasswordResetRequest(BaseModel):
@@ -3,8 +3,12 @@ from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from typing import Optional
+from app.core.config import settings
+from app.utils.cache import BoundedTTLCache
 from . import models, schemas
+import hashlib
 import os
+import time
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", truncate_error=True)
@@ -14,6 +18,13 @@ SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 day
 
+# Verified tokens, keyed by SHA-256 of the raw token and kept until the token's exp
+token_cache = BoundedTTLCache(
+    max_entries=settings.token_cache_max_entries,
+    max_bytes=16 * 1024 * 1024,
+    sweep_interval=settings.cache_sweep_interval
+)
+
 class AuthService:
     
     @staticmethod
@@ -33,6 +44,24 @@ class AuthService:
     
     @staticmethod
     def decode_token(token: str) -> Optional[schemas.TokenData]:
+        if not settings.token_cache_enabled:
+            return AuthService._verify_token(token)
+        
+        key = hashlib.sha256(token.encode()).hexdigest()
+        token_data = token_cache.get(key)
+        if token_data is not None:
+            return token_data
+        
+        token_data = AuthService._verify_token(token)
+        if token_data is not None and token_data.exp is not None:
+            ttl = token_data.exp - time.time()
+            if ttl > 0:
+                token_cache.set(key, token_data, ttl=ttl)
+        return token_data
+    
+    @staticmethod
+    def _verify_token(token: str) -> Optional[schemas.TokenData]:
+        """Check the signature and expiry and build TokenData (uncached)"""
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
             user_id: int = payload.get("user_id")
@@ -51,7 +80,8 @@ class AuthService:
                 organization_id=organization_id,
                 shop_code=shop_code,  # Changed from shop_id to shop_code
                 email=email,
-                user_name=user_name
+                user_name=user_name,
+                exp=payload.get("exp")
             )
         except JWTError:
             return None
@@ -2,27 +2,36 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from app.database.database import get_db
+from app.database.database import get_db, get_read_db
 from modules.auth.models import Admin, Shop
 from typing import Optional
 from datetime import datetime, date, timedelta
 from io import BytesIO
-import json, math
+import json
 from collections import defaultdict
 from modules.billing_v2.daily_records_models import DailyRecord, DailyExpense
 from pydantic import BaseModel
 from modules.auth.dependencies import get_current_admin
 from modules.billing_v2 import models
+from modules.billing_v2.services import BillingService
 from modules.billing_v2.admin.admin_analytics_service import BillingAdminAnalytics
-from app.utils.cache import dashboard_cache
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
+from app.utils.tiered_cache import tiered_cache, cached_route, shop_tag, org_tag
+from app.utils.etag import etag_route
+from app.utils.pagination import paginate, TOTAL_MODE_PATTERN
 
 router = APIRouter()
 
 # ─── ANALYTICS ────────────────────────────────────────────────────────────────
 
 @router.get("/admin/analytics/dashboard")
+@etag_route(
+    key=lambda admin, shop_id, days, **_: f"billing_admin_dashboard:{admin.organization_id}:{shop_id or 'all'}:{days}",
+    tags=lambda admin, **_: [org_tag(admin.organization_id, "billing")]
+)
+@cached_route(
+    key=lambda admin, shop_id, days, **_: f"billing_admin_dashboard:{admin.organization_id}:{shop_id or 'all'}:{days}",
+    tags=lambda admin, **_: [org_tag(admin.organization_id, "billing")]
+)
 def get_admin_dashboard(
     shop_id: Optional[int] = None,
     days: int = Query(30, le=365),
@@ -30,17 +39,15 @@ def get_admin_dashboard(
     admin: Admin = Depends(get_current_admin)
 ):
     """Get comprehensive billing analytics dashboard for admin"""
-    cache_key = f"billing_admin_dashboard:{admin.organization_id}:{shop_id or 'all'}:{days}"
-    cached = dashboard_cache.get(cache_key)
-    if cached is not None:
-        return cached
-
     analytics = BillingAdminAnalytics()
-    data = analytics._gather_billing_data(db, admin.organization_id, shop_id, days)
-    dashboard_cache.set(cache_key, data, ttl=60)
-    return data
+    return analytics._gather_billing_data(db, admin.organization_id, shop_id, days)
 
 @router.get("/admin/analytics/ai-insights")
+@cached_route(
+    key=lambda admin, shop_id, days, **_: f"billing_admin_ai:{admin.organization_id}:{shop_id or 'all'}:{days}",
+    ttl=3600,
+    tags=lambda admin, **_: [org_tag(admin.organization_id, "billing")]
+)
 def get_ai_insights(
     shop_id: Optional[int] = None,
     days: int = Query(30, le=365),
@@ -48,17 +55,10 @@ def get_ai_insights(
     admin: Admin = Depends(get_current_admin)
 ):
     """Generate AI-powered insights for billing data"""
-    cache_key = f"billing_admin_ai:{admin.organization_id}:{shop_id or 'all'}:{days}"
-    cached = dashboard_cache.get(cache_key)
-    if cached is not None:
-        return cached
-
     analytics = BillingAdminAnalytics()
-    result = analytics.generate_comprehensive_analysis(
+    return analytics.generate_comprehensive_analysis(
         db, admin.organization_id, shop_id, days
     )
-    dashboard_cache.set(cache_key, result, ttl=3600)
-    return result
 
 # ─── BILL MANAGEMENT ──────────────────────────────────────────────────────────
 
@@ -70,10 +70,12 @@ def get_admin_bills(
     customer_phone: Optional[str] = None,
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page (keyset pagination)"),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN, description="exact | approx | none"),
     db: Session = Depends(get_db),
     admin: Admin = Depends(get_current_admin)
 ):
-    """List bills for admin (org-scoped, paginated, with optional shop filter)"""
+    """List bills for admin (org-scoped, paginated or cursor-paged, with optional shop filter)"""
     query = (
         db.query(models.Bill)
         .join(Shop, models.Bill.shop_id == Shop.id)
@@ -88,16 +90,10 @@ def get_admin_bills(
     if customer_phone:
         query = query.filter(models.Bill.customer_phone == customer_phone)
 
-    total = query.count()
-    bills = query.order_by(models.Bill.created_at.desc()).offset((page - 1) * per_page).limit(per_page).all()
-
-    return {
-        "items": bills,
-        "total": total,
-        "page": page,
-        "per_page": per_page,
-        "pages": math.ceil(total / per_page) if total > 0 else 1
-    }
+    return paginate(
+        query, models.Bill.created_at, models.Bill.id, per_page,
+        descending=True, page=page, cursor=cursor, total_mode=total_mode
+    ).response()
 
 @router.get("/admin/bills/{bill_id}")
 def get_admin_bill(
@@ -241,10 +237,12 @@ def export_admin_bills_excel(
     shop_id: Optional[int] = Query(None),
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     admin: Admin = Depends(get_current_admin)
 ):
     """Export bills to Excel (org-scoped, optional shop filter)"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
     query = (
         db.query(models.Bill)
         .join(Shop, models.Bill.shop_id == Shop.id)
@@ -314,22 +312,24 @@ def export_admin_bills_excel(
 # ─── PROFIT ANALYSIS ──────────────────────────────────────────────────────────
 
 @router.get("/admin/profit-analysis")
+@cached_route(
+    # Free-text searches are not cached
+    key=lambda admin, shop_id, days, start_date, end_date, search, **_: (
+        None if search
+        else f"billing_admin_profit:{admin.organization_id}:{shop_id or 'all'}:{days}:{start_date}:{end_date}"
+    ),
+    tags=lambda admin, **_: [org_tag(admin.organization_id, "billing")]
+)
 def get_admin_profit_analysis(
     shop_id: Optional[int] = Query(None),
     days: int = Query(30, le=365),
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     admin: Admin = Depends(get_current_admin)
 ):
     """Comprehensive profit & loss analysis for admin (org-scoped, optional shop filter)"""
-    cache_key = f"billing_admin_profit:{admin.organization_id}:{shop_id or 'all'}:{days}:{start_date}:{end_date}"
-    if not search:
-        cached = dashboard_cache.get(cache_key)
-        if cached is not None:
-            return cached
-
     e_date = end_date or date.today()
     s_date = start_date or (e_date - timedelta(days=days))
 
@@ -554,6 +554,7 @@ def get_admin_profit_analysis(
             })
 
     # ── Bill list ────────────────────────────────────────────────────
+    item_counts = BillingService.get_item_counts(db, [b.id for b in bills[:200]])
     bill_list = [
         {
             "id": b.id,
@@ -567,7 +568,7 @@ def get_admin_profit_analysis(
             "tax_amount": round(b.tax_amount, 2),
             "total_amount": round(b.total_amount, 2),
             "payment_method": b.payment_method,
-            "items_count": len(b.items)
+            "items_count": item_counts.get(b.id, 0)
         }
         for b in bills[:200]
     ]
@@ -595,9 +596,6 @@ def get_admin_profit_analysis(
         "shop_comparison": shop_comparison,
         "bill_list": bill_list
     }
-
-    if not search:
-        dashboard_cache.set(cache_key, result, ttl=60)
     return result
 
 # ─── PAY LATER (ADMIN) ────────────────────────────────────────────────────────
@@ -630,6 +628,7 @@ def admin_get_pay_later_customers(
         q = q.filter(func.date(models.Bill.created_at) <= to_date)
 
     bills = q.order_by(models.Bill.created_at.asc()).all()
+    item_counts = BillingService.get_item_counts(db, [b.id for b in bills])
 
     from collections import defaultdict
     groups = defaultdict(list)
@@ -654,7 +653,7 @@ def admin_get_pay_later_customers(
                     "payment_status": b.payment_status,
                     "created_at": b.created_at.isoformat(),
                     "notes": b.notes,
-                    "items_count": len(b.items),
+                    "items_count": item_counts.get(b.id, 0),
                 }
                 for b in customer_bills
             ]
@@ -722,6 +721,7 @@ def admin_record_pay_later_payment(
 
     try:
         result = BillingService.record_payment(db, shop_id, payment)
+        tiered_cache.invalidate_tags(shop_tag(shop_id, "billing"), org_tag(admin.organization_id, "billing"))
         return result
     except ValueError as e:
         from fastapi import HTTPException
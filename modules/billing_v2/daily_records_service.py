@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
 from sqlalchemy.exc import IntegrityError
+from app.utils.json_response import orm_dict
 from .daily_records_models import DailyRecord, DailyExpense
 from .models import Bill
 from datetime import date, datetime
@@ -148,7 +149,7 @@ class DailyRecordsService:
         small_denomination = float(record.cash_sales - depositable_amount)
         
         return {
-            **record.__dict__,
+            **orm_dict(record),
             "average_bill": float(average_bill),
             "total_cash": float(total_cash),
             "recorded_sales": float(recorded_sales),
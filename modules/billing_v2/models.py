@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum, Boolean
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Enum, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database.database import Base
@@ -10,6 +10,10 @@ class PaymentMethod(str, enum.Enum):
 
 class Bill(Base):
     __tablename__ = "bills"
+    __table_args__ = (
+        Index('ix_bills_shop_created', 'shop_id', 'created_at'),
+        Index('uq_bills_shop_client_id', 'shop_id', 'client_id', unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     shop_id = Column(Integer, ForeignKey("shops.id"), nullable=False, index=True)
@@ -17,6 +21,7 @@ class Bill(Base):
     staff_name = Column(String, nullable=False)
     
     bill_number = Column(String, unique=True, index=True, nullable=False)
+    client_id = Column(String(64), nullable=True)  # POS-generated id of bills synced from offline (idempotency)
     
     # Customer details
     customer_name = Column(String, nullable=True)
@@ -70,7 +75,7 @@ class BillItem(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     shop_id = Column(Integer, ForeignKey("shops.id"), nullable=False, index=True)
-    bill_id = Column(Integer, ForeignKey("bills.id"), nullable=False)
+    bill_id = Column(Integer, ForeignKey("bills.id"), nullable=False, index=True)
     stock_item_id = Column(Integer, ForeignKey("stock_items_audit.id"), nullable=False)
     
     # Item details (snapshot at time of sale)
@@ -99,3 +104,11 @@ class BillItem(Base):
     total_price = Column(Float, nullable=False)
     
     bill = relationship("Bill", back_populates="items")
+
+class BillCounter(Base):
+    """Last bill number issued per shop per day (allocated by BillingService.generate_bill_number)"""
+    __tablename__ = "bill_counters"
+
+    shop_id = Column(Integer, ForeignKey("shops.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    last_number = Column(Integer, nullable=False)
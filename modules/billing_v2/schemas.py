@@ -1,4 +1,4 @@
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 from datetime import datetime
 from .models import PaymentMethod
@@ -72,6 +72,34 @@ class BillCreate(BaseModel):
             raise ValueError('Amount cannot be negative')
         return v
 
+class OfflineBillCreate(BillCreate):
+    """A bill made on the POS while offline, synced later through /bills/batch"""
+    client_id: str = Field(..., min_length=1, max_length=64)  # POS-generated unique id (e.g. UUID); retries are deduplicated on it
+    created_at: Optional[datetime] = None  # when the sale happened; defaults to the sync time
+
+class BillBatchCreate(BaseModel):
+    bills: List[OfflineBillCreate]
+
+    @field_validator('bills')
+    @classmethod
+    def validate_bills(cls, v):
+        if not v:
+            raise ValueError('At least one bill is required')
+        return v
+
+class BillBatchResult(BaseModel):
+    client_id: str
+    status: str  # 'created' | 'duplicate' (already synced) | 'failed'
+    bill_id: Optional[int] = None
+    bill_number: Optional[str] = None
+    error: Optional[str] = None
+
+class BillBatchResponse(BaseModel):
+    created: int
+    duplicates: int
+    failed: int
+    results: List[BillBatchResult]
+
 class BillResponse(BaseModel):
     id: int
     shop_id: int
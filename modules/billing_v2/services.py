@@ -1,7 +1,15 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
-from .models import Bill, BillItem
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, or_, select, insert, update, case, literal, text, cast, Integer
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.core.config import settings
+from app.utils.idempotency import record_response
+from .models import Bill, BillItem, BillCounter
 from modules.stock_audit_v2.models import StockItem, StockSection, StockRack
+from modules.stock_audit_v2.services import StockMutationService, InsufficientStockError
 from modules.customer_tracking.services import CustomerTrackingService
 from modules.customer_tracking.models import Customer
 from datetime import datetime, date, timedelta
@@ -10,6 +18,12 @@ import random
 import string
 import re
 import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Engine -> whether pg_trgm is installed (checked once; migration 2 creates it)
+_pg_trgm_installed: Dict[Any, bool] = {}
 
 
 def _parse_tablets_per_strip(package: str) -> int | None:
@@ -29,27 +43,109 @@ class BillingService:
     
     @staticmethod
     def generate_bill_number(db: Session, shop_id: int) -> str:
-        """Generate unique bill number for shop"""
-        today = datetime.now()
-        prefix = f"BILL-{today.strftime('%Y%m%d')}"
-        
-        # Get count of bills today for this shop
-        count = db.query(Bill).filter(
+        """Allocate the next bill number for the shop (BILL-YYYYMMDD-{shop}-{n})"""
+        return BillingService.allocate_bill_numbers(db, shop_id, datetime.now(), 1)[0]
+
+    @staticmethod
+    def allocate_bill_numbers(db: Session, shop_id: int, day: datetime, count: int) -> List[str]:
+        """Allocate `count` consecutive bill numbers for the shop on `day`.
+
+        One UPDATE ... RETURNING on the shop's counter row for the day instead
+        of counting the day's bills. The row lock is held until the bill
+        commits, so concurrent checkouts at one shop get consecutive numbers
+        and a rolled-back bill gives its number back.
+        """
+        last = db.execute(
+            update(BillCounter)
+            .where(BillCounter.shop_id == shop_id, BillCounter.day == day.date())
+            .values(last_number=BillCounter.last_number + count)
+            .returning(BillCounter.last_number)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if last is None:
+            last = BillingService._start_bill_counter(db, shop_id, day.date(), count)
+        return [f"BILL-{day.strftime('%Y%m%d')}-{shop_id}-{n:04d}" for n in range(last - count + 1, last + 1)]
+
+    @staticmethod
+    def _start_bill_counter(db: Session, shop_id: int, day: date, count: int = 1) -> int:
+        """Create the day's counter row, continuing after bills already numbered that day (e.g. before a deploy).
+
+        Seeded from the highest number used that day rather than the count of
+        the day's bills, which falls behind once a bill is deleted.
+        """
+        prefix = f"BILL-{day.strftime('%Y%m%d')}-{shop_id}-"
+        last_used = db.query(
+            func.max(cast(func.substr(Bill.bill_number, len(prefix) + 1), Integer))
+        ).filter(
             Bill.shop_id == shop_id,
-            func.date(Bill.created_at) == today.date()
-        ).count()
-        
-        return f"{prefix}-{shop_id}-{count + 1:04d}"
+            Bill.bill_number.like(f"{prefix}%")
+        ).scalar() or 0
+        upsert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+        # A concurrent first checkout may have created the row meanwhile: then take the next numbers
+        stmt = upsert(BillCounter).values(shop_id=shop_id, day=day, last_number=last_used + count)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[BillCounter.shop_id, BillCounter.day],
+            set_={"last_number": BillCounter.last_number + count}
+        ).returning(BillCounter.last_number)
+        return db.execute(stmt).scalar()
     
     @staticmethod
-    def search_medicines(
-        db: Session, 
-        shop_id: int, 
-        search_term: str,
-        limit: int = 20
-    ) -> List[Dict[str, Any]]:
-        """Search medicines by name, generic name, brand, or batch number"""
-        query = db.query(
+    def _trigram_search(db: Session) -> bool:
+        """Whether medicine search can use pg_trgm (PostgreSQL with the extension installed)"""
+        bind = db.get_bind()
+        if not settings.medicine_search_trigram or bind.dialect.name != "postgresql":
+            return False
+        engine = getattr(bind, "engine", bind)
+        if engine not in _pg_trgm_installed:
+            installed = db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+            if not installed:
+                logger.warning("pg_trgm is not installed (migration 2 pending?): medicine search falls back to ILIKE")
+            _pg_trgm_installed[engine] = installed
+        return _pg_trgm_installed[engine]
+
+    @staticmethod
+    def _search_medicines_stmt(
+        shop_id: int, search_term: str, limit: int, dialect: str = "postgresql", trigram: bool = False
+    ):
+        """Build the ranked medicine search SELECT (shared by the sync and async paths).
+
+        Matches are substring hits on product name, batch or manufacturer
+        (served by the pg_trgm GIN indexes on PostgreSQL) plus, with
+        `trigram`, near-misses on the product name ('paracetmol'). Ranking:
+        name prefix matches first, then trigram similarity (match position
+        and name length without pg_trgm), then earliest expiry and most
+        stock so the batch to sell first comes first.
+        """
+        term = search_term.strip()
+        escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        contains, prefix = f"%{escaped}%", f"{escaped}%"
+
+        matches = [
+            StockItem.product_name.ilike(contains, escape="\\"),
+            StockItem.batch_number.ilike(contains, escape="\\"),
+            StockItem.manufacturer.ilike(contains, escape="\\")
+        ]
+        prefix_rank = case((StockItem.product_name.ilike(prefix, escape="\\"), 0), else_=1)
+
+        if trigram:
+            if len(term) >= 3:
+                # pg_trgm similarity operator; uses the same GIN index
+                matches.append(StockItem.product_name.op("%")(term))
+            relevance = [prefix_rank, func.greatest(
+                func.similarity(StockItem.product_name, term),
+                func.similarity(StockItem.batch_number, term),
+                func.similarity(func.coalesce(StockItem.manufacturer, ""), term) * 0.5
+            ).desc()]
+        else:
+            instr = func.strpos if dialect == "postgresql" else func.instr
+            position = instr(func.lower(StockItem.product_name), term.lower())
+            relevance = [
+                prefix_rank,
+                case((position > 0, position), else_=literal(1000)),
+                func.length(StockItem.product_name)
+            ]
+
+        return select(
             StockItem,
             StockSection.section_name,
             StockRack.rack_number
@@ -57,20 +153,20 @@ class BillingService:
             StockSection, StockItem.section_id == StockSection.id
         ).outerjoin(
             StockRack, StockSection.rack_id == StockRack.id
-        ).filter(
+        ).where(
             StockItem.shop_id == shop_id,
             StockItem.quantity_software > 0,  # Only available items
-            or_(
-                StockItem.product_name.ilike(f"%{search_term}%"),
-                StockItem.batch_number.ilike(f"%{search_term}%"),
-                StockItem.manufacturer.ilike(f"%{search_term}%")
-            )
+            or_(*matches)
         ).order_by(
-            StockItem.expiry_date.asc().nulls_last()
+            *relevance,
+            StockItem.expiry_date.asc().nulls_last(),
+            StockItem.quantity_software.desc()
         ).limit(limit)
 
+    @staticmethod
+    def _format_search_results(rows) -> List[Dict[str, Any]]:
         results = []
-        for item, section_name, rack_number in query.all():
+        for item, section_name, rack_number in rows:
             results.append({
                 "id": item.id,
                 "product_name": item.product_name,
@@ -86,30 +182,72 @@ class BillingService:
                 "hsn_code": item.hsn_code,
                 "package": item.package
             })
-
         return results
-    
+
     @staticmethod
-    def create_bill(
-        db: Session,
+    def search_medicines(
+        db: Session, 
+        shop_id: int, 
+        search_term: str,
+        limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """Search medicines by name, generic name, brand, or batch number"""
+        stmt = BillingService._search_medicines_stmt(
+            shop_id, search_term, limit, db.get_bind().dialect.name, BillingService._trigram_search(db)
+        )
+        return BillingService._format_search_results(db.execute(stmt).all())
+
+    @staticmethod
+    async def search_medicines_async(
+        db: AsyncSession,
         shop_id: int,
-        staff_id: int,
-        staff_name: str,
-        bill_data: dict,
-        items_data: List[dict]
-    ) -> Bill:
-        """Create bill and update stock"""
-        
-        # Calculate totals
+        search_term: str,
+        limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """Async variant of search_medicines for the POS typeahead route"""
+        trigram = await db.run_sync(BillingService._trigram_search)
+        stmt = BillingService._search_medicines_stmt(shop_id, search_term, limit, db.get_bind().dialect.name, trigram)
+        result = await db.execute(stmt)
+        return BillingService._format_search_results(result.all())
+    
+    @staticmethod
+    def _load_stock_items(
+        db: Session, shop_id: int, stock_item_ids: List[int], for_update: bool = False
+    ) -> Dict[int, StockItem]:
+        """Load the bill's stock items with section/rack in one query (for the bill item snapshot).
+
+        A single bill takes no row lock here: the quantities are deducted
+        afterwards by StockMutationService.apply_changes, whose conditional
+        UPDATE locks the rows only from the deduction until the bill commits.
+        Batch sync checks many bills against the loaded quantities and locks
+        them (`for_update`, in id order so concurrent syncs cannot deadlock).
+        """
+        query = db.query(StockItem).options(
+            joinedload(StockItem.section).joinedload(StockSection.rack)
+        ).filter(
+            StockItem.shop_id == shop_id,
+            StockItem.id.in_(set(stock_item_ids))
+        )
+        if for_update:
+            query = query.order_by(StockItem.id).with_for_update(of=StockItem).populate_existing()
+        return {item.id: item for item in query.all()}
+
+    @staticmethod
+    def _price_bill(bill_data: dict, items_data: List[dict], stock_items: Dict[int, StockItem]):
+        """Validate a bill and compute its amounts from the loaded stock items.
+
+        Returns (bill fields, bill item rows, stock deductions in strips by
+        stock_item_id); raises ValueError for unknown items, tablet sales
+        without package info and insufficient payment. Stock levels are not
+        checked here, StockMutationService.apply_changes does that.
+        """
         subtotal = 0.0
         tax_amount = 0.0
-        
-        # Validate stock availability
+        deductions: Dict[int, int] = {}  # stock_item_id -> strips (negative), summed over lines
+        item_rows = []
+
         for item_data in items_data:
-            stock_item = db.query(StockItem).filter(
-                StockItem.id == item_data['stock_item_id'],
-                StockItem.shop_id == shop_id
-            ).first()
+            stock_item = stock_items.get(item_data['stock_item_id'])
 
             if not stock_item:
                 raise ValueError(f"Stock item {item_data['stock_item_id']} not found")
@@ -124,29 +262,55 @@ class BillingService:
                 required_strips = _strips_to_deduct(item_data['quantity'], tps)
             else:
                 required_strips = item_data['quantity']
+            deductions[stock_item.id] = deductions.get(stock_item.id, 0) - required_strips
 
-            if stock_item.quantity_software < required_strips:
-                available = stock_item.quantity_software
-                unit_label = "strips"
-                raise ValueError(
-                    f"Insufficient stock for {stock_item.product_name}. "
-                    f"Available: {available} {unit_label}, Required: {required_strips} {unit_label}"
-                )
-
-            # Calculate item totals (quantity × unit_price works for both strip and tablet modes)
+            # Calculate item pricing (quantity × unit_price works for both strip and tablet modes)
             item_subtotal = item_data['quantity'] * item_data['unit_price']
-            item_discount = item_subtotal * (item_data.get('discount_percent', 0) / 100)
+            discount_percent = item_data.get('discount_percent', 0)
+            item_discount = item_subtotal * (discount_percent / 100)
             item_after_discount = item_subtotal - item_discount
-            item_tax = item_after_discount * (item_data.get('tax_percent', 5.0) / 100)  # Default 5%
+            tax_percent = item_data.get('tax_percent', 5.0)  # Default 5% GST
+
+            # Split tax into SGST and CGST (equal split)
+            sgst_percent = tax_percent / 2
+            cgst_percent = tax_percent / 2
+            sgst_amount = item_after_discount * (sgst_percent / 100)
+            cgst_amount = item_after_discount * (cgst_percent / 100)
+            item_tax = sgst_amount + cgst_amount
 
             subtotal += item_subtotal
             tax_amount += item_tax
-        
+
+            # Location info is eager-loaded with the stock row
+            section = stock_item.section
+            item_rows.append(dict(
+                stock_item_id=stock_item.id,
+                item_name=stock_item.product_name,
+                batch_number=stock_item.batch_number,
+                generic_name=None,
+                brand_name=None,
+                rack_number=section.rack.rack_number if section and section.rack else None,
+                section_name=section.section_name if section else None,
+                quantity=item_data['quantity'],
+                strips_deducted=required_strips,
+                mrp=stock_item.mrp,
+                unit_price=item_data['unit_price'],
+                discount_percent=discount_percent,
+                discount_amount=item_discount,
+                tax_percent=tax_percent,
+                sgst_percent=sgst_percent,
+                cgst_percent=cgst_percent,
+                sgst_amount=sgst_amount,
+                cgst_amount=cgst_amount,
+                tax_amount=item_tax,
+                total_price=item_after_discount + item_tax
+            ))
+
         # Apply bill-level discount before tax (discount reduces the taxable base)
         discount_amount = bill_data.get('discount_amount', 0.0)
         tax_amount = tax_amount * ((subtotal - discount_amount) / subtotal) if subtotal > 0 else 0.0
         total_amount = (subtotal - discount_amount) + tax_amount
-        
+
         # Calculate total paid and change
         cash_amount = bill_data.get('cash_amount', 0.0)
         card_amount = bill_data.get('card_amount', 0.0)
@@ -166,16 +330,8 @@ class BillingService:
             amount_due = 0.0
             payment_status = 'paid'
             change_returned = max(0.0, amount_paid - total_amount)
-        
-        # Generate bill number
-        bill_number = BillingService.generate_bill_number(db, shop_id)
-        
-        # Create bill
-        bill = Bill(
-            shop_id=shop_id,
-            staff_id=staff_id,
-            staff_name=staff_name,
-            bill_number=bill_number,
+
+        bill_fields = dict(
             customer_name=bill_data.get('customer_name'),
             customer_phone=bill_data.get('customer_phone'),
             customer_email=bill_data.get('customer_email'),
@@ -197,93 +353,212 @@ class BillingService:
             notes=bill_data.get('notes'),
             prescription_required=bill_data.get('prescription_required')
         )
+        return bill_fields, item_rows, deductions
+
+    @staticmethod
+    def create_bill(
+        db: Session,
+        shop_id: int,
+        staff_id: int,
+        staff_name: str,
+        bill_data: dict,
+        items_data: List[dict]
+    ) -> Bill:
+        """Create bill and update stock"""
+        stock_items = BillingService._load_stock_items(db, shop_id, [i['stock_item_id'] for i in items_data])
+        bill_fields, item_rows, deductions = BillingService._price_bill(bill_data, items_data, stock_items)
+
+        # Deduct stock atomically (raises InsufficientStockError, a ValueError, listing short lines)
+        StockMutationService.apply_changes(db, shop_id, deductions, unit="strips")
+        
+        # Generate bill number
+        bill_number = BillingService.generate_bill_number(db, shop_id)
+        
+        # Create bill
+        bill = Bill(shop_id=shop_id, staff_id=staff_id, staff_name=staff_name, bill_number=bill_number, **bill_fields)
         db.add(bill)
         db.flush()
         
-        # Handle customer tracking
+        # Handle customer tracking (non-committing helpers: the bill commits once, below)
         if bill_data.get('customer_phone'):
             phone = bill_data['customer_phone']
             category = bill_data.get('customer_category', 'first_time_prescription')
             
             # Get or create customer
-            customer = CustomerTrackingService.get_or_create_customer(
-                db, shop_id, phone, bill_data.get('customer_name'), category
-            )
+            CustomerTrackingService.ensure_customers(db, shop_id, {phone: (bill_data.get('customer_name'), category)})
             
             # Mark contact as converted if from contact sheet
             if bill_data.get('was_contacted_before'):
-                CustomerTrackingService.mark_contact_converted(db, phone, shop_id, total_amount)
+                CustomerTrackingService.mark_contacts_converted(db, shop_id, {phone: bill_fields['total_amount']})
         
-        # Create bill items and update stock
-        for item_data in items_data:
-            stock_item = db.query(StockItem).filter(
-                StockItem.id == item_data['stock_item_id'],
-                StockItem.shop_id == shop_id
-            ).first()
-            
-            # Calculate item pricing
-            item_subtotal = item_data['quantity'] * item_data['unit_price']
-            discount_percent = item_data.get('discount_percent', 0)
-            item_discount = item_subtotal * (discount_percent / 100)
-            item_after_discount = item_subtotal - item_discount
-            tax_percent = item_data.get('tax_percent', 5.0)  # Default 5% GST
-            
-            # Split tax into SGST and CGST (equal split)
-            sgst_percent = tax_percent / 2
-            cgst_percent = tax_percent / 2
-            sgst_amount = item_after_discount * (sgst_percent / 100)
-            cgst_amount = item_after_discount * (cgst_percent / 100)
-            item_tax = sgst_amount + cgst_amount
-            
-            item_total = item_after_discount + item_tax
-            
-            # Get location info
-            section_name = stock_item.section.section_name if stock_item.section else None
-            rack_number = stock_item.section.rack.rack_number if stock_item.section and stock_item.section.rack else None
-            
-            # Create bill item
-            bill_item = BillItem(
-                shop_id=shop_id,
-                bill_id=bill.id,
-                stock_item_id=stock_item.id,
-                item_name=stock_item.product_name,
-                batch_number=stock_item.batch_number,
-                generic_name=None,
-                brand_name=None,
-                rack_number=rack_number,
-                section_name=section_name,
-                quantity=item_data['quantity'],
-                mrp=stock_item.mrp,
-                unit_price=item_data['unit_price'],
-                discount_percent=discount_percent,
-                discount_amount=item_discount,
-                tax_percent=tax_percent,
-                sgst_percent=sgst_percent,
-                cgst_percent=cgst_percent,
-                sgst_amount=sgst_amount,
-                cgst_amount=cgst_amount,
-                tax_amount=item_tax,
-                total_price=item_total
-            )
-            db.add(bill_item)
-            
-            # Update stock quantity (always deduct in strips)
-            sale_unit = item_data.get('sale_unit', 'strip')
-            if sale_unit == 'tablet':
-                tps = _parse_tablets_per_strip(stock_item.package)
-                strips_deducted = _strips_to_deduct(item_data['quantity'], tps)
-            else:
-                strips_deducted = item_data['quantity']
-
-            bill_item.strips_deducted = strips_deducted
-            stock_item.quantity_software -= strips_deducted
-            if stock_item.quantity_physical is not None:
-                stock_item.audit_discrepancy = stock_item.quantity_software - stock_item.quantity_physical
-            stock_item.updated_at = datetime.now()
+        # Create bill items (stock was already deducted in strips above)
+        bill_items = [BillItem(shop_id=shop_id, bill_id=bill.id, **row) for row in item_rows]
+        db.add_all(bill_items)
+        db.flush()
+        # Sessions do not autoflush, so bill.items would lazy-load empty for the stored response
+        set_committed_value(bill, "items", bill_items)
         
+        # Finish the request's Idempotency-Key in the same commit as the sale
+        record_response(db, bill)
         db.commit()
         db.refresh(bill)
         return bill
+
+    @staticmethod
+    def create_bills_batch(
+        db: Session,
+        shop_id: int,
+        staff_id: int,
+        staff_name: str,
+        bills_data: List[dict]
+    ) -> List[Dict[str, Any]]:
+        """Store bills made offline on the POS; returns one result per bill, in request order.
+
+        Bills are committed in chunks of BILL_BATCH_CHUNK_SIZE, one
+        transaction each, so a failing chunk does not lose the others.
+        Bills already synced (same client_id) are reported as duplicates, so
+        the POS can safely resend the whole queue after a timeout.
+        """
+        first: Dict[str, dict] = {}
+        for bill_data in bills_data:
+            first.setdefault(bill_data['client_id'], bill_data)
+        unique = list(first.values())
+
+        results: Dict[str, Dict[str, Any]] = {}
+        chunk_size = max(1, settings.bill_batch_chunk_size)
+        for start in range(0, len(unique), chunk_size):
+            chunk = unique[start:start + chunk_size]
+            for attempt in range(2):
+                try:
+                    results.update(BillingService._sync_bill_chunk(db, shop_id, staff_id, staff_name, chunk))
+                    break
+                except IntegrityError:
+                    # Another request synced some of these client_ids meanwhile; the retry sees them
+                    db.rollback()
+                    if attempt:
+                        logger.exception(f"Offline bill sync failed for shop {shop_id}")
+                        results.update({
+                            b['client_id']: {"client_id": b['client_id'], "status": "failed",
+                                             "error": "Could not be saved, retry the sync"}
+                            for b in chunk
+                        })
+
+        output, reported = [], set()
+        for bill_data in bills_data:
+            result = results[bill_data['client_id']]
+            if bill_data['client_id'] in reported:
+                # Repeated within this request: the first copy carries the outcome
+                result = {**result, "status": "duplicate" if result.get("bill_id") else result["status"]}
+            reported.add(bill_data['client_id'])
+            output.append(result)
+        return output
+
+    @staticmethod
+    def _sync_bill_chunk(
+        db: Session,
+        shop_id: int,
+        staff_id: int,
+        staff_name: str,
+        chunk: List[dict]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Validate and bulk-insert one chunk of offline bills in a single transaction"""
+        results: Dict[str, Dict[str, Any]] = {}
+        client_ids = [b['client_id'] for b in chunk]
+        for client_id, bill_id, bill_number in db.query(Bill.client_id, Bill.id, Bill.bill_number).filter(
+            Bill.shop_id == shop_id,
+            Bill.client_id.in_(client_ids)
+        ):
+            results[client_id] = {"client_id": client_id, "status": "duplicate",
+                                  "bill_id": bill_id, "bill_number": bill_number}
+
+        pending = [b for b in chunk if b['client_id'] not in results]
+        stock_items = BillingService._load_stock_items(
+            db, shop_id, [i['stock_item_id'] for b in pending for i in b['items']], for_update=True
+        )
+        available = {item_id: item.quantity_software or 0 for item_id, item in stock_items.items()}
+
+        # Earlier sales get the stock first
+        now = datetime.now()
+        for bill_data in pending:
+            created_at = bill_data.get('created_at') or now
+            if created_at.tzinfo is not None:
+                created_at = created_at.astimezone().replace(tzinfo=None)
+            bill_data['created_at'] = created_at
+        pending.sort(key=lambda b: b['created_at'])
+
+        accepted = []
+        deductions: Dict[int, int] = {}
+        for bill_data in pending:
+            client_id = bill_data['client_id']
+            try:
+                if bill_data['created_at'] > now + timedelta(minutes=5):
+                    raise ValueError("Bill time is in the future; check the POS clock")
+                bill_fields, item_rows, bill_deductions = BillingService._price_bill(
+                    bill_data, bill_data['items'], stock_items
+                )
+                shortages = [{
+                    "stock_item_id": item_id,
+                    "product_name": stock_items[item_id].product_name,
+                    "available": available[item_id],
+                    "required": -delta
+                } for item_id, delta in bill_deductions.items() if available[item_id] + delta < 0]
+                if shortages:
+                    raise InsufficientStockError(shortages, unit="strips")
+            except ValueError as e:
+                results[client_id] = {"client_id": client_id, "status": "failed", "error": str(e)}
+                continue
+            for item_id, delta in bill_deductions.items():
+                available[item_id] += delta
+                deductions[item_id] = deductions.get(item_id, 0) + delta
+            accepted.append((bill_data, bill_fields, item_rows))
+
+        if not accepted:
+            db.rollback()
+            return results
+
+        # The rows are locked and checked above, so this cannot come up short
+        StockMutationService.apply_changes(db, shop_id, deductions, unit="strips")
+
+        by_day: Dict[date, list] = {}
+        for entry in accepted:
+            by_day.setdefault(entry[0]['created_at'].date(), []).append(entry)
+        bill_rows = []
+        for entries in by_day.values():
+            numbers = BillingService.allocate_bill_numbers(db, shop_id, entries[0][0]['created_at'], len(entries))
+            for (bill_data, bill_fields, _), bill_number in zip(entries, numbers):
+                bill_rows.append(dict(
+                    shop_id=shop_id, staff_id=staff_id, staff_name=staff_name, bill_number=bill_number,
+                    client_id=bill_data['client_id'], created_at=bill_data['created_at'], **bill_fields
+                ))
+        accepted = [entry for entries in by_day.values() for entry in entries]
+
+        bill_ids = db.scalars(insert(Bill).returning(Bill.id, sort_by_parameter_order=True), bill_rows).all()
+        db.execute(insert(BillItem), [
+            dict(row, shop_id=shop_id, bill_id=bill_id)
+            for bill_id, (_, _, item_rows) in zip(bill_ids, accepted) for row in item_rows
+        ])
+
+        # Customer tracking for the whole chunk (one lookup instead of a commit per bill)
+        customers, conversions = {}, {}
+        for bill_data, bill_fields, _ in accepted:
+            phone = bill_data.get('customer_phone')
+            if not phone:
+                continue
+            customers.setdefault(phone, (
+                bill_data.get('customer_name'), bill_data.get('customer_category') or 'first_time_prescription'
+            ))
+            if bill_data.get('was_contacted_before'):
+                conversions.setdefault(phone, bill_fields['total_amount'])
+        if customers:
+            CustomerTrackingService.ensure_customers(db, shop_id, customers)
+        if conversions:
+            CustomerTrackingService.mark_contacts_converted(db, shop_id, conversions)
+
+        db.commit()
+        for bill_id, row in zip(bill_ids, bill_rows):
+            results[row['client_id']] = {"client_id": row['client_id'], "status": "created",
+                                         "bill_id": bill_id, "bill_number": row['bill_number']}
+        return results
     
     @staticmethod
     def get_pay_later_customers(
@@ -303,6 +578,7 @@ class BillingService:
         if to_date:
             q = q.filter(func.date(Bill.created_at) <= to_date)
         outstanding_bills = q.order_by(Bill.created_at.asc()).all()
+        item_counts = BillingService.get_item_counts(db, [b.id for b in outstanding_bills])
 
         customer_map: Dict[str, Dict] = {}
         for bill in outstanding_bills:
@@ -326,7 +602,7 @@ class BillingService:
                 'amount_due': bill.amount_due,
                 'payment_status': bill.payment_status,
                 'created_at': bill.created_at,
-                'items_count': len(bill.items),
+                'items_count': item_counts.get(bill.id, 0),
                 'notes': bill.notes,
             })
 
@@ -394,15 +670,17 @@ class BillingService:
             })
             remaining = round(remaining - apply, 2)
 
-        db.commit()
         remaining_due = sum(b.amount_due for b in outstanding_bills)
-        return {
+        result = {
             'message': f'Payment of ₹{total_payment:.2f} recorded successfully.',
             'total_paid': round(total_payment, 2),
             'bills_cleared': bills_cleared,
             'remaining_due': round(remaining_due, 2),
             'applied_to': applied_to
         }
+        record_response(db, result)
+        db.commit()
+        return result
 
     @staticmethod
     def get_bill_summary(
@@ -438,6 +716,17 @@ class BillingService:
             "average_bill_value": float(total_revenue / total_bills) if total_bills > 0 else 0.0
         }
     
+    @staticmethod
+    def get_item_counts(db: Session, bill_ids: List[int]) -> Dict[int, int]:
+        """Line-item count per bill in one grouped query (instead of len(bill.items) per bill)"""
+        if not bill_ids:
+            return {}
+        return dict(
+            db.query(BillItem.bill_id, func.count(BillItem.id))
+            .filter(BillItem.bill_id.in_(bill_ids))
+            .group_by(BillItem.bill_id).all()
+        )
+    
     @staticmethod
     def get_top_selling_items(
         db: Session,
@@ -16,10 +16,14 @@ def get_current_user_with_geofence(user_dict: dict = Depends(get_user_dict), db:
     if not shop_code:
         raise HTTPException(status_code=400, detail="Shop code not found in token")
     
-    shop = db.query(Shop).filter(
-        Shop.shop_code == shop_code,
-        Shop.organization_id == staff.shop.organization_id
-    ).first()
+    # The staff's own shop is usually already in the session (principal cache)
+    if staff.shop.shop_code == shop_code:
+        shop = staff.shop
+    else:
+        shop = db.query(Shop).filter(
+            Shop.shop_code == shop_code,
+            Shop.organization_id == staff.shop.organization_id
+        ).first()
     if not shop:
         raise HTTPException(status_code=404, detail=f"Shop not found with code: {shop_code}")
     
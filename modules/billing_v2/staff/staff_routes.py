@@ -1,19 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func
-from app.database.database import get_db
+from app.database.database import get_db, get_async_db, get_read_db
+from app.core.config import settings
 from datetime import datetime, date, timedelta
 from typing import Optional, List
 import io
 import os
 import json
 from io import BytesIO
-import openpyxl
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
 from pydantic import BaseModel
-from app.utils.cache import dashboard_cache
+from app.utils.tiered_cache import tiered_cache, cached_route, shop_tag, org_tag
+from app.utils.query_budget import query_budget
+from app.utils.etag import etag_route
+from app.utils.idempotency import idempotent
 from modules.auth.models import Shop
 from modules.billing_v2 import schemas, models, services
 from modules.billing_v2 import daily_records_schemas
@@ -23,6 +25,19 @@ from modules.billing_v2.staff.staff_dependencies import get_current_user_with_ge
 
 router = APIRouter()
 
+
+def _invalidate_billing_cache(staff, shop_id: int, stock: bool = False):
+    """Drop cached billing analytics for the shop and its organization (and stock views when stock moved)"""
+    org_id = staff.shop.organization_id if staff.shop else None
+    tags = [shop_tag(shop_id, "billing")]
+    if org_id:
+        tags.append(org_tag(org_id, "billing"))
+    if stock:
+        tags.append(shop_tag(shop_id, "stock"))
+        if org_id:
+            tags.append(org_tag(org_id, "stock"))
+    tiered_cache.invalidate_tags(*tags)
+
 # ─── BILLING USER GUIDE ───────────────────────────────────────────────────────
 
 @router.get("/user-guide")
@@ -41,20 +56,21 @@ def get_user_guide():
 # ─── MEDICINE SEARCH ──────────────────────────────────────────────────────────
 
 @router.get("/search-medicines", response_model=List[schemas.MedicineSearchResult])
-def search_medicines(
+async def search_medicines(
     q: str = Query(..., min_length=2, description="Search term"),
     limit: int = Query(20, le=100),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: tuple = Depends(get_current_user)
 ):
     """Search medicines by name, generic name, brand, or batch number with location info"""
     staff, shop_id = current_user
-    results = services.BillingService.search_medicines(db, shop_id, q, limit)
+    results = await services.BillingService.search_medicines_async(db, shop_id, q, limit)
     return results
 
 # ─── BILL MANAGEMENT ──────────────────────────────────────────────────────────
 
 @router.post("/bills", response_model=schemas.BillResponse)
+@idempotent("create_bill", shop_id=lambda current_user, **_: current_user[1], response_model=schemas.BillResponse)
 def create_bill(
     bill_data: schemas.BillCreate,
     db: Session = Depends(get_db),
@@ -72,10 +88,35 @@ def create_bill(
             bill_data.model_dump(exclude={'items'}),
             [item.model_dump() for item in bill_data.items]
         )
+        _invalidate_billing_cache(staff, shop_id, stock=True)
         return bill
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/bills/batch", response_model=schemas.BillBatchResponse)
+def create_bills_batch(
+    batch: schemas.BillBatchCreate,
+    db: Session = Depends(get_db),
+    current_user: tuple = Depends(get_current_user)
+):
+    """Sync bills made offline on the POS (idempotent per client_id, one result per bill)"""
+    staff, shop_id = current_user
+    if len(batch.bills) > settings.bill_batch_max_size:
+        raise HTTPException(status_code=400, detail=f"At most {settings.bill_batch_max_size} bills per batch")
+
+    results = services.BillingService.create_bills_batch(
+        db, shop_id, staff.id, staff.name, [bill.model_dump() for bill in batch.bills]
+    )
+    created = sum(1 for r in results if r["status"] == "created")
+    if created:
+        _invalidate_billing_cache(staff, shop_id, stock=True)
+    return {
+        "created": created,
+        "duplicates": sum(1 for r in results if r["status"] == "duplicate"),
+        "failed": sum(1 for r in results if r["status"] == "failed"),
+        "results": results
+    }
+
 @router.get("/bills", response_model=List[schemas.BillResponse])
 def get_bills(
     start_date: Optional[date] = None,
@@ -155,23 +196,21 @@ def delete_bill(
     if not bill:
         raise HTTPException(status_code=404, detail="Bill not found")
 
-    # Restore stock quantities and recalculate discrepancy
-    from modules.stock_audit_v2.models import StockItem
+    # Restore stock quantities and recalculate discrepancy (one UPDATE for all lines)
+    from modules.stock_audit_v2.services import StockMutationService, InsufficientStockError
+    restore: dict = {}
     for item in bill.items:
-        stock_item = db.query(StockItem).filter(
-            StockItem.id == item.stock_item_id,
-            StockItem.shop_id == shop_id
-        ).first()
-        if stock_item:
-            # Use strips_deducted if available (new bills); fall back to quantity for legacy bills
-            restore_qty = item.strips_deducted if item.strips_deducted is not None else item.quantity
-            stock_item.quantity_software += restore_qty
-            if stock_item.quantity_physical is not None:
-                stock_item.audit_discrepancy = stock_item.quantity_software - stock_item.quantity_physical
-            stock_item.updated_at = datetime.now()
+        # Use strips_deducted if available (new bills); fall back to quantity for legacy bills
+        restore_qty = item.strips_deducted if item.strips_deducted is not None else item.quantity
+        restore[item.stock_item_id] = restore.get(item.stock_item_id, 0) + restore_qty
+    try:
+        StockMutationService.apply_changes(db, shop_id, restore)
+    except InsufficientStockError:
+        pass  # stock items deleted since the sale have nothing to restore
 
     db.delete(bill)
     db.commit()
+    _invalidate_billing_cache(staff, shop_id, stock=True)
     return {"message": "Bill deleted and stock restored"}
 
 # ─── PAY LATER ────────────────────────────────────────────────────────────────
@@ -203,6 +242,7 @@ def get_pay_later_bills(
     return bills
 
 @router.post("/pay-later/record-payment")
+@idempotent("record_pay_later_payment", shop_id=lambda current_user, **_: current_user[1])
 def record_pay_later_payment(
     payment: schemas.RecordPaymentRequest,
     db: Session = Depends(get_db),
@@ -212,6 +252,7 @@ def record_pay_later_payment(
     staff, shop_id = current_user
     try:
         result = services.BillingService.record_payment(db, shop_id, payment.model_dump())
+        _invalidate_billing_cache(staff, shop_id)
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -301,10 +342,12 @@ def get_daily_sales(
 def export_bills_excel(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: tuple = Depends(get_current_user)
 ):
     """Export bills to Excel"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
     staff, shop_id = current_user
     query = db.query(models.Bill).filter(models.Bill.shop_id == shop_id)
 
@@ -370,6 +413,14 @@ def export_bills_excel(
 # ─── ANALYTICS ────────────────────────────────────────────────────────────────
 
 @router.get("/analytics/overview")
+@etag_route(
+    key=lambda current_user, days, **_: f"billing_analytics:{current_user[1]}:{days}",
+    tags=lambda current_user, **_: [shop_tag(current_user[1], "billing")]
+)
+@cached_route(
+    key=lambda current_user, days, **_: f"billing_analytics:{current_user[1]}:{days}",
+    tags=lambda current_user, **_: [shop_tag(current_user[1], "billing")]
+)
 def get_analytics_overview(
     days: int = Query(30, description="Number of days to analyze"),
     db: Session = Depends(get_db),
@@ -378,11 +429,6 @@ def get_analytics_overview(
     """Get comprehensive analytics overview"""
     staff, shop_id = current_user
 
-    cache_key = f"billing_analytics:{shop_id}:{days}"
-    cached = dashboard_cache.get(cache_key)
-    if cached is not None:
-        return cached
-
     end_date = date.today()
     start_date = end_date - timedelta(days=days)
 
@@ -468,10 +514,13 @@ def get_analytics_overview(
             "avg_daily_prediction": round(prediction_next_7_days / 7, 2)
         }
     }
-    dashboard_cache.set(cache_key, result, ttl=60)
     return result
 
 @router.get("/analytics/comparison")
+@cached_route(
+    key=lambda current_user, current_days, **_: f"billing_comparison:{current_user[1]}:{current_days}",
+    tags=lambda current_user, **_: [shop_tag(current_user[1], "billing")]
+)
 def get_period_comparison(
     current_days: int = Query(30),
     db: Session = Depends(get_db),
@@ -480,11 +529,6 @@ def get_period_comparison(
     """Compare current period with previous period"""
     staff, shop_id = current_user
 
-    cache_key = f"billing_comparison:{shop_id}:{current_days}"
-    cached = dashboard_cache.get(cache_key)
-    if cached is not None:
-        return cached
-
     end_date = date.today()
     current_start = end_date - timedelta(days=current_days)
     previous_start = current_start - timedelta(days=current_days)
@@ -537,28 +581,29 @@ def get_period_comparison(
             "expenses_change": round(calc_change(current["expenses"], previous["expenses"]), 2)
         }
     }
-    dashboard_cache.set(cache_key, result, ttl=60)
     return result
 
 @router.get("/profit-analysis")
+@cached_route(
+    # Free-text searches are not cached
+    key=lambda current_user, days, start_date, end_date, search, **_: (
+        None if search else f"billing_profit:{current_user[1]}:{days}:{start_date}:{end_date}"
+    ),
+    tags=lambda current_user, **_: [shop_tag(current_user[1], "billing")]
+)
+@query_budget(12)
 def get_profit_analysis(
     days: int = Query(30, le=365),
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: tuple = Depends(get_current_user)
 ):
     """Comprehensive profit & loss analysis for the shop"""
     from collections import defaultdict
     staff, shop_id = current_user
 
-    cache_key = f"billing_profit:{shop_id}:{days}:{start_date}:{end_date}"
-    if not search:
-        cached = dashboard_cache.get(cache_key)
-        if cached is not None:
-            return cached
-
     e_date = end_date or date.today()
     s_date = start_date or (e_date - timedelta(days=days))
 
@@ -700,6 +745,7 @@ def get_profit_analysis(
     ]
 
     # ── Bill list (for search table) ─────────────────────────────────
+    item_counts = services.BillingService.get_item_counts(db, [b.id for b in bills[:200]])
     bill_list = [
         {
             "id": b.id,
@@ -713,7 +759,7 @@ def get_profit_analysis(
             "tax_amount": round(b.tax_amount, 2),
             "total_amount": round(b.total_amount, 2),
             "payment_method": b.payment_method,
-            "items_count": len(b.items)
+            "items_count": item_counts.get(b.id, 0)
         }
         for b in bills[:200]
     ]
@@ -740,9 +786,6 @@ def get_profit_analysis(
         "staff_performance": staff_performance,
         "bill_list": bill_list
     }
-
-    if not search:
-        dashboard_cache.set(cache_key, result, ttl=60)
     return result
 
 # ─── DAILY RECORDS ────────────────────────────────────────────────────────────
@@ -795,6 +838,7 @@ def create_or_update_daily_record(
         )
 
     db.refresh(record)
+    _invalidate_billing_cache(staff, shop_id)
     return DailyRecordsService.get_daily_record_with_calculations(db, record)
 
 @router.put("/daily-records/{record_date}", response_model=daily_records_schemas.DailyRecordResponse)
@@ -816,6 +860,7 @@ def update_daily_record(
         data.model_dump(exclude_unset=True)
     )
 
+    _invalidate_billing_cache(staff, shop_id)
     return DailyRecordsService.get_daily_record_with_calculations(db, record)
 
 @router.post("/daily-records/{record_date}/expenses", response_model=daily_records_schemas.DailyExpense)
@@ -838,7 +883,7 @@ def add_expense(
             db, shop_id, record_date, staff.id, staff.name
         )
 
-    return DailyRecordsService.add_expense(
+    result = DailyRecordsService.add_expense(
         db,
         shop_id,
         record.id,
@@ -846,6 +891,8 @@ def add_expense(
         staff.id,
         staff.name
     )
+    _invalidate_billing_cache(staff, shop_id)
+    return result
 
 @router.delete("/daily-records/expenses/{expense_id}")
 def delete_expense(
@@ -875,6 +922,7 @@ def delete_expense(
         record.total_expenses = float(total)
 
     db.commit()
+    _invalidate_billing_cache(staff, shop_id)
     return {"message": "Expense deleted"}
 
 @router.get("/daily-records", response_model=List[daily_records_schemas.DailyRecordResponse])
@@ -899,10 +947,12 @@ def get_daily_records(
 def export_daily_records_excel(
     start_date: date = Query(...),
     end_date: date = Query(...),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: tuple = Depends(get_current_user)
 ):
     """Export daily records to Excel"""
+    import openpyxl
+    from openpyxl.styles import Font, PatternFill, Alignment
     staff, shop_id = current_user
 
     if start_date > end_date:
@@ -3,7 +3,6 @@ from sqlalchemy import func, and_, or_
 from .models import ContactRecord, ContactInteraction, ContactReminder, Customer, CustomerPurchase, RefillReminder
 from datetime import datetime, date, timedelta
 from typing import List, Dict, Any, Optional
-import pandas as pd
 import re
 
 class CustomerTrackingService:
@@ -34,6 +33,7 @@ class CustomerTrackingService:
         staff_id: int
     ) -> Dict[str, int]:
         """Process uploaded Excel/PDF contact file"""
+        import pandas as pd
         
         # Parse file based on extension
         if filename.endswith('.xlsx') or filename.endswith('.xls'):
@@ -217,6 +217,33 @@ class CustomerTrackingService:
         
         return customer
     
+    @staticmethod
+    def ensure_customers(db: Session, shop_id: int, customers: Dict[str, tuple]):
+        """get_or_create_customer for a batch of bills (phone -> (name, category)); leaves the commit to the caller"""
+        existing = {
+            phone for (phone,) in db.query(Customer.phone).filter(
+                Customer.shop_id == shop_id,
+                Customer.phone.in_(list(customers))
+            )
+        }
+        db.add_all([
+            Customer(shop_id=shop_id, phone=phone, name=name, category=category)
+            for phone, (name, category) in customers.items() if phone not in existing
+        ])
+    
+    @staticmethod
+    def mark_contacts_converted(db: Session, shop_id: int, conversions: Dict[str, float]):
+        """mark_contact_converted for a batch of bills (phone -> conversion value); leaves the commit to the caller"""
+        contacts = db.query(ContactRecord).filter(
+            ContactRecord.shop_id == shop_id,
+            ContactRecord.phone.in_(list(conversions)),
+            ContactRecord.contact_status != "converted"
+        ).all()
+        for contact in contacts:
+            contact.contact_status = "converted"
+            contact.converted_date = datetime.now()
+            contact.conversion_value = conversions[contact.phone]
+    
     @staticmethod
     def record_purchase(
         db: Session,
@@ -390,8 +390,11 @@ def admin_update_distributor_invoice(invoice_id: int, invoice_data: DistributorI
     # Re-sync to stock if already verified
     if invoice.is_admin_verified:
         try:
+            # Rows created for earlier lines of this invoice (the session does not autoflush)
+            stock_by_batch = {}
             for item_data in invoice_data.items:
-                stock_item = db.query(StockItem).filter(
+                batch_key = (item_data.product_name, item_data.batch_number)
+                stock_item = stock_by_batch.get(batch_key) or db.query(StockItem).filter(
                     StockItem.shop_id == invoice.shop_id,
                     StockItem.product_name == item_data.product_name,
                     StockItem.batch_number == item_data.batch_number
@@ -424,6 +427,7 @@ def admin_update_distributor_invoice(invoice_id: int, invoice_data: DistributorI
                         section_id=None
                     )
                     db.add(stock_item)
+                stock_by_batch[batch_key] = stock_item
             
             db.commit()
             logger.info(f"✅ Updated distributor invoice {invoice_id} and re-synced to stock")
@@ -518,10 +522,12 @@ def admin_verify(invoice_id: int, db: Session = Depends(get_db), current_admin =
     try:
         synced_items = []
         updated_items = []
+        stock_by_batch = {}  # repeated product/batch lines merge into one row
         
         for item in invoice.items:
             # Check if stock item already exists
-            stock_item = db.query(StockItem).filter(
+            batch_key = (item.product_name, item.batch_number)
+            stock_item = stock_by_batch.get(batch_key) or db.query(StockItem).filter(
                 StockItem.shop_id == invoice.shop_id,
                 StockItem.product_name == item.product_name,
                 StockItem.batch_number == item.batch_number
@@ -558,6 +564,7 @@ def admin_verify(invoice_id: int, db: Session = Depends(get_db), current_admin =
                 db.flush()
                 synced_items.append(stock_item.id)
                 logger.info(f"Created stock item {stock_item.id}: {item.product_name}")
+            stock_by_batch[batch_key] = stock_item
         
         db.commit()
         logger.info(f"✅ Admin verified and synced distributor invoice {invoice_id} to stock")
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from app.database.database import get_db
+from app.database.database import get_db, get_read_db
 from modules.auth.dependencies import get_current_admin
 from modules.auth.models import Admin
 from modules.invoice_analyzer_v2 import schemas
+from app.utils.tiered_cache import tiered_cache, cached_route, org_tag
+from app.utils.pagination import paginate, set_page_headers, TOTAL_MODE_PATTERN
 from typing import Optional
 from datetime import datetime
 import logging
@@ -59,9 +61,7 @@ def admin_verify_invoice(
     )
 
     # Invalidate dashboard cache so analytics reflect new verified invoice
-    from app.utils.cache import dashboard_cache
-    dashboard_cache.clear_prefix(f"dashboard:{admin.organization_id}")
-    dashboard_cache.clear_prefix(f"ai_analytics:{admin.organization_id}")
+    tiered_cache.invalidate_tags(org_tag(admin.organization_id, "invoices"), org_tag(admin.organization_id, "stock"))
 
     logger.info(f"✅ Admin verified and synced invoice {invoice_id} to stock: {sync_result}")
     return {"message": "Invoice admin-verified and synced to stock", "sync_result": sync_result}
@@ -103,8 +103,7 @@ def admin_reject_invoice(
     )
 
     # Invalidate dashboard cache
-    from app.utils.cache import dashboard_cache
-    dashboard_cache.clear_prefix(f"dashboard:{admin.organization_id}")
+    tiered_cache.invalidate_tags(org_tag(admin.organization_id, "invoices"))
 
     return {"message": "Invoice rejected and sent back to staff"}
 
@@ -240,9 +239,7 @@ def admin_update_invoice(
     db.refresh(invoice)
 
     # Invalidate dashboard cache for this organization
-    from app.utils.cache import dashboard_cache
-    dashboard_cache.clear_prefix(f"dashboard:{admin.organization_id}")
-    dashboard_cache.clear_prefix(f"ai_analytics:{admin.organization_id}")
+    tiered_cache.invalidate_tags(org_tag(admin.organization_id, "invoices"), org_tag(admin.organization_id, "stock"))
 
     response = {"message": "Invoice updated successfully"}
     if items_in_use:
@@ -291,9 +288,7 @@ def admin_delete_invoice(
                 logger.warning(f"Failed to delete PDF file: {e}")
 
     # Invalidate dashboard cache
-    from app.utils.cache import dashboard_cache
-    dashboard_cache.clear_prefix(f"dashboard:{admin.organization_id}")
-    dashboard_cache.clear_prefix(f"ai_analytics:{admin.organization_id}")
+    tiered_cache.invalidate_tags(org_tag(admin.organization_id, "invoices"), org_tag(admin.organization_id, "stock"))
 
     response = {"message": "Invoice deleted successfully", "stock_reversed": stock_reversed}
     if items_in_use:
@@ -408,13 +403,16 @@ def get_pending_staff_verification(
 
 @router.get("/admin-invoices")
 def get_admin_invoices(
+    response: Response,
     shop_id: Optional[int] = Query(None),
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page (keyset pagination)"),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN, description="exact | approx | none"),
     db: Session = Depends(get_db),
     admin: Admin = Depends(get_current_admin)
 ):
-    """Get all invoices for admin (across organization)"""
+    """Get all invoices for admin (across organization; X-Next-Cursor header for keyset paging)"""
     from modules.invoice_analyzer_v2 import models
     from modules.auth.models import Shop, Staff
 
@@ -425,7 +423,12 @@ def get_admin_invoices(
     if shop_id:
         query = query.filter(models.PurchaseInvoice.shop_id == shop_id)
 
-    invoices = query.order_by(models.PurchaseInvoice.created_at.desc()).offset(offset).limit(limit).all()
+    invoices_page = paginate(
+        query, models.PurchaseInvoice.created_at, models.PurchaseInvoice.id, limit,
+        descending=True, offset=offset, cursor=cursor, total_mode=total_mode or "none"
+    )
+    set_page_headers(response, invoices_page)
+    invoices = invoices_page.items
     
     result = []
     for inv in invoices:
@@ -469,11 +472,18 @@ from modules.invoice_analyzer_v2.admin.dashboard_analytics import DashboardAnaly
 
 
 @router.get("/admin/ai-analytics")
+@cached_route(
+    key=lambda admin, shop_id, start_date, end_date, **_: (
+        f"ai_analytics:{admin.organization_id}:{shop_id}:{start_date}:{end_date}"
+    ),
+    ttl=3600,
+    tags=lambda admin, **_: [org_tag(admin.organization_id, "invoices")]
+)
 def get_ai_analytics(
     shop_id: Optional[int] = Query(None, description="Filter by specific shop (optional)"),
     start_date: Optional[date] = Query(None, description="Start date for analysis"),
     end_date: Optional[date] = Query(None, description="End date for analysis"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     admin: Admin = Depends(get_current_admin)
 ):
     """
@@ -487,13 +497,6 @@ def get_ai_analytics(
     - Procurement trends
     - Strategic recommendations
     """
-    from app.utils.cache import dashboard_cache
-    
-    cache_key = f"ai_analytics:{admin.organization_id}:{shop_id}:{start_date}:{end_date}"
-    cached = dashboard_cache.get(cache_key, ttl_seconds=3600)
-    if cached:
-        return cached
-    
     analytics_service = InvoiceAIAnalytics()
     
     result = analytics_service.generate_comprehensive_analysis(
@@ -503,8 +506,6 @@ def get_ai_analytics(
         start_date=start_date,
         end_date=end_date
     )
-    
-    dashboard_cache.set(cache_key, result)
     return result
 
 @router.get("/admin/expiry-alerts")
@@ -716,21 +717,20 @@ def get_procurement_trends(
     }
 
 @router.get("/admin/dashboard-analytics")
+@cached_route(
+    key=lambda admin, shop_id, start_date, end_date, **_: (
+        f"dashboard:{admin.organization_id}:{shop_id}:{start_date}:{end_date}"
+    ),
+    tags=lambda admin, **_: [org_tag(admin.organization_id, "invoices")]
+)
 def get_dashboard_analytics(
     shop_id: Optional[int] = Query(None),
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     admin: Admin = Depends(get_current_admin)
 ):
     """Get comprehensive dashboard analytics with chart-ready data (Admin only)"""
-    from app.utils.cache import dashboard_cache
-    
-    cache_key = f"dashboard:{admin.organization_id}:{shop_id}:{start_date}:{end_date}"
-    cached = dashboard_cache.get(cache_key, ttl_seconds=60)
-    if cached:
-        return cached
-    
     analytics = DashboardAnalytics.get_comprehensive_analytics(
         db=db,
         organization_id=admin.organization_id,
@@ -738,8 +738,6 @@ def get_dashboard_analytics(
         start_date=start_date,
         end_date=end_date
     )
-    
-    dashboard_cache.set(cache_key, analytics)
     return analytics
 
 @router.get("/admin/pending-verification")
@@ -1,16 +1,15 @@
-import pdfplumber
 import json
 import os
 from typing import Dict, Any, Optional
 import logging
+from app.utils.lazy_imports import module_available
+from app.utils.metrics import track_external
 
 logger = logging.getLogger(__name__)
 
-try:
-    from google import genai
-    GENAI_AVAILABLE = True
-except ImportError:
-    GENAI_AVAILABLE = False
+# google-genai and pdfplumber are imported where they are used (slow to import)
+GENAI_AVAILABLE = module_available("google.genai")
+if not GENAI_AVAILABLE:
     logger.warning("google-genai not installed. Using fallback extraction.")
 
 class AIInvoiceExtractor:
@@ -20,6 +19,7 @@ class AIInvoiceExtractor:
         self.api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
         if self.api_key and GENAI_AVAILABLE:
             try:
+                from google import genai
                 self.client = genai.Client(api_key=self.api_key)
                 logger.info("✅ Gemini AI configured successfully - AI extraction enabled")
             except Exception as e:
@@ -98,10 +98,11 @@ Document:
 """
         
         try:
-            response = self.client.models.generate_content(
-                model='gemini-2.5-flash',
-                contents=prompt
-            )
+            with track_external("gemini"):
+                response = self.client.models.generate_content(
+                    model='gemini-2.5-flash',
+                    contents=prompt
+                )
             result_text = response.text.strip()
             
             if result_text.startswith('```'):
@@ -139,6 +140,7 @@ Document:
     
     def _extract_text(self, pdf_path: str) -> str:
         """Extract text from PDF"""
+        import pdfplumber
         try:
             text = ""
             with pdfplumber.open(pdf_path) as pdf:
@@ -234,10 +236,11 @@ Invoice:
 """
         
         try:
-            response = self.client.models.generate_content(
-                model='gemini-2.0-flash',
-                contents=prompt
-            )
+            with track_external("gemini"):
+                response = self.client.models.generate_content(
+                    model='gemini-2.0-flash',
+                    contents=prompt
+                )
             result_text = response.text.strip()
             
             if result_text.startswith('```'):
@@ -1,10 +1,11 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Date, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Date, JSON, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database.database import Base
 
 class PurchaseInvoice(Base):
     __tablename__ = "purchase_invoices"
+    __table_args__ = (Index('ix_purchase_invoices_shop_created', 'shop_id', 'created_at'),)
     
     id = Column(Integer, primary_key=True, index=True)
     shop_id = Column(Integer, ForeignKey("shops.id"), nullable=False, index=True)
@@ -69,9 +70,10 @@ class PurchaseInvoice(Base):
 
 class PurchaseInvoiceItem(Base):
     __tablename__ = "purchase_invoice_items"
+    __table_args__ = (Index('ix_purchase_invoice_items_shop_product', 'shop_id', 'product_name'),)
     
     id = Column(Integer, primary_key=True, index=True)
-    invoice_id = Column(Integer, ForeignKey("purchase_invoices.id"), nullable=False)
+    invoice_id = Column(Integer, ForeignKey("purchase_invoices.id"), nullable=False, index=True)
     shop_id = Column(Integer, ForeignKey("shops.id"), nullable=False, index=True)
     
     # Product identification
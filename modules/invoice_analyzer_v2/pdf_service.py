@@ -1,4 +1,3 @@
-import pdfplumber
 import re
 from datetime import datetime
 from typing import Dict, List, Any, Optional
@@ -11,6 +10,7 @@ class PDFExtractionService:
     @staticmethod
     def extract_text_from_pdf(pdf_path: str) -> str:
         """Extract all text from PDF"""
+        import pdfplumber
         try:
             text = ""
             with pdfplumber.open(pdf_path) as pdf:
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Response
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from app.database.database import get_db
+from app.utils.query_budget import query_budget
+from app.utils.pagination import paginate, set_page_headers, TOTAL_MODE_PATTERN
 from modules.invoice_analyzer_v2.staff.staff_dependencies import get_current_user_with_geofence as get_current_user
 from modules.auth.dependencies import get_current_user as get_user_dict
 from modules.auth.models import Staff, Shop
@@ -12,10 +14,8 @@ import os
 import shutil
 import logging
 import io
-import pandas as pd
 from modules.invoice_analyzer_v2 import models, schemas
 from modules.invoice_analyzer_v2.ai_extractor import AIInvoiceExtractor
-from modules.invoice_analyzer_v2.excel_extractor import ExcelInvoiceExtractor
 
 logger = logging.getLogger(__name__)
 
@@ -166,6 +166,7 @@ async def upload_invoice_pdf(
                 logger.warning(f"⚠️ Proceeding with extraction despite format issues (force_extract=True)")
             
             # Proceed with extraction
+            from modules.invoice_analyzer_v2.excel_extractor import ExcelInvoiceExtractor
             parsed_data = ExcelInvoiceExtractor.extract_from_excel(file_path)
             logger.info(f"✅ Excel extraction completed - Found {len(parsed_data.get('items', []))} items")
     except HTTPException:
@@ -352,16 +353,20 @@ async def upload_invoice_pdf(
     return invoice
 
 @router.get("/")
+@query_budget(10)
 def get_invoices(
+    response: Response,
     skip: int = 0,
     limit: int = 20,
     supplier_name: Optional[str] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page (keyset pagination)"),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN, description="exact | approx | none"),
     db: Session = Depends(get_db),
     current_user: tuple = Depends(get_current_user)
 ):
-    """Get all purchase invoices for the shop"""
+    """Get all purchase invoices for the shop (X-Next-Cursor header for keyset paging)"""
     staff, shop_id = current_user
     
     query = db.query(models.PurchaseInvoice).filter(
@@ -377,29 +382,37 @@ def get_invoices(
     if end_date:
         query = query.filter(models.PurchaseInvoice.invoice_date <= end_date)
     
-    invoices = query.order_by(models.PurchaseInvoice.created_at.desc()).offset(skip).limit(limit).all()
+    invoices_page = paginate(
+        query, models.PurchaseInvoice.created_at, models.PurchaseInvoice.id, limit,
+        descending=True, offset=skip, cursor=cursor, total_mode=total_mode or "none"
+    )
+    set_page_headers(response, invoices_page)
+    invoices = invoices_page.items
+    
+    # Item counts and verifier names for the whole page in three queries
+    # (previously up to four lazy loads/lookups per invoice)
+    from modules.auth.models import Admin
+    invoice_ids = [inv.id for inv in invoices]
+    item_counts = dict(
+        db.query(models.PurchaseInvoiceItem.invoice_id, func.count(models.PurchaseInvoiceItem.id))
+        .filter(models.PurchaseInvoiceItem.invoice_id.in_(invoice_ids))
+        .group_by(models.PurchaseInvoiceItem.invoice_id).all()
+    ) if invoice_ids else {}
+    staff_ids = {inv.staff_verified_by for inv in invoices if inv.staff_verified_by}
+    staff_names = dict(
+        db.query(Staff.id, Staff.name).filter(Staff.id.in_(staff_ids)).all()
+    ) if staff_ids else {}
+    admin_ids = {inv.admin_verified_by for inv in invoices if inv.admin_verified_by}
+    admin_ids |= {inv.admin_rejected_by for inv in invoices if inv.admin_rejected_by}
+    admin_names = dict(
+        db.query(Admin.id, Admin.full_name).filter(Admin.id.in_(admin_ids)).all()
+    ) if admin_ids else {}
     
-    # Add item count and verified_by_name
     result = []
     for inv in invoices:
-        staff_verified_by_name = None
-        if inv.staff_verified_by:
-            verifier = db.query(Staff).filter(Staff.id == inv.staff_verified_by).first()
-            if verifier:
-                staff_verified_by_name = verifier.name
-        
-        from modules.auth.models import Admin
-        admin_verified_by_name = None
-        if inv.admin_verified_by:
-            admin_verifier = db.query(Admin).filter(Admin.id == inv.admin_verified_by).first()
-            if admin_verifier:
-                admin_verified_by_name = admin_verifier.full_name
-        
-        admin_rejected_by_name = None
-        if inv.admin_rejected_by:
-            admin_rejector = db.query(Admin).filter(Admin.id == inv.admin_rejected_by).first()
-            if admin_rejector:
-                admin_rejected_by_name = admin_rejector.full_name
+        staff_verified_by_name = staff_names.get(inv.staff_verified_by)
+        admin_verified_by_name = admin_names.get(inv.admin_verified_by)
+        admin_rejected_by_name = admin_names.get(inv.admin_rejected_by)
         
         result.append({
             "id": inv.id,
@@ -407,7 +420,7 @@ def get_invoices(
             "invoice_date": inv.invoice_date,
             "supplier_name": inv.supplier_name,
             "net_amount": inv.net_amount,
-            "total_items": len(inv.items),
+            "total_items": item_counts.get(inv.id, 0),
             "is_staff_verified": inv.is_staff_verified,
             "staff_verified_by_name": staff_verified_by_name,
             "is_admin_verified": inv.is_admin_verified,
@@ -822,6 +835,7 @@ def download_excel_template(current_user: tuple = Depends(get_current_user)):
     }
     
     # Create DataFrame
+    import pandas as pd
     df = pd.DataFrame(template_data)
     
     # Create Excel in memory
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database.database import Base
@@ -72,6 +72,7 @@ class NotificationStaffTarget(Base):
 class NotificationRead(Base):
     """Track which staff have read notifications"""
     __tablename__ = "notification_reads"
+    __table_args__ = (Index('ix_notification_reads_notification_staff', 'notification_id', 'staff_id'),)
 
     id = Column(Integer, primary_key=True, index=True)
     notification_id = Column(Integer, ForeignKey("notifications.id"), nullable=False)
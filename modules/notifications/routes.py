@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from app.database.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.database import get_db, get_async_db
 from typing import List, Optional
 from modules.auth.dependencies import get_current_admin, get_current_staff
 from modules.auth.models import Admin, Staff
 from app.utils.cache import dashboard_cache
+from app.utils.etag import etag_route
 from . import schemas
 from .service import NotificationService
 
@@ -89,6 +91,7 @@ def get_notification_stats(
 # STAFF ENDPOINTS
 
 @router.get("/staff/list", response_model=schemas.NotificationListResponse)
+@etag_route()
 def get_staff_notifications(
     staff: Staff = Depends(get_current_staff),
     db: Session = Depends(get_db),
@@ -137,9 +140,9 @@ def mark_notification_read(
     return {"message": "Notification marked as read"}
 
 @router.get("/staff/unread-count")
-def get_unread_count(
+async def get_unread_count(
     staff: Staff = Depends(get_current_staff),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get count of unread notifications (cached)"""
     cache_key = f"unread_count:{staff.id}"
@@ -147,7 +150,7 @@ def get_unread_count(
     if cached is not None:
         return {"unread_count": cached}
 
-    count = NotificationService.get_unread_count_optimized(db, staff)
+    count = await NotificationService.get_unread_count_async(db, staff)
     dashboard_cache.set(cache_key, count)
     return {"unread_count": count}
 
@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, func, select
 from typing import List, Optional
 from datetime import datetime
 from .models import (
@@ -12,44 +13,58 @@ from . import schemas
 class NotificationService:
     
     @staticmethod
-    def get_unread_count_optimized(db: Session, staff: Staff) -> int:
-        """Optimized unread count with single COUNT query"""
-        read_ids_subquery = db.query(NotificationRead.notification_id).filter(
-            NotificationRead.staff_id == staff.id
-        ).subquery()
-        
-        shop_count = db.query(func.count(Notification.id)).filter(
+    def _unread_count_stmts(staff_id: int, shop_id: int):
+        """Build the shop-targeted and staff-targeted unread COUNT statements"""
+        read_ids_subquery = select(NotificationRead.notification_id).where(
+            NotificationRead.staff_id == staff_id
+        )
+        now = datetime.now()
+        not_expired = or_(
+            Notification.expires_at.is_(None),
+            Notification.expires_at > now
+        )
+
+        shop_stmt = select(func.count(Notification.id)).where(
             and_(
                 Notification.target_type == NotificationTargetType.SHOP,
                 Notification.id.in_(
-                    db.query(NotificationShopTarget.notification_id).filter(
-                        NotificationShopTarget.shop_id == staff.shop_id
+                    select(NotificationShopTarget.notification_id).where(
+                        NotificationShopTarget.shop_id == shop_id
                     )
                 ),
                 ~Notification.id.in_(read_ids_subquery),
-                or_(
-                    Notification.expires_at.is_(None),
-                    Notification.expires_at > datetime.now()
-                )
+                not_expired
             )
-        ).scalar() or 0
-        
-        staff_count = db.query(func.count(Notification.id)).filter(
+        )
+
+        staff_stmt = select(func.count(Notification.id)).where(
             and_(
                 Notification.target_type == NotificationTargetType.STAFF,
                 Notification.id.in_(
-                    db.query(NotificationStaffTarget.notification_id).filter(
-                        NotificationStaffTarget.staff_id == staff.id
+                    select(NotificationStaffTarget.notification_id).where(
+                        NotificationStaffTarget.staff_id == staff_id
                     )
                 ),
                 ~Notification.id.in_(read_ids_subquery),
-                or_(
-                    Notification.expires_at.is_(None),
-                    Notification.expires_at > datetime.now()
-                )
+                not_expired
             )
-        ).scalar() or 0
-        
+        )
+        return shop_stmt, staff_stmt
+
+    @staticmethod
+    def get_unread_count_optimized(db: Session, staff: Staff) -> int:
+        """Optimized unread count with single COUNT query"""
+        shop_stmt, staff_stmt = NotificationService._unread_count_stmts(staff.id, staff.shop_id)
+        shop_count = db.execute(shop_stmt).scalar() or 0
+        staff_count = db.execute(staff_stmt).scalar() or 0
+        return shop_count + staff_count
+
+    @staticmethod
+    async def get_unread_count_async(db: AsyncSession, staff: Staff) -> int:
+        """Async variant of get_unread_count_optimized"""
+        shop_stmt, staff_stmt = NotificationService._unread_count_stmts(staff.id, staff.shop_id)
+        shop_count = (await db.execute(shop_stmt)).scalar() or 0
+        staff_count = (await db.execute(staff_stmt)).scalar() or 0
         return shop_count + staff_count
     
     @staticmethod
@@ -4,14 +4,14 @@ import logging
 from datetime import datetime, date, timedelta
 from typing import Dict, Any
 from sqlalchemy.orm import Session
+from app.utils.lazy_imports import module_available
+from app.utils.metrics import track_external
 
 logger = logging.getLogger(__name__)
 
-try:
-    import google.generativeai as genai
-    GENAI_AVAILABLE = True
-except ImportError:
-    GENAI_AVAILABLE = False
+# Imported in __init__ (only when an analysis is requested)
+GENAI_AVAILABLE = module_available("google.generativeai")
+if not GENAI_AVAILABLE:
     logger.warning("google-generativeai not installed. AI analytics unavailable.")
 
 class StockAuditAIAnalytics:
@@ -21,6 +21,7 @@ class StockAuditAIAnalytics:
         self.api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
         if self.api_key and GENAI_AVAILABLE:
             try:
+                import google.generativeai as genai
                 genai.configure(api_key=self.api_key)
                 self.model = genai.GenerativeModel('models/gemini-2.5-flash')
                 logger.info("✅ Gemini AI configured for stock analytics")
@@ -49,7 +50,8 @@ class StockAuditAIAnalytics:
         # Generate AI insights
         try:
             prompt = self._build_analysis_prompt(data)
-            response = self.model.generate_content(prompt)
+            with track_external("gemini"):
+                response = self.model.generate_content(prompt)
             ai_insights = response.text
             
             return {
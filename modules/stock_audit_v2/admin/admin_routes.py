@@ -1,19 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.database.database import get_db
+from app.database.database import get_db, get_read_db
 from datetime import datetime, date, timedelta
 from typing import Optional
 import math
-from .. import schemas, models
+from .. import schemas, models, services
 from .admin_analytics_service import StockAuditAnalytics
 from .admin_ai_analytics_service import StockAuditAIAnalytics
 from modules.auth.dependencies import get_current_admin
 from modules.auth.models import Admin, Shop
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
 from io import BytesIO
-from app.utils.cache import dashboard_cache
+from app.utils.tiered_cache import cached_route, org_tag
+from app.utils.metrics import track_external
+from app.utils.pagination import paginate, TOTAL_MODE_PATTERN
 
 router = APIRouter()
 
@@ -57,11 +57,12 @@ def get_admin_excel_uploads(
     shop_id: Optional[int] = Query(None),
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page (keyset pagination)"),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN, description="exact | approx | none"),
     db: Session = Depends(get_db),
     admin = Depends(get_current_admin)
 ):
-    """Get Excel uploads for admin (org-scoped, paginated, searchable)"""
-    import math
+    """Get Excel uploads for admin (org-scoped, paginated or cursor-paged, searchable)"""
     query = (
         db.query(models.ExcelUpload)
         .join(Shop, models.ExcelUpload.shop_id == Shop.id)
@@ -79,11 +80,13 @@ def get_admin_excel_uploads(
             (models.ExcelUpload.uploaded_by_staff_name.ilike(search_term))
         )
 
-    total = query.count()
-    uploads = query.order_by(models.ExcelUpload.uploaded_at.desc()).offset((page - 1) * per_page).limit(per_page).all()
+    uploads_page = paginate(
+        query, models.ExcelUpload.uploaded_at, models.ExcelUpload.id, per_page,
+        descending=True, page=page, cursor=cursor, total_mode=total_mode
+    )
 
     result = []
-    for upload in uploads:
+    for upload in uploads_page.items:
         result.append({
             "id": upload.id,
             "filename": upload.filename,
@@ -105,13 +108,7 @@ def get_admin_excel_uploads(
             "rejection_reason": upload.rejection_reason
         })
 
-    return {
-        "items": result,
-        "total": total,
-        "page": page,
-        "per_page": per_page,
-        "pages": math.ceil(total / per_page) if total > 0 else 1
-    }
+    return uploads_page.response(result)
 
 @router.get("/uploads/{upload_id}/items")
 def get_admin_upload_items(
@@ -280,26 +277,7 @@ def admin_verify_upload(
         
         created_count = 0
         for item in items:
-            stock_item = models.StockItem(
-                shop_id=upload.shop_id,
-                product_name=item.product_name,
-                batch_number=item.batch_number,
-                quantity_software=item.quantity_software,
-                composition=item.composition,
-                manufacturer=item.manufacturer,
-                hsn_code=item.hsn_code,
-                package=item.package,
-                unit=item.unit,
-                expiry_date=item.expiry_date,
-                manufacturing_date=item.manufacturing_date,
-                mrp=item.mrp,
-                unit_price=item.unit_price,
-                selling_price=item.selling_price,
-                profit_margin=item.profit_margin,
-                section_id=item.section_id
-            )
-            db.add(stock_item)
-            db.flush()
+            stock_item = services.StockCalculationService.add_upload_item(db, upload.shop_id, item)
             
             item.stock_item_id = stock_item.id
             item.status = "approved"
@@ -926,7 +904,7 @@ def get_admin_audit_discrepancies(
 def get_admin_ai_analytics(
     shop_id: Optional[int] = Query(None),
     days: int = Query(30),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     admin = Depends(get_current_admin)
 ):
     """Get comprehensive AI analytics for admin tab (same format as staff AI Analytics tab)"""
@@ -1049,7 +1027,8 @@ Provide:
 
 Format as JSON with keys: findings, risks, recommendations, predictions
 """
-            response = client.models.generate_content(model='gemini-2.0-flash', contents=prompt)
+            with track_external("gemini"):
+                response = client.models.generate_content(model='gemini-2.0-flash', contents=prompt)
             ai_insights = json.loads(response.text.strip().replace("```json", "").replace("```", ""))
     except Exception as e:
         logger.error(f"Admin AI generation failed: {e}")
@@ -1101,49 +1080,44 @@ Format as JSON with keys: findings, risks, recommendations, predictions
 
 
 @router.get("/analytics/dashboard")
+@cached_route(
+    key=lambda admin, shop_id, **_: f"stock_audit_dashboard:{admin.organization_id}:{shop_id or 'all'}",
+    tags=lambda admin, **_: [org_tag(admin.organization_id, "stock")]
+)
 def get_admin_dashboard_analytics(
     shop_id: Optional[int] = Query(None),
     db: Session = Depends(get_db),
     admin = Depends(get_current_admin)
 ):
     """Get comprehensive stock audit analytics for admin dashboard"""
-    cache_key = f"stock_audit_dashboard:{admin.organization_id}:{shop_id or 'all'}"
-    cached = dashboard_cache.get(cache_key)
-    if cached is not None:
-        return cached
-    
     try:
-        result = StockAuditAnalytics.get_comprehensive_analytics(
+        return StockAuditAnalytics.get_comprehensive_analytics(
             db=db,
             organization_id=admin.organization_id,
             shop_id=shop_id
         )
-        dashboard_cache.set(cache_key, result, ttl=60)
-        return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/analytics/ai-insights")
+@cached_route(
+    key=lambda admin, shop_id, **_: f"stock_audit_ai:{admin.organization_id}:{shop_id or 'all'}",
+    ttl=3600,
+    tags=lambda admin, **_: [org_tag(admin.organization_id, "stock")]
+)
 def get_admin_ai_insights(
     shop_id: Optional[int] = Query(None),
     db: Session = Depends(get_db),
     admin = Depends(get_current_admin)
 ):
     """Get AI-generated insights for admin (organization-wide or specific shop)"""
-    cache_key = f"stock_audit_ai:{admin.organization_id}:{shop_id or 'all'}"
-    cached = dashboard_cache.get(cache_key)
-    if cached is not None:
-        return cached
-    
     try:
         ai_service = StockAuditAIAnalytics()
-        result = ai_service.generate_comprehensive_analysis(
+        return ai_service.generate_comprehensive_analysis(
             db=db,
             organization_id=admin.organization_id,
             shop_id=shop_id
         )
-        dashboard_cache.set(cache_key, result, ttl=3600)
-        return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1152,10 +1126,12 @@ def get_admin_ai_insights(
 @router.get("/export/stock-items")
 def export_stock_items_excel(
     shop_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     admin = Depends(get_current_admin)
 ):
     """Export stock items to Excel (admin - all shops or specific shop)"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
     from modules.auth.models import Shop
     
     query = db.query(models.StockItem).join(Shop).filter(
@@ -1242,10 +1218,12 @@ def export_stock_items_excel(
 def export_audit_records_excel(
     days: int = Query(30, description="Number of days to export"),
     shop_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     admin = Depends(get_current_admin)
 ):
     """Export audit records to Excel (admin)"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
     from modules.auth.models import Shop
     
     start_date = datetime.now() - timedelta(days=days)
@@ -1318,10 +1296,12 @@ def export_audit_records_excel(
 def export_adjustments_excel(
     days: int = Query(30, description="Number of days to export"),
     shop_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     admin = Depends(get_current_admin)
 ):
     """Export stock adjustments to Excel (admin)"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
     from modules.auth.models import Shop
     
     start_date = datetime.now() - timedelta(days=days)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, Date, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database.database import Base
@@ -28,6 +28,8 @@ class StockSection(Base):
 
 class StockItem(Base):
     __tablename__ = "stock_items_audit"
+    # One row per product batch in a shop (invoice sync and billing look items up this way)
+    __table_args__ = (Index('uq_stock_items_shop_product_batch', 'shop_id', 'product_name', 'batch_number', unique=True),)
     
     id = Column(Integer, primary_key=True, index=True)
     shop_id = Column(Integer, ForeignKey("shops.id"), nullable=True, index=True)
@@ -1,10 +1,87 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import func, and_, or_, case, update
 from .models import *
 from datetime import datetime, date, timedelta
 from typing import List, Dict, Any, Optional
 import random
 
+
+class InsufficientStockError(ValueError):
+    """Stock changes that could not be applied; `shortages` has one entry per failing stock item"""
+
+    def __init__(self, shortages: List[Dict[str, Any]], unit: str = ""):
+        self.shortages = shortages
+        unit = f" {unit}" if unit else ""
+        super().__init__("; ".join(
+            f"Stock item {s['stock_item_id']} not found" if s['product_name'] is None else
+            f"Insufficient stock for {s['product_name']}. Available: {s['available']}{unit}, Required: {s['required']}{unit}"
+            for s in shortages
+        ))
+
+
+class StockMutationService:
+
+    @staticmethod
+    def apply_changes(db: Session, shop_id: int, changes: Dict[int, int], unit: str = "") -> Dict[int, int]:
+        """Add `changes` (stock_item_id -> quantity, negative to deduct) to quantity_software.
+
+        All lines go in one UPDATE ... RETURNING that only touches rows whose
+        stock covers the deduction, so concurrent sales cannot lose updates
+        or oversell, and audit_discrepancy is recomputed in the same
+        statement. Returns the new quantities. Raises InsufficientStockError
+        listing every short line; the caller must then roll back, as the
+        covered lines are already updated. Loaded StockItem objects in the
+        session are kept in sync.
+        """
+        changes = {item_id: delta for item_id, delta in changes.items() if delta}
+        if not changes:
+            return {}
+        delta = case(changes, value=StockItem.id)
+        current = func.coalesce(StockItem.quantity_software, 0)
+        now = datetime.now()
+        rows = db.execute(
+            update(StockItem)
+            .where(
+                StockItem.shop_id == shop_id,
+                StockItem.id.in_(changes),
+                or_(delta >= 0, current + delta >= 0)
+            )
+            .values(
+                quantity_software=current + delta,
+                audit_discrepancy=case(
+                    (StockItem.quantity_physical.is_(None), StockItem.audit_discrepancy),
+                    else_=current + delta - StockItem.quantity_physical
+                ),
+                updated_at=now
+            )
+            .returning(StockItem.id, StockItem.quantity_software, StockItem.audit_discrepancy)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+        applied = {row.id: row.quantity_software for row in rows}
+        for row in rows:
+            loaded = db.identity_map.get(db.identity_key(StockItem, row.id))
+            if loaded is not None:
+                set_committed_value(loaded, "quantity_software", row.quantity_software)
+                set_committed_value(loaded, "audit_discrepancy", row.audit_discrepancy)
+                set_committed_value(loaded, "updated_at", now)
+
+        short = [item_id for item_id in changes if item_id not in applied]
+        if short:
+            found = {
+                item.id: item for item in db.query(StockItem.id, StockItem.product_name, StockItem.quantity_software)
+                .filter(StockItem.shop_id == shop_id, StockItem.id.in_(short))
+            }
+            raise InsufficientStockError([{
+                "stock_item_id": item_id,
+                "product_name": found[item_id].product_name if item_id in found else None,
+                "available": (found[item_id].quantity_software or 0) if item_id in found else 0,
+                "required": -changes[item_id]
+            } for item_id in short], unit)
+        return applied
+
+
 class StockCalculationService:
     
     @staticmethod
@@ -42,6 +119,51 @@ class StockCalculationService:
             "updated_items": updated_count
         }
     
+    @staticmethod
+    def add_upload_item(db: Session, shop_id: int, item: ExcelUploadItem) -> StockItem:
+        """Add an approved Excel upload row to inventory.
+        Stock is unique per shop/product/batch, so a batch that is already
+        stocked gets the quantity added and its details refreshed."""
+        stock_item = db.query(StockItem).filter(
+            StockItem.shop_id == shop_id,
+            StockItem.product_name == item.product_name,
+            StockItem.batch_number == item.batch_number
+        ).first()
+        
+        details = {
+            "composition": item.composition,
+            "manufacturer": item.manufacturer,
+            "hsn_code": item.hsn_code,
+            "package": item.package,
+            "unit": item.unit,
+            "expiry_date": item.expiry_date,
+            "manufacturing_date": item.manufacturing_date,
+            "mrp": item.mrp,
+            "unit_price": item.unit_price,
+            "selling_price": item.selling_price,
+            "profit_margin": item.profit_margin,
+            "section_id": item.section_id
+        }
+        
+        if stock_item:
+            stock_item.quantity_software = (stock_item.quantity_software or 0) + (item.quantity_software or 0)
+            for key, value in details.items():
+                if value is not None:
+                    setattr(stock_item, key, value)
+            stock_item.updated_at = datetime.now()
+        else:
+            stock_item = StockItem(
+                shop_id=shop_id,
+                product_name=item.product_name,
+                batch_number=item.batch_number,
+                quantity_software=item.quantity_software,
+                **details
+            )
+            db.add(stock_item)
+        
+        db.flush()
+        return stock_item
+    
     @staticmethod
     def add_purchase(db: Session, purchase_data: dict, items_data: List[dict], shop_id: int, staff_id: int, staff_name: str) -> Purchase:
         """Add purchase and update stock levels"""
@@ -77,28 +199,17 @@ class StockCalculationService:
         db.add(sale)
         db.flush()
         
+        deductions: Dict[int, int] = {}
         for item_data in items_data:
-            stock_item = db.query(StockItem).filter(
-                StockItem.id == item_data['stock_item_id'],
-                StockItem.shop_id == shop_id
-            ).first()
-            
-            if not stock_item:
-                raise ValueError(f"Stock item {item_data['stock_item_id']} not found")
-            
-            if stock_item.quantity_software < item_data['quantity']:
-                raise ValueError(f"Insufficient stock for {stock_item.product_name}. Available: {stock_item.quantity_software}, Required: {item_data['quantity']}")
-            
             sale_item = SaleItem(
                 sale_id=sale.id,
                 shop_id=shop_id,
                 **item_data
             )
             db.add(sale_item)
-            
-            stock_item.quantity_software -= item_data['quantity']
-            stock_item.updated_at = datetime.now()
+            deductions[item_data['stock_item_id']] = deductions.get(item_data['stock_item_id'], 0) - item_data['quantity']
         
+        StockMutationService.apply_changes(db, shop_id, deductions)
         db.commit()
         return sale
 
@@ -6,18 +6,12 @@ from typing import Dict, Any, List
 import json
 import logging
 
-try:
-    from google import genai
-    GENAI_AVAILABLE = True
-except ImportError:
-    try:
-        import google.generativeai as genai
-        GENAI_AVAILABLE = True
-    except ImportError:
-        genai = None
-        GENAI_AVAILABLE = False
-
 from app.core.config import settings
+from app.utils.lazy_imports import module_available
+from app.utils.metrics import track_external
+
+# Imported in _init_gemini (only when insights are requested)
+GENAI_AVAILABLE = module_available("google.genai") or module_available("google.generativeai")
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +29,10 @@ class StockAuditAIService:
             return None
         
         try:
+            try:
+                from google import genai
+            except ImportError:
+                import google.generativeai as genai
             client = genai.Client(api_key=settings.gemini_api_key)
             logger.info("Gemini AI initialized successfully")
             return client
@@ -173,10 +171,11 @@ Format as JSON with keys: findings, risks, recommendations, predictions
 """
         
         try:
-            response = client.models.generate_content(
-                model='gemini-2.0-flash',
-                contents=prompt
-            )
+            with track_external("gemini"):
+                response = client.models.generate_content(
+                    model='gemini-2.0-flash',
+                    contents=prompt
+                )
             insights = json.loads(response.text.strip().replace("```json", "").replace("```", ""))
             return insights
         except Exception as e:
@@ -1,16 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
 import math
-from app.database.database import get_db
+from app.database.database import get_db, get_read_db
+from app.utils.query_budget import query_budget
+from app.utils.pagination import paginate, TOTAL_MODE_PATTERN
+from app.utils.json_response import orm_dict
 from datetime import datetime, date, timedelta
 from typing import Optional, List
 from .. import schemas, models, services
 from .staff_ai_service import StockAuditAIService
 from .staff_dependencies import get_current_staff_with_geofence as get_current_user
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment
 from io import BytesIO
 
 router = APIRouter()
@@ -175,6 +176,13 @@ def add_stock_item(
 ):
     """Add new stock item"""
     staff, shop_id = current_user
+    existing = db.query(models.StockItem).filter(
+        models.StockItem.shop_id == shop_id,
+        models.StockItem.product_name == item.product_name,
+        models.StockItem.batch_number == item.batch_number
+    ).first()
+    if existing:
+        raise HTTPException(status_code=409, detail="This batch of the product is already in stock")
     db_item = models.StockItem(**item.model_dump(), shop_id=shop_id)
     db.add(db_item)
     db.commit()
@@ -182,6 +190,7 @@ def add_stock_item(
     return db_item
 
 @router.get("/items")
+@query_budget(10)
 def get_stock_items(
     section_id: Optional[int] = None,
     rack_id: Optional[int] = None,
@@ -193,10 +202,12 @@ def get_stock_items(
     expiry_after: Optional[date] = None,
     page: int = Query(1, ge=1),
     per_page: int = Query(50, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page (keyset pagination)"),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN, description="exact | approx | none"),
     db: Session = Depends(get_db),
     current_user: tuple = Depends(get_current_user)
 ):
-    """Get stock items with filters and pagination"""
+    """Get stock items with filters and pagination (page/per_page or cursor)"""
     staff, shop_id = current_user
     query = db.query(models.StockItem).filter(models.StockItem.shop_id == shop_id)
 
@@ -217,27 +228,24 @@ def get_stock_items(
     if expiry_after:
         query = query.filter(models.StockItem.expiry_date >= expiry_after)
 
-    total = query.count()
-    items = query.order_by(models.StockItem.product_name).offset((page - 1) * per_page).limit(per_page).all()
+    # Section and rack in the same SELECT (was two lazy loads per row)
+    query = query.options(joinedload(models.StockItem.section).joinedload(models.StockSection.rack))
+    stock_page = paginate(
+        query, models.StockItem.product_name, models.StockItem.id, per_page,
+        page=page, cursor=cursor, total_mode=total_mode
+    )
 
     result = []
-    for item in items:
+    for item in stock_page.items:
         item_dict = {
-            **item.__dict__,
+            **orm_dict(item, exclude={"section"}),
             "section_name": item.section.section_name if item.section else None,
             "rack_name": item.section.rack.rack_number if item.section and item.section.rack else None,
             "total_value": (item.quantity_software * item.unit_price) if item.unit_price else None
         }
         result.append(item_dict)
 
-    import math
-    return {
-        "items": result,
-        "total": total,
-        "page": page,
-        "per_page": per_page,
-        "pages": math.ceil(total / per_page) if total > 0 else 1
-    }
+    return stock_page.response(result)
 
 @router.get("/items/consolidated")
 def get_consolidated_stock_items(
@@ -526,7 +534,7 @@ def get_stock_item(
     
     # Add section and rack names
     item_dict = {
-        **item.__dict__,
+        **orm_dict(item),
         "section_name": item.section.section_name if item.section else None,
         "rack_name": item.section.rack.rack_number if item.section and item.section.rack else None,
         "total_value": (item.quantity_software * item.unit_price) if item.unit_price else None
@@ -607,6 +615,7 @@ async def upload_stock_excel(
     current_user: tuple = Depends(get_current_user)
 ):
     """Upload stock items from Excel file for verification workflow"""
+    from openpyxl import load_workbook
     staff, shop_id = current_user
     
     if not file.filename.endswith(('.xlsx', '.xls')):
@@ -735,10 +744,12 @@ def get_excel_uploads(
     search: Optional[str] = None,
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page (keyset pagination)"),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN, description="exact | approx | none"),
     db: Session = Depends(get_db),
     current_user: tuple = Depends(get_current_user)
 ):
-    """Get Excel uploads with optional status filter, search and pagination"""
+    """Get Excel uploads with optional status filter, search and pagination (page/per_page or cursor)"""
     staff, shop_id = current_user
     query = db.query(models.ExcelUpload).filter(models.ExcelUpload.shop_id == shop_id)
 
@@ -752,12 +763,13 @@ def get_excel_uploads(
             (models.ExcelUpload.uploaded_by_staff_name.ilike(search_term))
         )
 
-    import math
-    total = query.count()
-    uploads = query.order_by(models.ExcelUpload.uploaded_at.desc()).offset((page - 1) * per_page).limit(per_page).all()
+    uploads_page = paginate(
+        query, models.ExcelUpload.uploaded_at, models.ExcelUpload.id, per_page,
+        descending=True, page=page, cursor=cursor, total_mode=total_mode
+    )
 
     result = []
-    for upload in uploads:
+    for upload in uploads_page.items:
         result.append({
             "id": upload.id,
             "filename": upload.filename,
@@ -779,13 +791,7 @@ def get_excel_uploads(
             "rejection_reason": upload.rejection_reason
         })
 
-    return {
-        "items": result,
-        "total": total,
-        "page": page,
-        "per_page": per_page,
-        "pages": math.ceil(total / per_page) if total > 0 else 1
-    }
+    return uploads_page.response(result)
 
 @router.get("/uploads/{upload_id}/items")
 def get_upload_items(
@@ -1001,26 +1007,7 @@ def admin_verify_upload(
         
         created_count = 0
         for item in items:
-            stock_item = models.StockItem(
-                shop_id=upload.shop_id,
-                product_name=item.product_name,
-                batch_number=item.batch_number,
-                quantity_software=item.quantity_software,
-                composition=item.composition,
-                manufacturer=item.manufacturer,
-                hsn_code=item.hsn_code,
-                package=item.package,
-                unit=item.unit,
-                expiry_date=item.expiry_date,
-                manufacturing_date=item.manufacturing_date,
-                mrp=item.mrp,
-                unit_price=item.unit_price,
-                selling_price=item.selling_price,
-                profit_margin=item.profit_margin,
-                section_id=item.section_id
-            )
-            db.add(stock_item)
-            db.flush()
+            stock_item = services.StockCalculationService.add_upload_item(db, upload.shop_id, item)
             
             item.stock_item_id = stock_item.id
             item.status = "approved"
@@ -1109,10 +1096,12 @@ def get_unassigned_items(
     batch_number: Optional[str] = None,
     page: int = Query(1, ge=1),
     per_page: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page (keyset pagination)"),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN, description="exact | approx | none"),
     db: Session = Depends(get_db),
     current_user: tuple = Depends(get_current_user)
 ):
-    """Get unassigned stock items with search, filters and pagination"""
+    """Get unassigned stock items with search, filters and pagination (page/per_page or cursor)"""
     staff, shop_id = current_user
     query = db.query(models.StockItem).filter(
         models.StockItem.shop_id == shop_id,
@@ -1128,27 +1117,24 @@ def get_unassigned_items(
     if batch_number:
         query = query.filter(models.StockItem.batch_number.ilike(f"%{batch_number}%"))
 
-    total = query.count()
-    items = query.order_by(models.StockItem.product_name).offset((page - 1) * per_page).limit(per_page).all()
+    # Section and rack in the same SELECT (was two lazy loads per row)
+    query = query.options(joinedload(models.StockItem.section).joinedload(models.StockSection.rack))
+    stock_page = paginate(
+        query, models.StockItem.product_name, models.StockItem.id, per_page,
+        page=page, cursor=cursor, total_mode=total_mode
+    )
 
     result = []
-    for item in items:
+    for item in stock_page.items:
         item_dict = {
-            **item.__dict__,
+            **orm_dict(item, exclude={"section"}),
             "section_name": None,
             "rack_name": None,
             "total_value": (item.quantity_software * item.unit_price) if item.unit_price else None
         }
         result.append(item_dict)
 
-    import math
-    return {
-        "items": result,
-        "total": total,
-        "page": page,
-        "per_page": per_page,
-        "pages": math.ceil(total / per_page) if total > 0 else 1
-    }
+    return stock_page.response(result)
 
 @router.patch("/items/{item_id}/assign-section")
 def assign_section_to_item(
@@ -1605,8 +1591,9 @@ def create_stock_adjustment(
     )
     db.add(db_adjustment)
     
-    item.quantity_software += adjustment.quantity_change
-    if item.quantity_software < 0:
+    try:
+        services.StockMutationService.apply_changes(db, shop_id, {item.id: adjustment.quantity_change})
+    except services.InsufficientStockError:
         raise HTTPException(status_code=400, detail="Adjustment would result in negative stock")
     
     db.commit()
@@ -1685,10 +1672,12 @@ def get_ai_insights(
 
 @router.get("/export/stock-items")
 def export_stock_items_excel(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: tuple = Depends(get_current_user)
 ):
     """Export all stock items to Excel"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
     staff, shop_id = current_user
     items = db.query(models.StockItem).filter(models.StockItem.shop_id == shop_id).all()
     
@@ -1762,10 +1751,12 @@ def export_stock_items_excel(
 @router.get("/export/audit-records")
 def export_audit_records_excel(
     days: int = Query(30, description="Number of days to export"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: tuple = Depends(get_current_user)
 ):
     """Export audit records to Excel"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
     staff, shop_id = current_user
     start_date = datetime.now() - timedelta(days=days)
     records = db.query(models.StockAuditRecord).filter(
@@ -1827,10 +1818,12 @@ def export_audit_records_excel(
 @router.get("/export/adjustments")
 def export_adjustments_excel(
     days: int = Query(30, description="Number of days to export"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: tuple = Depends(get_current_user)
 ):
     """Export stock adjustments to Excel"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
     staff, shop_id = current_user
     start_date = datetime.now() - timedelta(days=days)
     adjustments = db.query(models.StockAdjustment).filter(
@@ -66,6 +66,7 @@ class InvoiceStockSyncService:
         synced_items = []
         updated_items = []
         skipped_items = []
+        stock_by_batch = {}  # repeated product/batch lines merge into one row
 
         for invoice_item in invoice.items:
             # Skip items with no product name — can't match or create a meaningful stock entry
@@ -91,8 +92,9 @@ class InvoiceStockSyncService:
             raw_unit_price = invoice_item.unit_price or 0.0
             unit_price = round(raw_unit_price / strips_per_box, 4) if strips_per_box else raw_unit_price
 
-            # Check if item already exists (by product_name + batch_number)
-            existing_item = db.query(StockItem).filter(
+            # Check if item already exists (by product_name + batch_number), including one created above
+            batch_key = (invoice_item.product_name, invoice_item.batch_number)
+            existing_item = stock_by_batch.get(batch_key) or db.query(StockItem).filter(
                 StockItem.shop_id == shop_id,
                 StockItem.product_name == invoice_item.product_name,
                 StockItem.batch_number == invoice_item.batch_number
@@ -137,6 +139,7 @@ class InvoiceStockSyncService:
                 )
                 db.add(stock_item)
                 db.flush()
+                stock_by_batch[batch_key] = stock_item
                 synced_items.append(stock_item.id)
                 logger.info(
                     f"Created stock item {stock_item.id}: {invoice_item.product_name} "
@@ -12,8 +12,9 @@ echo "📁 Creating uploads directory..."
 mkdir -p uploads/qr_codes
 mkdir -p uploads/invoices
 
-# Skip Alembic migrations - tables created by SQLAlchemy
+# Skip Alembic migrations - tables created by SQLAlchemy (once, before the workers start)
 echo "⚠️  Skipping Alembic migrations (using SQLAlchemy create_all)"
+python -m app.cli setup || exit 1
 
 # Start FastAPI application
 echo "🌐 Starting FastAPI server on 0.0.0.0:$PORT..."
@@ -22,6 +22,7 @@ from modules.auth.salary_management.models import SalaryRecord, StaffPaymentInfo
 from modules.auth.attendance.models import ShopWiFi, StaffDevice, AttendanceRecord, AttendanceSettings, LeaveRequest
 
 from modules.auth.service import AuthService
+from modules.auth.principal_cache import invalidate_principal
 
 def list_superadmins():
     db = SessionLocal()
@@ -74,6 +75,7 @@ def deactivate_superadmin(phone):
     
     admin.is_active = False
     db.commit()
+    invalidate_principal("super_admin", admin.id)
     print(f"✅ Deactivated SuperAdmin: {phone}")
     db.close()
 
@@ -88,6 +90,7 @@ def activate_superadmin(phone):
     
     admin.is_active = True
     db.commit()
+    invalidate_principal("super_admin", admin.id)
     print(f"✅ Activated SuperAdmin: {phone}")
     db.close()
 
@@ -108,6 +111,7 @@ def delete_superadmin(phone):
     
     db.delete(admin)
     db.commit()
+    invalidate_principal("super_admin", admin.id)
     print(f"✅ Deleted SuperAdmin: {phone}")
     print("\n⚠️  IMPORTANT: Update frontend auto-detection in src/features/Welcome/index.jsx")
     print(f"   Remove: normalizedPhone.endsWith('{phone.replace('+91', '')}')")
@@ -124,6 +128,7 @@ def reset_password(phone, new_password):
     
     admin.password_hash = AuthService.hash_password(new_password)
     db.commit()
+    invalidate_principal("super_admin", admin.id)
     print(f"✅ Password reset for SuperAdmin: {phone}")
     print(f"🔑 New Password: {new_password}")
     db.close()
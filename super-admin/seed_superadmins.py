@@ -10,6 +10,7 @@ This script creates 2 SuperAdmins for production use.
 from app.database.database import SessionLocal
 from modules.auth.models import SuperAdmin
 from modules.auth.service import AuthService
+from modules.auth.principal_cache import invalidate_principal
 
 def seed_superadmins():
     db = SessionLocal()
@@ -56,6 +57,8 @@ def seed_superadmins():
             print(f"⚠️  SuperAdmin 2 already exists: {phone2}")
         
         db.commit()
+        if old_admin:
+            invalidate_principal("super_admin", old_admin.id)
         print("\n🎉 SuperAdmin seeding completed!")
         
     except Exception as e: